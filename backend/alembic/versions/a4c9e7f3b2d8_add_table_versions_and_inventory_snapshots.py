@@ -0,0 +1,43 @@
+"""Add table versions and inventory snapshots
+
+Revision ID: a4c9e7f3b2d8
+Revises: f2b6d8e4a1c7
+Create Date: 2026-10-19 19:41:08.662190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c9e7f3b2d8'
+down_revision: Union[str, Sequence[str], None] = 'f2b6d8e4a1c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'table_versions',
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+    op.create_table(
+        'inventory_snapshots',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('total_skus', sa.Integer(), nullable=False),
+        sa.Column('low_stock', sa.Integer(), nullable=False),
+        sa.Column('out_of_stock', sa.Integer(), nullable=False),
+        sa.Column('inventory_value', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('inventory_snapshots')
+    op.drop_table('table_versions')
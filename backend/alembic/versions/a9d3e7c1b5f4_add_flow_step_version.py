@@ -0,0 +1,29 @@
+"""Add flow step version
+
+Revision ID: a9d3e7c1b5f4
+Revises: f2b6d9a4c8e1
+Create Date: 2026-10-21 10:12:48.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3e7c1b5f4'
+down_revision: Union[str, Sequence[str], None] = 'f2b6d9a4c8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Bumped on every edit of a step's subject or content; compiled templates are cached by (step id, version)
+    op.add_column('flow_steps', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('flow_steps', 'version')
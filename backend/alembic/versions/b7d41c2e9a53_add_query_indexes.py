@@ -0,0 +1,44 @@
+"""Add query indexes
+
+Revision ID: b7d41c2e9a53
+Revises: ffc7280a8796
+Create Date: 2026-10-19 09:12:41.532904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41c2e9a53'
+down_revision: Union[str, Sequence[str], None] = 'ffc7280a8796'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_customers_created_at', 'customers', ['created_at'], unique=False)
+    op.create_index('ix_orders_customer_id_date', 'orders', ['customer_id', 'date'], unique=False)
+    op.create_index('ix_orders_date_status', 'orders', ['date', 'status'], unique=False)
+    op.create_index('ix_orders_status_date', 'orders', ['status', 'date'], unique=False)
+    op.create_index('ix_orders_total_amount_id', 'orders', ['total_amount', 'id'], unique=False)
+    op.create_index('ix_order_items_order_id_product_id', 'order_items', ['order_id', 'product_id'], unique=False)
+    op.create_index('ix_order_items_product_id_order_id', 'order_items', ['product_id', 'order_id'], unique=False)
+    op.create_index('ix_products_status', 'products', ['status'], unique=False)
+    op.create_index('ix_products_category', 'products', ['category'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_category', table_name='products')
+    op.drop_index('ix_products_status', table_name='products')
+    op.drop_index('ix_order_items_product_id_order_id', table_name='order_items')
+    op.drop_index('ix_order_items_order_id_product_id', table_name='order_items')
+    op.drop_index('ix_orders_total_amount_id', table_name='orders')
+    op.drop_index('ix_orders_status_date', table_name='orders')
+    op.drop_index('ix_orders_date_status', table_name='orders')
+    op.drop_index('ix_orders_customer_id_date', table_name='orders')
+    op.drop_index('ix_customers_created_at', table_name='customers')
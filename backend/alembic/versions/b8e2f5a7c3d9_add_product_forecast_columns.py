@@ -0,0 +1,35 @@
+"""Add product forecast columns
+
+Revision ID: b8e2f5a7c3d9
+Revises: a4c9e7f3b2d8
+Create Date: 2026-10-19 20:37:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e2f5a7c3d9'
+down_revision: Union[str, Sequence[str], None] = 'a4c9e7f3b2d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled by services/forecasting.py on its first scheduled run
+    op.add_column('products', sa.Column('sales_velocity', sa.Float(), nullable=True))
+    op.add_column('products', sa.Column('days_until_stockout', sa.Float(), nullable=True))
+    op.create_index('ix_products_predicted_need', 'products', ['predicted_need'], unique=False)
+    op.create_index('ix_products_days_until_stockout', 'products', ['days_until_stockout'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_products_days_until_stockout', table_name='products')
+    op.drop_index('ix_products_predicted_need', table_name='products')
+    op.drop_column('products', 'days_until_stockout')
+    op.drop_column('products', 'sales_velocity')
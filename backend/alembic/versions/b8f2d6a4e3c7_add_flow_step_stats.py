@@ -0,0 +1,47 @@
+"""Add flow step stats
+
+Revision ID: b8f2d6a4e3c7
+Revises: c4e8a2f6d1b9
+Create Date: 2026-10-22 11:06:19.274530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8f2d6a4e3c7'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a2f6d1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'flow_step_stats',
+        sa.Column('flow_id', sa.Integer(), nullable=False),
+        sa.Column('step_id', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('sent', sa.Integer(), nullable=False),
+        sa.Column('opened', sa.Integer(), nullable=False),
+        sa.Column('clicked', sa.Integer(), nullable=False),
+        sa.Column('ordered', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('open_seconds', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['flow_id'], ['flows.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['step_id'], ['flow_steps.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('flow_id', 'step_id', 'bucket')
+    )
+
+    # The order credited to a message (services/flow_analytics.py)
+    op.add_column('flow_messages', sa.Column('order_id', sa.Integer(), nullable=True))
+    # Messages sent before this migration: python -m app.services.flow_analytics backfill
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('flow_messages', 'order_id')
+    op.drop_table('flow_step_stats')
@@ -0,0 +1,51 @@
+"""Add order search text
+
+Revision ID: c3e8a1f0d6b2
+Revises: b7d41c2e9a53
+Create Date: 2026-10-19 10:03:17.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f0d6b2'
+down_revision: Union[str, Sequence[str], None] = 'b7d41c2e9a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('orders', sa.Column('search_text', sa.String(), nullable=True))
+
+    # Backfill from the customers table (same expression as services/order_search.py)
+    op.execute(
+        "UPDATE orders SET search_text = ("
+        "SELECT lower(orders.order_id || ' ' || COALESCE(customers.first_name, '') || ' ' "
+        "|| COALESCE(customers.last_name, '') || ' ' || customers.email) "
+        "FROM customers WHERE customers.id = orders.customer_id)"
+    )
+
+    # Trigram and prefix indexes only exist on PostgreSQL
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.create_index(
+            'ix_orders_order_id_pattern', 'orders', ['order_id'], unique=False,
+            postgresql_ops={'order_id': 'varchar_pattern_ops'}
+        )
+        op.create_index(
+            'ix_orders_search_text_trgm', 'orders', ['search_text'], unique=False,
+            postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_orders_search_text_trgm', table_name='orders')
+        op.drop_index('ix_orders_order_id_pattern', table_name='orders')
+    op.drop_column('orders', 'search_text')
@@ -0,0 +1,51 @@
+"""Add email events
+
+Revision ID: c4e8a2f6d1b9
+Revises: a9d3e7c1b5f4
+Create Date: 2026-10-21 15:37:02.846113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a2f6d1b9'
+down_revision: Union[str, Sequence[str], None] = 'a9d3e7c1b5f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'email_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.Integer(), nullable=False),
+        sa.Column('flow_id', sa.Integer(), nullable=False),
+        sa.Column('step_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=False),
+        sa.Column('url', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['message_id'], ['flow_messages.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['flow_id'], ['flows.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_email_events_message_id', 'email_events', ['message_id'], unique=False)
+    op.create_index('ix_email_events_flow_created', 'email_events', ['flow_id', 'created_at'], unique=False)
+
+    # First open and first click of each message, so counters count messages rather than events
+    op.add_column('flow_messages', sa.Column('opened_at', sa.DateTime(), nullable=True))
+    op.add_column('flow_messages', sa.Column('clicked_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('flow_messages', 'clicked_at')
+    op.drop_column('flow_messages', 'opened_at')
+    op.drop_index('ix_email_events_flow_created', table_name='email_events')
+    op.drop_index('ix_email_events_message_id', table_name='email_events')
+    op.drop_table('email_events')
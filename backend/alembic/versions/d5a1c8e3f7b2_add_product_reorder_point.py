@@ -0,0 +1,29 @@
+"""Add product reorder point
+
+Revision ID: d5a1c8e3f7b2
+Revises: b8e2f5a7c3d9
+Create Date: 2026-10-19 22:14:06.530917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a1c8e3f7b2'
+down_revision: Union[str, Sequence[str], None] = 'b8e2f5a7c3d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled by services/forecasting.py alongside sales_velocity
+    op.add_column('products', sa.Column('reorder_point', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'reorder_point')
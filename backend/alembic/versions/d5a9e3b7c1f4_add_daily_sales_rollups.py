@@ -0,0 +1,63 @@
+"""Add daily sales rollups
+
+Revision ID: d5a9e3b7c1f4
+Revises: c3e8a1f0d6b2
+Create Date: 2026-10-19 14:21:40.318842
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a9e3b7c1f4'
+down_revision: Union[str, Sequence[str], None] = 'c3e8a1f0d6b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'daily_sales',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('cancelled', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+    )
+    op.create_table(
+        'daily_product_sales',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+        sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+
+    # Backfill from existing orders (same aggregation as services/sales_rollup.py)
+    op.execute(
+        "INSERT INTO daily_sales (day, revenue, orders, cancelled) "
+        "SELECT date(date), "
+        "COALESCE(SUM(CASE WHEN status != 'Cancelled' THEN total_amount END), 0), "
+        "COUNT(CASE WHEN status != 'Cancelled' THEN 1 END), "
+        "COUNT(CASE WHEN status = 'Cancelled' THEN 1 END) "
+        "FROM orders WHERE date IS NOT NULL GROUP BY date(date)"
+    )
+    op.execute(
+        "INSERT INTO daily_product_sales (day, product_id, units, revenue) "
+        "SELECT date(orders.date), order_items.product_id, "
+        "SUM(order_items.quantity), SUM(order_items.quantity * order_items.price_at_purchase) "
+        "FROM order_items JOIN orders ON orders.id = order_items.order_id "
+        "WHERE orders.date IS NOT NULL AND orders.status != 'Cancelled' "
+        "GROUP BY date(orders.date), order_items.product_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_product_sales')
+    op.drop_table('daily_sales')
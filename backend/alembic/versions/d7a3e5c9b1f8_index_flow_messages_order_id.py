@@ -0,0 +1,28 @@
+"""Index flow messages order id
+
+Revision ID: d7a3e5c9b1f8
+Revises: b8f2d6a4e3c7
+Create Date: 2026-10-23 09:14:52.618204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3e5c9b1f8'
+down_revision: Union[str, Sequence[str], None] = 'b8f2d6a4e3c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Order attribution looks up which orders are already credited
+    op.create_index('ix_flow_messages_order_id', 'flow_messages', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_flow_messages_order_id', table_name='flow_messages')
@@ -0,0 +1,68 @@
+"""Add flow enrollments and messages
+
+Revision ID: e7b3f9a2c6d4
+Revises: d5a1c8e3f7b2
+Create Date: 2026-10-19 23:02:41.774519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3f9a2c6d4'
+down_revision: Union[str, Sequence[str], None] = 'd5a1c8e3f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'flow_enrollments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('flow_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('step_order', sa.Integer(), nullable=True),
+        sa.Column('due_at', sa.DateTime(), nullable=True),
+        sa.Column('enrolled_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['flow_id'], ['flows.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_flow_enrollments_flow_customer', 'flow_enrollments', ['flow_id', 'customer_id'], unique=True)
+    op.create_index('ix_flow_enrollments_due', 'flow_enrollments', ['flow_id', 'status', 'due_at'], unique=False)
+    op.create_index('ix_flow_enrollments_customer_id', 'flow_enrollments', ['customer_id'], unique=False)
+
+    op.create_table(
+        'flow_messages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('flow_id', sa.Integer(), nullable=False),
+        sa.Column('step_id', sa.Integer(), nullable=False),
+        sa.Column('customer_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['flow_id'], ['flows.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['step_id'], ['flow_steps.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_flow_messages_status', 'flow_messages', ['status', 'id'], unique=False)
+    op.create_index('ix_flow_messages_customer_id', 'flow_messages', ['customer_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_flow_messages_customer_id', table_name='flow_messages')
+    op.drop_index('ix_flow_messages_status', table_name='flow_messages')
+    op.drop_table('flow_messages')
+    op.drop_index('ix_flow_enrollments_customer_id', table_name='flow_enrollments')
+    op.drop_index('ix_flow_enrollments_due', table_name='flow_enrollments')
+    op.drop_index('ix_flow_enrollments_flow_customer', table_name='flow_enrollments')
+    op.drop_table('flow_enrollments')
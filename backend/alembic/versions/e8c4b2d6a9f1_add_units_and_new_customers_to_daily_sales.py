@@ -0,0 +1,47 @@
+"""Add units and new customers to daily sales
+
+Revision ID: e8c4b2d6a9f1
+Revises: d5a9e3b7c1f4
+Create Date: 2026-10-19 16:02:11.547093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8c4b2d6a9f1'
+down_revision: Union[str, Sequence[str], None] = 'd5a9e3b7c1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('daily_sales', sa.Column('units', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('daily_sales', sa.Column('new_customers', sa.Integer(), nullable=False, server_default='0'))
+
+    # Units come from the per-product rollup, so days whose orders were archived keep them
+    op.execute(
+        "UPDATE daily_sales SET units = COALESCE(("
+        "SELECT SUM(daily_product_sales.units) FROM daily_product_sales "
+        "WHERE daily_product_sales.day = daily_sales.day), 0)"
+    )
+    op.execute(
+        "UPDATE daily_sales SET new_customers = ("
+        "SELECT COUNT(*) FROM customers WHERE date(customers.created_at) = daily_sales.day)"
+    )
+    op.execute(
+        "INSERT INTO daily_sales (day, revenue, orders, cancelled, units, new_customers) "
+        "SELECT date(created_at), 0, 0, 0, 0, COUNT(*) FROM customers "
+        "WHERE created_at IS NOT NULL AND date(created_at) NOT IN (SELECT day FROM daily_sales) "
+        "GROUP BY date(created_at)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('daily_sales', 'new_customers')
+    op.drop_column('daily_sales', 'units')
@@ -0,0 +1,45 @@
+"""Add insight keys and segment size snapshots
+
+Revision ID: f2b6d8e4a1c7
+Revises: e8c4b2d6a9f1
+Create Date: 2026-10-19 18:24:37.310528
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d8e4a1c7'
+down_revision: Union[str, Sequence[str], None] = 'e8c4b2d6a9f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # time_ago is derived from created_at when insights are read
+    op.drop_column('insights', 'time_ago')
+    op.add_column('insights', sa.Column('key', sa.String(), nullable=True))
+    op.create_index('ix_insights_key', 'insights', ['key'], unique=True)
+    op.create_index('ix_insights_created_at', 'insights', ['created_at'], unique=False)
+
+    op.create_table(
+        'segment_size_snapshots',
+        sa.Column('segment_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('customer_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['segment_id'], ['segments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('segment_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('segment_size_snapshots')
+    op.drop_index('ix_insights_created_at', table_name='insights')
+    op.drop_index('ix_insights_key', table_name='insights')
+    op.drop_column('insights', 'key')
+    op.add_column('insights', sa.Column('time_ago', sa.String(), nullable=False, server_default=''))
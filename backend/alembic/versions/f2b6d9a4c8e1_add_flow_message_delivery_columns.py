@@ -0,0 +1,33 @@
+"""Add flow message delivery columns
+
+Revision ID: f2b6d9a4c8e1
+Revises: e7b3f9a2c6d4
+Create Date: 2026-10-20 09:41:27.184503
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6d9a4c8e1'
+down_revision: Union[str, Sequence[str], None] = 'e7b3f9a2c6d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Written by services/flow_delivery.py: claim time of a message being sent, times claimed, last error
+    op.add_column('flow_messages', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    op.add_column('flow_messages', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('flow_messages', sa.Column('error', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('flow_messages', 'error')
+    op.drop_column('flow_messages', 'attempts')
+    op.drop_column('flow_messages', 'claimed_at')
@@ -9,4 +9,83 @@ class Settings:
     OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
+    # Orders partitioning (PostgreSQL only) and cold-storage archival
+    ORDERS_PARTITIONING = os.getenv("ORDERS_PARTITIONING", "false").lower() == "true"
+    ORDERS_PARTITION_MONTHS_AHEAD = int(os.getenv("ORDERS_PARTITION_MONTHS_AHEAD", 3))
+    ORDERS_PARTITION_INTERVAL_SECONDS = float(os.getenv("ORDERS_PARTITION_INTERVAL_SECONDS", 86400))
+    ORDER_ARCHIVE_DIR = os.getenv("ORDER_ARCHIVE_DIR", "archive/orders")
+    ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", 365))
+
+    # Dashboard stats cache: fresh for TTL seconds, then served stale while recomputing
+    DASHBOARD_STATS_TTL_SECONDS = float(os.getenv("DASHBOARD_STATS_TTL_SECONDS", 15))
+    DASHBOARD_STATS_MAX_STALE_SECONDS = float(os.getenv("DASHBOARD_STATS_MAX_STALE_SECONDS", 300))
+
+    # Top-products tracker: per-day heavy-hitters sketches, reloaded from the rollups periodically
+    TOP_PRODUCTS_WINDOW_DAYS = int(os.getenv("TOP_PRODUCTS_WINDOW_DAYS", 90))
+    TOP_PRODUCTS_CAPACITY = int(os.getenv("TOP_PRODUCTS_CAPACITY", 200))
+    TOP_PRODUCTS_RESYNC_SECONDS = float(os.getenv("TOP_PRODUCTS_RESYNC_SECONDS", 300))
+
+    # Insights generator (0 disables the schedule)
+    INSIGHTS_INTERVAL_SECONDS = float(os.getenv("INSIGHTS_INTERVAL_SECONDS", 900))
+    INSIGHTS_BASELINE_DAYS = int(os.getenv("INSIGHTS_BASELINE_DAYS", 28))
+    INSIGHTS_Z_THRESHOLD = float(os.getenv("INSIGHTS_Z_THRESHOLD", 3.0))
+    INSIGHTS_RETENTION_DAYS = int(os.getenv("INSIGHTS_RETENTION_DAYS", 90))
+
+    # How often today's inventory snapshot (the skus_change baseline) is rewritten
+    INVENTORY_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("INVENTORY_SNAPSHOT_INTERVAL_SECONDS", 3600))
+    # Longest inventory stats are reused while orders only change stock levels (not stock status)
+    INVENTORY_STATS_TTL_SECONDS = float(os.getenv("INVENTORY_STATS_TTL_SECONDS", 60))
+
+    # How often every product's sales velocity, days until stockout and predicted need are recomputed
+    FORECAST_INTERVAL_SECONDS = float(os.getenv("FORECAST_INTERVAL_SECONDS", 3600))
+
+    # Flow runtime: how often the flow timers are checked and segments re-enrolled, and the batch size.
+    # FLOW_WORKER_IN_APP=false leaves the work to dedicated `python -m app.services.flow_runtime --loop` processes
+    FLOW_WORKER_IN_APP = os.getenv("FLOW_WORKER_IN_APP", "true").lower() == "true"
+    FLOW_WORKER_INTERVAL_SECONDS = float(os.getenv("FLOW_WORKER_INTERVAL_SECONDS", 1))
+    # Re-read every active flow's next due time, to see enrollments written by other processes
+    FLOW_TIMER_RESYNC_SECONDS = float(os.getenv("FLOW_TIMER_RESYNC_SECONDS", 60))
+    FLOW_ENROLL_INTERVAL_SECONDS = float(os.getenv("FLOW_ENROLL_INTERVAL_SECONDS", 900))
+    FLOW_BATCH_SIZE = int(os.getenv("FLOW_BATCH_SIZE", 5000))
+
+    # SMTP server for outgoing email
+    MAIL_SERVER = os.getenv("MAIL_SERVER", "")
+    MAIL_PORT = int(os.getenv("MAIL_PORT", 587))
+    MAIL_USERNAME = os.getenv("MAIL_USERNAME", "")
+    MAIL_PASSWORD = os.getenv("MAIL_PASSWORD", "")
+    MAIL_FROM = os.getenv("MAIL_FROM", "noreply@example.com")
+    MAIL_STARTTLS = os.getenv("MAIL_STARTTLS", "true").lower() == "true"
+
+    # Email delivery (core/mailer.py): persistent connections, in-flight bound, per-domain rates, retries
+    EMAIL_CONNECTIONS = int(os.getenv("EMAIL_CONNECTIONS", 4))
+    EMAIL_QUEUE_SIZE = int(os.getenv("EMAIL_QUEUE_SIZE", 1000))
+    EMAIL_DEFAULT_RATE_PER_SECOND = float(os.getenv("EMAIL_DEFAULT_RATE_PER_SECOND", 0))  # 0: unlimited
+    EMAIL_DOMAIN_RATE_LIMITS = os.getenv("EMAIL_DOMAIN_RATE_LIMITS", "")  # e.g. "gmail.com=50,outlook.com=20"
+    EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", 3))
+    EMAIL_RETRY_BACKOFF_SECONDS = float(os.getenv("EMAIL_RETRY_BACKOFF_SECONDS", 1))
+    EMAIL_SEND_TIMEOUT_SECONDS = float(os.getenv("EMAIL_SEND_TIMEOUT_SECONDS", 30))
+
+    # Flow message delivery: batch claimed from flow_messages, idle poll interval, and when an
+    # unfinished claim (a crashed worker) is handed out again. Runs in the app only if MAIL_SERVER is set
+    EMAIL_DELIVERY_IN_APP = os.getenv("EMAIL_DELIVERY_IN_APP", "true").lower() == "true"
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 500))
+    EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", 1))
+    EMAIL_CLAIM_TIMEOUT_SECONDS = float(os.getenv("EMAIL_CLAIM_TIMEOUT_SECONDS", 600))
+    # Flow email rendering: batches of at least EMAIL_RENDER_POOL_THRESHOLD messages are rendered
+    # by a pool of EMAIL_RENDER_PROCESSES processes (0 = one per CPU)
+    EMAIL_RENDER_POOL_THRESHOLD = int(os.getenv("EMAIL_RENDER_POOL_THRESHOLD", 2000))
+    EMAIL_RENDER_PROCESSES = int(os.getenv("EMAIL_RENDER_PROCESSES", 0))
+    # Open/click tracking: public URL of this API for the pixel and links in flow emails (empty
+    # disables them), how often buffered events are flushed, and how many are buffered at most
+    TRACKING_BASE_URL = os.getenv("TRACKING_BASE_URL", "")
+    EMAIL_EVENTS_FLUSH_SECONDS = float(os.getenv("EMAIL_EVENTS_FLUSH_SECONDS", 1))
+    EMAIL_EVENTS_BUFFER_SIZE = int(os.getenv("EMAIL_EVENTS_BUFFER_SIZE", 200000))
+    # Flow analytics: an order is credited to the last message its customer was sent within
+    # FLOW_ATTRIBUTION_DAYS before it, matched every FLOW_ATTRIBUTION_INTERVAL_SECONDS
+    FLOW_ATTRIBUTION_DAYS = int(os.getenv("FLOW_ATTRIBUTION_DAYS", 7))
+    FLOW_ATTRIBUTION_INTERVAL_SECONDS = float(os.getenv("FLOW_ATTRIBUTION_INTERVAL_SECONDS", 300))
+
+    # How often the product catalog cache checks for writes made by other workers (0 checks on every read)
+    PRODUCT_CATALOG_CHECK_SECONDS = float(os.getenv("PRODUCT_CATALOG_CHECK_SECONDS", 1))
+
 settings = Settings()
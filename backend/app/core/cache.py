@@ -0,0 +1,110 @@
+# In-process stale-while-revalidate cache for expensive read endpoints
+#
+# A fresh entry (younger than `ttl`) is served as a HIT. An expired entry is still
+# served (STALE) while a single background task recomputes it; entries older than
+# `ttl + max_stale` are not served and the caller waits for the recomputation (MISS).
+# Concurrent callers for the same key share one in-flight computation, so a burst of
+# requests costs one load. The cache is per process; each worker keeps its own.
+#
+# VersionedCache instead keeps a value until a version the caller reads (cheaply)
+# changes, for data that must not be served stale once written.
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+HIT = "HIT"
+STALE = "STALE"
+MISS = "MISS"
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    computed_at: datetime
+    expires_at: float  # time.monotonic() deadline
+
+
+class StaleWhileRevalidateCache:
+    def __init__(self, ttl: float, max_stale: Optional[float] = None):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: Dict[Hashable, CacheEntry] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[CacheEntry, str]:
+        """
+        Return (entry, status) for `key`, where status is HIT, STALE or MISS.
+        `loader` is a blocking callable; it runs in the threadpool.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+
+        if entry is not None and now < entry.expires_at:
+            return entry, HIT
+
+        if entry is not None and (self.max_stale is None or now < entry.expires_at + self.max_stale):
+            if key not in self._inflight:
+                self._refresh(key, loader)
+            return entry, STALE
+
+        task = self._inflight.get(key) or self._refresh(key, loader)
+        # shield: a cancelled request must not cancel the load other callers wait on
+        return await asyncio.shield(task), MISS
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> asyncio.Task:
+        task = asyncio.create_task(self._load(key, loader))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Any]) -> CacheEntry:
+        value = await run_in_threadpool(loader)
+        entry = CacheEntry(value=value, computed_at=datetime.utcnow(), expires_at=time.monotonic() + self.ttl)
+        self._entries[key] = entry
+        return entry
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Keep serving the previous entry; waiting callers get the exception
+            logger.error(f"Cache refresh failed for {key!r}: {task.exception()}")
+
+
+class VersionedCache:
+    """
+    One value per key, reused while the caller-supplied version is unchanged
+    (e.g. a table version from services/table_versions.py). Blocking; safe to
+    share between threads, at worst two threads compute the same value.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Hashable, Any]] = {}
+
+    def get(self, key: Hashable, version: Hashable, loader: Callable[[], Any]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        self._entries[key] = (version, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
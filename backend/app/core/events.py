@@ -0,0 +1,77 @@
+# In-process Server-Sent Events broadcaster
+#
+# Writers publish an event once; it is encoded to an SSE frame once and the same
+# bytes are handed to every connected subscriber's queue. A subscriber whose queue
+# is full (a stalled client) is disconnected rather than slowing everyone down; the
+# browser's EventSource reconnects and receives a fresh snapshot. Events are per
+# process, like the stats cache.
+
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Optional, Set
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Sent on idle connections so proxies don't time them out
+HEARTBEAT = b": ping\n\n"
+
+
+def sse_frame(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS) + b"\n\n"
+
+
+class Broadcaster:
+    def __init__(self, queue_size: int = 256, heartbeat_seconds: float = 15.0):
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, event: str, data: Any) -> None:
+        """Send an event to every subscriber; safe to call from any thread"""
+        if not self._subscribers:
+            return
+        frame = sse_frame(event, data)
+        if threading.get_ident() == self._loop_thread:
+            self._deliver(frame)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, frame)
+
+    def _deliver(self, frame: bytes) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Drop the backlog and tell the stream to close
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                logger.warning("Disconnected a slow SSE subscriber")
+
+    async def subscribe(self) -> AsyncIterator[bytes]:
+        """Yield SSE frames (and heartbeats) until the subscriber is dropped or the client leaves"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self._subscribers.discard(queue)
@@ -0,0 +1,210 @@
+# Asynchronous email delivery: persistent SMTP connections, per-domain rate limits, retries
+#
+# A Mailer runs `connections` sender tasks on the event loop. Each owns one SMTP
+# connection, opened on first use and kept for every message after that (it's
+# reopened only after an error), so a campaign pays for the TCP/TLS/AUTH handshake
+# once per connection rather than once per message.
+#
+# Messages go through one queue shared by the senders:
+#   - submit() waits while `queue_size` messages are in flight, so producers can't
+#     run ahead of delivery (backpressure) and memory stays bounded.
+#   - Each recipient domain has a token bucket (DomainRateLimiter). A message whose
+#     domain is over its rate is set aside until its token is due instead of
+#     blocking a sender, so one throttled domain doesn't hold up the others.
+#   - Transient failures (connection errors, timeouts, 4xx replies) are retried up
+#     to `max_retries` times with exponential backoff and jitter; 5xx replies fail
+#     at once. Every message ends with exactly one DeliveryResult.
+
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from email.mime.text import MIMEText
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import aiosmtplib
+
+from app.config import settings
+
+# Errors after which the connection can't be trusted any more
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError,
+    asyncio.TimeoutError, OSError,
+)
+
+
+@dataclass
+class OutgoingEmail:
+    to: str
+    subject: str
+    body: str
+    html: bool = True
+    key: Any = None  # The caller's id for the message, handed back in its result
+
+
+@dataclass
+class DeliveryResult:
+    email: OutgoingEmail
+    ok: bool
+    attempts: int
+    error: Optional[str] = None
+
+
+@dataclass
+class _Job:
+    email: OutgoingEmail
+    future: asyncio.Future
+    attempts: int = 0
+    throttled: bool = False  # Holds a rate-limit token already
+
+
+def parse_rate_limits(value: str) -> Dict[str, float]:
+    """Parse "gmail.com=50,outlook.com=20" into messages per second by recipient domain"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        domain, _, rate = item.partition("=")
+        limits[domain.strip().lower()] = float(rate)
+    return limits
+
+
+class DomainRateLimiter:
+    """Token bucket per recipient domain; a rate of 0 (or none) means unlimited"""
+
+    def __init__(self, rates: Dict[str, float], default_rate: float = 0.0):
+        self.rates = rates
+        self.default_rate = default_rate
+        self._buckets: Dict[str, List[float]] = {}  # domain -> [tokens, updated_at]
+
+    def reserve(self, domain: str) -> float:
+        """Take a token for `domain`; returns how many seconds until it may be used"""
+        rate = self.rates.get(domain, self.default_rate)
+        if rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        # A bucket holds up to one second's worth of tokens
+        bucket = self._buckets.setdefault(domain, [max(rate, 1.0), now])
+        bucket[0] = min(bucket[0] + (now - bucket[1]) * rate, max(rate, 1.0)) - 1
+        bucket[1] = now
+        return 0.0 if bucket[0] >= 0 else -bucket[0] / rate
+
+
+def smtp_from_settings() -> aiosmtplib.SMTP:
+    return aiosmtplib.SMTP(
+        hostname=settings.MAIL_SERVER,
+        port=settings.MAIL_PORT,
+        username=settings.MAIL_USERNAME or None,
+        password=settings.MAIL_PASSWORD or None,
+        start_tls=settings.MAIL_STARTTLS,
+        timeout=settings.EMAIL_SEND_TIMEOUT_SECONDS,
+    )
+
+
+def build_message(email: OutgoingEmail, sender: str) -> MIMEText:
+    # The compat32 MIME classes; EmailMessage's header parsing costs ~5x more per message
+    message = MIMEText(email.body, "html" if email.html else "plain", "utf-8")
+    message["From"] = sender
+    message["To"] = email.to
+    message["Subject"] = email.subject
+    return message
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= r.code < 500 for r in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class Mailer:
+    def __init__(
+        self,
+        connections: int = None,
+        queue_size: int = None,
+        rate_limiter: DomainRateLimiter = None,
+        max_retries: int = None,
+        backoff_seconds: float = None,
+        sender: str = None,
+        smtp_factory: Callable[[], aiosmtplib.SMTP] = smtp_from_settings,
+    ):
+        self.connections = connections or settings.EMAIL_CONNECTIONS
+        self.max_retries = settings.EMAIL_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_seconds = settings.EMAIL_RETRY_BACKOFF_SECONDS if backoff_seconds is None else backoff_seconds
+        self.sender = sender or settings.MAIL_FROM
+        self.rate_limiter = rate_limiter or DomainRateLimiter(
+            parse_rate_limits(settings.EMAIL_DOMAIN_RATE_LIMITS), settings.EMAIL_DEFAULT_RATE_PER_SECOND
+        )
+        self.smtp_factory = smtp_factory
+        self._capacity = asyncio.Semaphore(queue_size or settings.EMAIL_QUEUE_SIZE)
+        self._queue: "asyncio.Queue[_Job]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        for i in range(self.connections):
+            self._tasks.append(asyncio.create_task(self._sender(), name=f"mailer:{i}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self) -> "Mailer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def submit(self, email: OutgoingEmail) -> "asyncio.Future[DeliveryResult]":
+        """Queue one message, waiting while the queue is full; the future resolves once it's delivered or failed"""
+        await self._capacity.acquire()
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda _: self._capacity.release())
+        self._queue.put_nowait(_Job(email, future))
+        return future
+
+    async def send_many(self, emails: Iterable[OutgoingEmail]) -> List[DeliveryResult]:
+        futures = [await self.submit(email) for email in emails]
+        return list(await asyncio.gather(*futures))
+
+    def _later(self, delay: float, job: _Job) -> None:
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job)
+
+    @staticmethod
+    def _finish(job: _Job, result: DeliveryResult) -> None:
+        if not job.future.done():
+            job.future.set_result(result)
+
+    async def _sender(self) -> None:
+        smtp: Optional[aiosmtplib.SMTP] = None
+        try:
+            while True:
+                job = await self._queue.get()
+                if not job.throttled:
+                    delay = self.rate_limiter.reserve(job.email.to.rpartition("@")[2].lower())
+                    if delay > 0:
+                        job.throttled = True
+                        self._later(delay, job)
+                        continue
+                job.throttled = False
+                job.attempts += 1
+                try:
+                    if smtp is None or not smtp.is_connected:
+                        smtp = self.smtp_factory()
+                        await smtp.connect()
+                    await smtp.send_message(build_message(job.email, self.sender))
+                except Exception as e:
+                    if isinstance(e, CONNECTION_ERRORS) and smtp is not None:
+                        smtp.close()
+                        smtp = None
+                    if _is_transient(e) and job.attempts <= self.max_retries:
+                        backoff = self.backoff_seconds * 2 ** (job.attempts - 1)
+                        self._later(backoff * random.uniform(0.5, 1.5), job)
+                    else:
+                        self._finish(job, DeliveryResult(job.email, False, job.attempts, f"{type(e).__name__}: {e}"))
+                    continue
+                self._finish(job, DeliveryResult(job.email, True, job.attempts))
+        finally:
+            if smtp is not None and smtp.is_connected:
+                smtp.close()
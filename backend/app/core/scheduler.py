@@ -0,0 +1,54 @@
+# Periodic background jobs on the app's event loop
+#
+# Jobs are blocking callables run in the threadpool, first at startup and then every
+# `seconds` (measured start to start). The lifespan in main.py registers them and
+# starts/stops the scheduler. A failing run is logged and retried at the next
+# interval. Every worker process runs its own jobs, so jobs must be idempotent.
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, List
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    name: str
+    seconds: float
+    func: Callable[[], Any]
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs: List[Job] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def every(self, seconds: float, name: str, func: Callable[[], Any]) -> None:
+        self._jobs.append(Job(name, seconds, func))
+
+    def start(self) -> None:
+        for job in self._jobs:
+            self._tasks.append(asyncio.create_task(self._run(job), name=f"scheduler:{job.name}"))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self, job: Job) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await run_in_threadpool(job.func)
+            except Exception as e:
+                logger.error(f"Scheduled job {job.name} failed: {e}")
+            await asyncio.sleep(max(job.seconds - (time.monotonic() - started), 0))
+
+
+scheduler = Scheduler()
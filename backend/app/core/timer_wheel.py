@@ -0,0 +1,114 @@
+# Hierarchical timing wheel: keyed timers that expire in due order
+#
+# Level 0 has `slots` buckets of one tick each, level 1 `slots` buckets of `slots`
+# ticks, and so on. A timer goes into the coarsest bucket that still resolves it;
+# when the wheel reaches a coarse bucket, its timers are re-placed one level down
+# until they land in level 0 and expire. Scheduling and expiring are O(1) per timer
+# and advancing costs one step per tick, however many timers are pending and
+# however far out they are (timers beyond the top level ride the top level's last
+# bucket until they come within range).
+#
+# Each key has at most one timer, its earliest: scheduling a later time for a key
+# is a no-op, an earlier one supersedes the pending timer (the old entry is skipped
+# when its bucket comes up).
+
+import math
+import threading
+from datetime import datetime
+from typing import Dict, Hashable, List, Optional, Tuple
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class TimerWheel:
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 64, levels: int = 4, now: datetime = None):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self._buckets: List[List[List[Tuple[int, Hashable]]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._due: Dict[Hashable, int] = {}
+        self._ready: List[Tuple[int, Hashable]] = []
+        self._tick = self._floor(now or datetime.utcnow())
+        self._lock = threading.Lock()
+
+    def _seconds(self, when: datetime) -> float:
+        return (when - EPOCH).total_seconds() / self.tick_seconds
+
+    def _floor(self, when: datetime) -> int:
+        return math.floor(self._seconds(when))
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._due
+
+    def schedule(self, key: Hashable, when: datetime) -> None:
+        """Expire `key` at `when`, unless it already expires earlier"""
+        # Round up, so a timer never expires before its time
+        ticks = math.ceil(self._seconds(when))
+        with self._lock:
+            if self._due.get(key, ticks + 1) <= ticks:
+                return
+            self._due[key] = ticks
+            self._place(ticks, key)
+
+    def cancel(self, key: Hashable) -> None:
+        with self._lock:
+            self._due.pop(key, None)
+
+    def next_due(self) -> Optional[datetime]:
+        """When the earliest pending timer expires (a scan of the keys, not the buckets)"""
+        with self._lock:
+            ticks = min(self._due.values(), default=None)
+        if ticks is None:
+            return None
+        return datetime.utcfromtimestamp(ticks * self.tick_seconds)
+
+    def pop_due(self, now: datetime = None) -> List[Hashable]:
+        """Advance the wheel to `now` and return the keys that expired, earliest first"""
+        target = self._floor(now or datetime.utcnow())
+        with self._lock:
+            if not self._due:
+                self._tick = max(self._tick, target)
+            expired = []
+            while self._tick < target:
+                self._tick += 1
+                # Coarse buckets first, so their timers can fall through to level 0 this tick
+                for level in range(self.levels - 1, 0, -1):
+                    unit = self.slots ** level
+                    if self._tick % unit == 0:
+                        bucket = self._buckets[level][(self._tick // unit) % self.slots]
+                        entries = bucket[:]
+                        bucket.clear()
+                        for ticks, key in entries:
+                            self._place(ticks, key)
+                bucket = self._buckets[0][self._tick % self.slots]
+                expired.extend(bucket)
+                bucket.clear()
+            expired.extend(self._ready)
+            self._ready.clear()
+
+            due = []
+            for ticks, key in sorted(expired, key=lambda entry: entry[0]):
+                # Superseded entries no longer match the key's timer
+                if self._due.get(key) == ticks:
+                    del self._due[key]
+                    due.append(key)
+            return due
+
+    def _place(self, ticks: int, key: Hashable) -> None:
+        delta = ticks - self._tick
+        if delta <= 0:
+            self._ready.append((ticks, key))
+            return
+        for level in range(self.levels):
+            unit = self.slots ** level
+            span = unit * self.slots
+            if delta < span or level == self.levels - 1:
+                # Out of range: park in the farthest top-level bucket and re-place from there
+                slot_ticks = min(ticks, self._tick + span - 1)
+                self._buckets[level][(slot_ticks // unit) % self.slots].append((ticks, key))
+                return
@@ -4,14 +4,25 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal
 from app.seed_data import seed_database
 from alembic.config import Config
 from alembic import command
 import os
 from fastapi.staticfiles import StaticFiles
-from app.routers import dashboard, customers, orders, inventory, segments, flows, auth, users, admin
+from app.routers import dashboard, customers, orders, inventory, segments, flows, auth, users, admin, tracking
 from app.core.logger import setup_logging
+from app.core.scheduler import scheduler
+from app.config import settings
+from app.services.email_tracking import flush_events
+from app.services.flow_analytics import order_attribution
+from app.services.flow_delivery import FlowDeliveryWorker
+from app.services.flow_runtime import advance_flows, enroll_active_flows
+from app.services.forecasting import refresh_forecasts
+from app.services.insights import refresh_insights
+from app.services.inventory_stats import refresh_inventory_snapshot
+from app.services.partitioning import refresh_order_partitions
+from app.services.top_products import top_products
 
 
 @asynccontextmanager
@@ -43,7 +54,45 @@ async def lifespan(app: FastAPI):
 
     # Seed data on startup
     seed_database()
+
+    # Warm the top-products sketches from the daily rollups
+    try:
+        with SessionLocal() as db:
+            top_products.load_from_rollups(db)
+    except Exception as e:
+        logger.error(f"Error loading top products: {e}")
+
+    # Periodic jobs
+    if settings.INSIGHTS_INTERVAL_SECONDS > 0:
+        scheduler.every(settings.INSIGHTS_INTERVAL_SECONDS, "insights", refresh_insights)
+    scheduler.every(settings.INVENTORY_SNAPSHOT_INTERVAL_SECONDS, "inventory_snapshot", refresh_inventory_snapshot)
+    scheduler.every(settings.FORECAST_INTERVAL_SECONDS, "forecast", refresh_forecasts)
+    if settings.ORDERS_PARTITIONING:
+        # Keeps future monthly order partitions ahead of incoming orders
+        scheduler.every(settings.ORDERS_PARTITION_INTERVAL_SECONDS, "order_partitions", refresh_order_partitions)
+    if settings.FLOW_WORKER_IN_APP:
+        scheduler.every(settings.FLOW_ENROLL_INTERVAL_SECONDS, "flow_enroll", enroll_active_flows)
+        scheduler.every(settings.FLOW_WORKER_INTERVAL_SECONDS, "flow_advance", advance_flows)
+        scheduler.every(settings.FLOW_ATTRIBUTION_INTERVAL_SECONDS, "flow_attribution", order_attribution.run)
+    scheduler.every(settings.EMAIL_EVENTS_FLUSH_SECONDS, "email_events", flush_events)
+    scheduler.start()
+
+    # Send queued flow messages
+    delivery = None
+    if settings.EMAIL_DELIVERY_IN_APP and settings.MAIL_SERVER:
+        delivery = FlowDeliveryWorker()
+        await delivery.start()
+    elif settings.EMAIL_DELIVERY_IN_APP:
+        logger.warning("MAIL_SERVER is not set; flow messages stay queued")
     yield
+    if delivery is not None:
+        await delivery.stop()
+    await scheduler.stop()
+    # Open/click events received since the last flush
+    try:
+        flush_events()
+    except Exception as e:
+        logger.error(f"Error flushing email events: {e}")
 
 
 app = FastAPI(
@@ -75,6 +124,7 @@ app.include_router(orders.router, prefix="/api/orders", tags=["Orders"])
 app.include_router(inventory.router, prefix="/api/inventory", tags=["Inventory"])
 app.include_router(segments.router, prefix="/api/segments", tags=["Segments"])
 app.include_router(flows.router, prefix="/api/flows", tags=["Flows"])
+app.include_router(tracking.router, prefix="/api/track", tags=["Tracking"])
 
 
 @app.get("/")
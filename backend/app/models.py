@@ -1,6 +1,6 @@
 # SQLAlchemy Models for Customer Data Platform
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Text, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, ForeignKey, Boolean, Text, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -49,6 +49,23 @@ class FlowTrigger(str, enum.Enum):
     MANUAL = "manual"
 
 
+class EnrollmentStatus(str, enum.Enum):
+    ACTIVE = "active"
+    COMPLETED = "completed"
+
+
+class FlowMessageStatus(str, enum.Enum):
+    QUEUED = "queued"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+
+class EmailEventType(str, enum.Enum):
+    OPEN = "open"
+    CLICK = "click"
+
+
 class UserRole(str, enum.Enum):
     SUPER_ADMIN = "SUPER_ADMIN"
     ADMIN = "ADMIN"
@@ -104,6 +121,10 @@ class Customer(Base):
     # Relationships
     orders = relationship("Order", back_populates="customer")
 
+    __table_args__ = (
+        Index("ix_customers_created_at", "created_at"),  # Dashboard new-customer windows
+    )
+
 
 # ============== ORDER MODEL ==============
 
@@ -118,9 +139,22 @@ class Order(Base):
     total_amount = Column(Float, nullable=False)
     shipping_address = Column(Text, nullable=True)
     
+    # Denormalized lower("order_id first last email") for order search (see services/order_search.py)
+    search_text = Column(String, nullable=True)
+    
     customer = relationship("Customer", back_populates="orders")
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_orders_customer_id_date", "customer_id", "date"),  # Customer details / history
+        Index("ix_orders_date_status", "date", "status"),  # Dashboard revenue windows
+        Index("ix_orders_status_date", "status", "date"),  # Orders list filtered by status
+        Index("ix_orders_total_amount_id", "total_amount", "id"),  # Orders list sorted by amount (keyset pages)
+        # Order search (PostgreSQL only, created by migration c3e8a1f0d6b2)
+        Index("ix_orders_order_id_pattern", "order_id", postgresql_ops={"order_id": "varchar_pattern_ops"}),
+        Index("ix_orders_search_text_trgm", "search_text", postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"}),
+    )
+
 
 # ============== ORDER ITEM MODEL (for tracking product sales) ==============
 
@@ -136,6 +170,11 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="order_items")
 
+    __table_args__ = (
+        Index("ix_order_items_order_id_product_id", "order_id", "product_id"),  # Items of an order
+        Index("ix_order_items_product_id_order_id", "product_id", "order_id"),  # Sales of a product
+    )
+
 
 # ============== PRODUCT MODEL ==============
 
@@ -149,13 +188,68 @@ class Product(Base):
     stock_level = Column(Integer, default=0)
     price = Column(Float, nullable=False)
     status = Column(String, default=StockStatus.IN_STOCK)
-    predicted_need = Column(String, nullable=True)
+    predicted_need = Column(String, nullable=True)  # Order Now / Restock Soon / Healthy, see services/forecasting.py
+    sales_velocity = Column(Float, nullable=True)  # Units per day
+    reorder_point = Column(Float, nullable=True)  # Units; "Order Now" at or below it
+    days_until_stockout = Column(Float, nullable=True)  # NULL while not selling
     category = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship to track sales
     order_items = relationship("OrderItem", back_populates="product")
 
+    __table_args__ = (
+        Index("ix_products_status", "status"),
+        Index("ix_products_category", "category"),
+        Index("ix_products_predicted_need", "predicted_need"),
+        Index("ix_products_days_until_stockout", "days_until_stockout"),
+    )
+
+
+class InventorySnapshot(Base):
+    """Daily inventory totals, the baseline for skus_change"""
+    __tablename__ = "inventory_snapshots"
+
+    day = Column(Date, primary_key=True)
+    total_skus = Column(Integer, nullable=False)
+    low_stock = Column(Integer, nullable=False)
+    out_of_stock = Column(Integer, nullable=False)
+    inventory_value = Column(Float, nullable=False)
+
+
+# ============== TABLE VERSIONS (Cache invalidation) ==============
+# Bumped in the same transaction as writes to a table, so every worker can tell
+# whether its cached aggregates are current with one primary-key lookup
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+
+    table_name = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+# ============== SALES ROLLUPS (Dashboard) ==============
+# Maintained on order writes and rebuilt by `python -m app.services.sales_rollup backfill`
+
+class DailySales(Base):
+    __tablename__ = "daily_sales"
+
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False, default=0)  # Non-cancelled orders only
+    orders = Column(Integer, nullable=False, default=0)  # Non-cancelled orders
+    cancelled = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)  # Items sold in non-cancelled orders
+    new_customers = Column(Integer, nullable=False, default=0)  # Customers created that day
+
+
+class DailyProductSales(Base):
+    __tablename__ = "daily_product_sales"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    units = Column(Integer, nullable=False, default=0)  # Non-cancelled orders only
+    revenue = Column(Float, nullable=False, default=0)
+
 
 # ============== SEGMENT MODEL (CDP Feature) ==============
 
@@ -228,6 +322,7 @@ class FlowStep(Base):
     content = Column(Text, nullable=True)  # Email body/template
     delay_days = Column(Integer, default=0)  # Days to wait before this step
     delay_hours = Column(Integer, default=0)  # Hours to wait
+    version = Column(Integer, default=1, server_default="1", nullable=False)  # Bumped when subject or content changes
     
     # Metrics for this step
     sent_count = Column(Integer, default=0)
@@ -239,6 +334,87 @@ class FlowStep(Base):
     flow = relationship("Flow", back_populates="steps")
 
 
+class FlowEnrollment(Base):
+    """A customer's position in a flow, advanced by services/flow_runtime.py"""
+    __tablename__ = "flow_enrollments"
+
+    id = Column(Integer, primary_key=True)
+    flow_id = Column(Integer, ForeignKey("flows.id", ondelete="CASCADE"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default=EnrollmentStatus.ACTIVE)
+    step_order = Column(Integer, nullable=True)  # FlowStep.order of the next step to run
+    due_at = Column(DateTime, nullable=True)  # When that step runs; NULL once completed
+    enrolled_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_flow_enrollments_flow_customer", "flow_id", "customer_id", unique=True),
+        Index("ix_flow_enrollments_due", "flow_id", "status", "due_at"),
+        Index("ix_flow_enrollments_customer_id", "customer_id"),
+    )
+
+
+class FlowMessage(Base):
+    """Outbox of flow emails, written in the transaction that advances the enrollment"""
+    __tablename__ = "flow_messages"
+
+    id = Column(Integer, primary_key=True)
+    flow_id = Column(Integer, ForeignKey("flows.id", ondelete="CASCADE"), nullable=False)
+    step_id = Column(Integer, ForeignKey("flow_steps.id", ondelete="CASCADE"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+    status = Column(String, nullable=False, default=FlowMessageStatus.QUEUED)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    claimed_at = Column(DateTime, nullable=True)  # Set while a delivery worker is sending it
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")  # Times claimed for delivery
+    error = Column(Text, nullable=True)  # Why the last attempt failed
+    sent_at = Column(DateTime, nullable=True)
+    opened_at = Column(DateTime, nullable=True)  # First open (or click), from services/email_tracking.py
+    clicked_at = Column(DateTime, nullable=True)  # First click
+    # orders.id of the order credited to it (it was that order's last touch), see
+    # services/flow_analytics.py. No foreign key: orders may be partitioned or archived
+    order_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_flow_messages_status", "status", "id"),
+        Index("ix_flow_messages_customer_id", "customer_id"),
+        Index("ix_flow_messages_order_id", "order_id"),  # Orders already credited
+    )
+
+
+class EmailEvent(Base):
+    """Raw open/click events of flow messages, appended in batches by services/email_tracking.py"""
+    __tablename__ = "email_events"
+
+    id = Column(Integer, primary_key=True)
+    message_id = Column(Integer, ForeignKey("flow_messages.id", ondelete="CASCADE"), nullable=False, index=True)
+    flow_id = Column(Integer, ForeignKey("flows.id", ondelete="CASCADE"), nullable=False)
+    step_id = Column(Integer, nullable=False)
+    customer_id = Column(Integer, nullable=False)
+    event_type = Column(String, nullable=False)  # open, click
+    url = Column(Text, nullable=True)  # Link clicked
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_email_events_flow_created", "flow_id", "created_at"),
+    )
+
+
+class FlowStepStats(Base):
+    """Hourly funnel counts per flow step, maintained by services/flow_analytics.py"""
+    __tablename__ = "flow_step_stats"
+
+    flow_id = Column(Integer, ForeignKey("flows.id", ondelete="CASCADE"), primary_key=True)
+    step_id = Column(Integer, ForeignKey("flow_steps.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # Start of the hour
+    sent = Column(Integer, nullable=False, default=0)
+    opened = Column(Integer, nullable=False, default=0)  # First opens
+    clicked = Column(Integer, nullable=False, default=0)  # First clicks
+    ordered = Column(Integer, nullable=False, default=0)  # Messages credited with an order
+    revenue = Column(Float, nullable=False, default=0)  # Of those orders
+    open_seconds = Column(Float, nullable=False, default=0)  # Sum of send-to-first-open times
+
+
 # ============== INSIGHT MODEL (Dashboard) ==============
 
 class Insight(Base):
@@ -249,9 +425,23 @@ class Insight(Base):
     description = Column(String, nullable=False)
     type = Column(String, nullable=False)  # positive, warning, info
     icon = Column(String, nullable=True)
-    time_ago = Column(String, nullable=False)
+    key = Column(String, nullable=True)  # Dedupes generated insights, e.g. "revenue_spike:2026-01-31"
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_insights_key", "key", unique=True),
+        Index("ix_insights_created_at", "created_at"),
+    )
+
+
+class SegmentSizeSnapshot(Base):
+    """Daily segment sizes recorded by the insights generator to spot jumps"""
+    __tablename__ = "segment_size_snapshots"
+
+    segment_id = Column(Integer, ForeignKey("segments.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    customer_count = Column(Integer, nullable=False)
+
 # ============== USER MODEL (Auth & Profile) ==============
 
 class User(Base):
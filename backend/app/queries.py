@@ -0,0 +1,156 @@
+# Read queries of the routers' hot paths, as select() statements
+#
+# The routers execute these, and benchmarks/check_query_plans.py EXPLAINs the very
+# same statements, so the plan check can't drift from what the API actually runs.
+# Builders take plain values (ids, filters, `now`) and don't need a session.
+
+from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import desc, func, or_, select
+from sqlalchemy.sql import Select
+
+from app.models import Customer, Order, OrderItem, Product
+from app.serializers import ORDER_COLUMNS
+from app.services.order_search import order_search_filter
+from app.utils.pagination import keyset_filter
+
+# Window of the customer details monthly spending trend
+MONTHLY_SPENDING_DAYS = 180
+
+
+# ============== ORDERS ==============
+
+def order_list_filters(search: Optional[str] = None, status: Optional[str] = None) -> list:
+    """WHERE clauses of the orders list: order id prefix or search_text match, and status"""
+    filters = []
+    if search:
+        filters.append(order_search_filter(search))
+    if status:
+        filters.append(Order.status == status)
+    return filters
+
+
+def order_count(filters: list) -> Select:
+    """Total of the orders list, on orders alone without the projection"""
+    return select(func.count(Order.id)).where(*filters)
+
+
+def order_page(filters: list, sort_by: str, sort_order: str, after: Optional[Tuple[Any, int]] = None) -> Select:
+    """
+    Orders list rows (ORDER_COLUMNS, customer names joined in), sorted with id as the
+    tie-breaker so pages are stable. `after` is the (sort value, id) of a cursor;
+    the caller adds OFFSET (without one) and LIMIT.
+    """
+    sort_column = getattr(Order, sort_by)
+    stmt = select(*ORDER_COLUMNS).join(Customer, Order.customer_id == Customer.id).where(*filters)
+    if after is not None:
+        stmt = stmt.where(keyset_filter(sort_column, Order.id, sort_order, *after))
+    if sort_order == "desc":
+        return stmt.order_by(sort_column.desc(), Order.id.desc())
+    return stmt.order_by(sort_column.asc(), Order.id.asc())
+
+
+def order_items(order_id: int) -> Select:
+    """Items of an order; product details come from the catalog cache"""
+    return select(OrderItem.quantity, OrderItem.price_at_purchase, OrderItem.product_id).where(
+        OrderItem.order_id == order_id
+    )
+
+
+# ============== CUSTOMER DETAILS ==============
+
+def customer_orders(customer_id: int) -> Select:
+    return select(Order).where(Order.customer_id == customer_id).order_by(desc(Order.date))
+
+
+def customer_order_items(order_id: int) -> Select:
+    return select(
+        OrderItem.quantity,
+        OrderItem.price_at_purchase,
+        Product.name.label("product_name"),
+        Product.image_url,
+    ).join(Product, Product.id == OrderItem.product_id).where(OrderItem.order_id == order_id)
+
+
+def customer_top_products(customer_id: int, by: str, limit: int = 3) -> Select:
+    """A customer's most bought products by "quantity" or "value", as (name, total)"""
+    if by == "quantity":
+        total = func.sum(OrderItem.quantity)
+    else:
+        total = func.sum(OrderItem.quantity * OrderItem.price_at_purchase)
+    return (
+        select(Product.name, total.label("total"))
+        .join(OrderItem, OrderItem.product_id == Product.id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(Order.customer_id == customer_id)
+        .group_by(Product.name)
+        .order_by(desc(total))
+        .limit(limit)
+    )
+
+
+def customer_status_counts(customer_id: int) -> Select:
+    return select(Order.status, func.count(Order.id).label("count")).where(
+        Order.customer_id == customer_id
+    ).group_by(Order.status)
+
+
+def customer_monthly_spending(customer_id: int, now: datetime) -> Select:
+    """(month "YYYY-MM", total) over the last MONTHLY_SPENDING_DAYS; PostgreSQL (to_char) only"""
+    month = func.to_char(Order.date, "YYYY-MM")
+    return (
+        select(month.label("month"), func.sum(Order.total_amount).label("total"))
+        .where(Order.customer_id == customer_id, Order.date >= now - timedelta(days=MONTHLY_SPENDING_DAYS))
+        .group_by(month)
+        .order_by("month")
+    )
+
+
+# ============== PRODUCTS ==============
+
+def filter_products(query, search, status, category, min_price, max_price, predicted_need, max_days_until_stockout):
+    """Apply the inventory list filters to a Query or select() over products"""
+    
+    # Apply search filter
+    if search:
+        search_term = f"%{search}%"
+        query = query.filter(
+            or_(
+                Product.name.ilike(search_term),
+                Product.sku.ilike(search_term)
+            )
+        )
+    
+    # Apply status filter
+    if status:
+        query = query.filter(Product.status == status)
+    
+    # Apply category filter
+    if category:
+        query = query.filter(Product.category == category)
+        
+    # Apply price filters
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+        
+    # Apply forecast filters (stored by services/forecasting.py)
+    if predicted_need:
+        query = query.filter(Product.predicted_need == predicted_need)
+    if max_days_until_stockout is not None:
+        query = query.filter(Product.days_until_stockout <= max_days_until_stockout)
+    
+    return query
+
+
+def product_order(sort_by: str, sort_order: str):
+    """ORDER BY clauses for the inventory sort options; Product.id makes the order total"""
+    
+    sort_column = getattr(Product, sort_by)
+    order = sort_column.desc() if sort_order == "desc" else sort_column.asc()
+    if sort_by in ("days_until_stockout", "sales_velocity"):
+        # Products that aren't selling have no forecast; list them last either way
+        order = order.nulls_last()
+    return order, Product.id
@@ -7,49 +7,19 @@ from typing import Optional
 
 from app.database import get_db
 from app.models import Customer
+from app.queries import (
+    customer_orders, customer_order_items, customer_top_products, customer_status_counts,
+    customer_monthly_spending
+)
 from app.schemas import CustomerResponse, CustomerListResponse, CustomerCreate, CustomerUpdate
+from app.serializers import CUSTOMER_COLUMNS, customer_row, customer_to_response, json_response
+from app.services.order_search import refresh_order_search_text
+from app.services.sales_rollup import record_new_customers
+from app.services.dashboard_events import publish_customer_created
 
 router = APIRouter()
 
 
-def customer_to_response(customer: Customer) -> CustomerResponse:
-    """Convert Customer model to response"""
-    name = None
-    if customer.first_name and customer.last_name:
-        name = f"{customer.first_name} {customer.last_name}"
-    elif customer.first_name:
-        name = customer.first_name
-    elif customer.last_name:
-        name = customer.last_name
-    
-    return CustomerResponse(
-        id=customer.id,
-        email=customer.email,
-        first_name=customer.first_name,
-        last_name=customer.last_name,
-        name=name,
-        phone=customer.phone,
-        avatar_url=customer.avatar_url,
-        city=customer.city,
-        state=customer.state,
-        country=customer.country,
-        zip_code=customer.zip_code,
-        status=customer.status,
-        total_orders=customer.total_orders,
-        total_spend=customer.total_spend,
-        lifetime_value=customer.lifetime_value,
-        average_order_value=customer.average_order_value,
-        first_order_date=customer.first_order_date,
-        last_order_date=customer.last_order_date,
-        email_opt_in=customer.email_opt_in,
-        sms_opt_in=customer.sms_opt_in,
-        source=customer.source,
-        tags=customer.tags or [],
-        created_at=customer.created_at,
-        updated_at=customer.updated_at
-    )
-
-
 @router.get("", response_model=CustomerListResponse)
 async def get_customers(
     page: int = Query(1, ge=1),
@@ -65,7 +35,7 @@ async def get_customers(
 ):
     """Get paginated list of customers with optional filters"""
     
-    query = db.query(Customer)
+    query = db.query(*CUSTOMER_COLUMNS)
     
     # Apply search filter
     if search:
@@ -101,14 +71,14 @@ async def get_customers(
     
     # Apply pagination
     offset = (page - 1) * per_page
-    customers = query.offset(offset).limit(per_page).all()
-    
-    return CustomerListResponse(
-        customers=[customer_to_response(c) for c in customers],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    rows = query.offset(offset).limit(per_page).all()
+    
+    return json_response({
+        "customers": [customer_row(r) for r in rows],
+        "total": total,
+        "page": page,
+        "per_page": per_page
+    })
 
 
 @router.get("/states")
@@ -140,8 +110,7 @@ async def get_customer(customer_id: int, db: Session = Depends(get_db)):
 @router.get("/{customer_id}/details")
 async def get_customer_details(customer_id: int, db: Session = Depends(get_db)):
     """Get detailed customer data with orders and insights"""
-    from app.models import Order, OrderItem, Product
-    from sqlalchemy import func, desc
+    from datetime import datetime
     
     customer = db.query(Customer).filter(Customer.id == customer_id).first()
     
@@ -149,17 +118,12 @@ async def get_customer_details(customer_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Customer not found")
     
     # Get customer orders
-    orders = db.query(Order).filter(Order.customer_id == customer_id).order_by(desc(Order.date)).all()
+    orders = db.scalars(customer_orders(customer_id)).all()
     
     # Get order items for each order
     orders_data = []
     for order in orders:
-        items = db.query(
-            OrderItem.quantity,
-            OrderItem.price_at_purchase,
-            Product.name.label('product_name'),
-            Product.image_url
-        ).join(Product).filter(OrderItem.order_id == order.id).all()
+        items = db.execute(customer_order_items(order.id)).all()
         
         orders_data.append({
             "id": order.id,
@@ -182,53 +146,30 @@ async def get_customer_details(customer_id: int, db: Session = Depends(get_db)):
     insights = {}
     
     # 1. Top purchased products by quantity
-    top_products_by_qty = db.query(
-        Product.name,
-        func.sum(OrderItem.quantity).label('total_qty')
-    ).join(OrderItem).join(Order).filter(
-        Order.customer_id == customer_id
-    ).group_by(Product.name).order_by(desc(func.sum(OrderItem.quantity))).limit(3).all()
+    top_products_by_qty = db.execute(customer_top_products(customer_id, "quantity")).all()
     
     insights['top_products_by_quantity'] = [
-        {"name": p.name, "quantity": int(p.total_qty)}
+        {"name": p.name, "quantity": int(p.total)}
         for p in top_products_by_qty
     ]
     
     # 2. Top purchased products by value
-    top_products_by_value = db.query(
-        Product.name,
-        func.sum(OrderItem.quantity * OrderItem.price_at_purchase).label('total_value')
-    ).join(OrderItem).join(Order).filter(
-        Order.customer_id == customer_id
-    ).group_by(Product.name).order_by(desc(func.sum(OrderItem.quantity * OrderItem.price_at_purchase))).limit(3).all()
+    top_products_by_value = db.execute(customer_top_products(customer_id, "value")).all()
     
     insights['top_products_by_value'] = [
-        {"name": p.name, "value": round(float(p.total_value), 2)}
+        {"name": p.name, "value": round(float(p.total), 2)}
         for p in top_products_by_value
     ]
     
     # 3. Order count by status
-    order_status_counts = db.query(
-        Order.status,
-        func.count(Order.id).label('count')
-    ).filter(Order.customer_id == customer_id).group_by(Order.status).all()
+    order_status_counts = db.execute(customer_status_counts(customer_id)).all()
     
     insights['order_status_breakdown'] = {
         status: count for status, count in order_status_counts
     }
     
-    # 4. Monthly spending trend (last 6 months)
-    from datetime import datetime, timedelta
-    six_months_ago = datetime.utcnow() - timedelta(days=180)
-    
-    # Use PostgreSQL to_char instead of SQLite strftime
-    monthly_spending = db.query(
-        func.to_char(Order.date, 'YYYY-MM').label('month'),
-        func.sum(Order.total_amount).label('total')
-    ).filter(
-        Order.customer_id == customer_id,
-        Order.date >= six_months_ago
-    ).group_by(func.to_char(Order.date, 'YYYY-MM')).order_by('month').all()
+    # 4. Monthly spending trend (last 6 months; PostgreSQL to_char)
+    monthly_spending = db.execute(customer_monthly_spending(customer_id, datetime.utcnow())).all()
     
     insights['monthly_spending'] = [
         {"month": m.month, "amount": round(float(m.total), 2)}
@@ -295,8 +236,11 @@ async def create_customer(customer_data: CustomerCreate, db: Session = Depends(g
     )
     
     db.add(db_customer)
+    db.flush()
+    record_new_customers(db, [db_customer.created_at])
     db.commit()
     db.refresh(db_customer)
+    publish_customer_created()
     
     return customer_to_response(db_customer)
 
@@ -323,6 +267,11 @@ async def update_customer(
             else:
                 setattr(customer, field, value)
     
+    # Keep the denormalized order search column in sync with the customer's name/email
+    if {"first_name", "last_name", "email"} & update_fields.keys():
+        db.flush()
+        refresh_order_search_text(db, [customer_id])
+    
     db.commit()
     db.refresh(customer)
     
@@ -338,6 +287,9 @@ async def delete_customer(customer_id: int, db: Session = Depends(get_db)):
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     
+    # The customer no longer counts as new on the day it was created
+    if customer.created_at:
+        record_new_customers(db, [customer.created_at], delta=-1)
     db.delete(customer)
     db.commit()
     
@@ -1,154 +1,130 @@
 # Dashboard API endpoints with real CDP statistics from database
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import date
+import time
+from typing import Optional
 
-from app.database import get_db
-from app.models import Customer, Order, OrderItem, Product, Segment, Flow
-from app.schemas import DashboardStats
+from app.config import settings
+from app.core.cache import StaleWhileRevalidateCache
+from app.core.events import sse_frame
+from app.database import SessionLocal, get_db
+from app.models import Insight
+from app.schemas import DashboardStats, InsightListResponse
+from app.serializers import json_response
+from app.services.dashboard_events import dashboard_events
+from app.services.dashboard_stats import compute_dashboard_stats
+from app.services.sales_timeseries import TIMESERIES_METRICS, TimeseriesError, parse_metrics, sales_timeseries
+from app.services.top_products import top_products_report
 
 router = APIRouter()
 
+# Most-hit endpoint: serve seconds-old numbers and recompute at most once per TTL
+stats_cache = StaleWhileRevalidateCache(
+    ttl=settings.DASHBOARD_STATS_TTL_SECONDS,
+    max_stale=settings.DASHBOARD_STATS_MAX_STALE_SECONDS
+)
+
+# Open streams re-read the (cached) stats this often
+STREAM_RESYNC_SECONDS = 60
+
+
+def load_dashboard_stats() -> DashboardStats:
+    """Compute the stats with a session of their own (may run after the request ended)"""
+    db = SessionLocal()
+    try:
+        return compute_dashboard_stats(db)
+    finally:
+        db.close()
+
 
 @router.get("/stats", response_model=DashboardStats)
-async def get_dashboard_stats(db: Session = Depends(get_db)):
-    """Get dashboard overview statistics calculated from real database data"""
-    
-    # Time ranges
-    now = datetime.utcnow()
-    thirty_days_ago = now - timedelta(days=30)
-    sixty_days_ago = now - timedelta(days=60)
-    
-    # Customer stats
-    total_customers = db.query(Customer).count()
-    
-    # Customers created before 30 days ago (existing customers last month)
-    customers_last_month = db.query(Customer).filter(Customer.created_at < thirty_days_ago).count()
-    new_customers_this_month = total_customers - customers_last_month
-    customers_change = round((new_customers_this_month / max(customers_last_month, 1)) * 100, 1)
-    
-    # Revenue stats (sum of all orders in last 30 days)
-    total_revenue = db.query(func.sum(Order.total_amount)).filter(
-        Order.date >= thirty_days_ago,
-        Order.status != "Cancelled"
-    ).scalar() or 0
-    
-    # Previous 30 days revenue for change calculation
-    prev_revenue = db.query(func.sum(Order.total_amount)).filter(
-        Order.date >= sixty_days_ago,
-        Order.date < thirty_days_ago,
-        Order.status != "Cancelled"
-    ).scalar() or 0
-    
-    revenue_change = round(((total_revenue - prev_revenue) / max(prev_revenue, 1)) * 100, 1) if prev_revenue > 0 else 0
-    
-    # Order stats for last 30 days
-    total_orders = db.query(Order).filter(
-        Order.date >= thirty_days_ago,
-        Order.status != "Cancelled"
-    ).count()
-    average_order_value = round(total_revenue / max(total_orders, 1), 2)
-    
-    # Calculate AOV change
-    prev_orders = db.query(Order).filter(
-        Order.date >= sixty_days_ago,
-        Order.date < thirty_days_ago,
-        Order.status != "Cancelled"
-    ).count()
-    prev_aov = round(prev_revenue / max(prev_orders, 1), 2)
-    aov_change = round(average_order_value - prev_aov, 2)
-    
-    # Customer retention (customers with more than 1 order)
-    returning_customers = db.query(Customer).filter(Customer.total_orders > 1).count()
-    new_customers = db.query(Customer).filter(Customer.total_orders <= 1).count()
-    customer_retention = round((returning_customers / max(total_customers, 1)) * 100, 1)
-    
-    # Top selling product (calculated from actual OrderItems)
-    top_product_result = db.query(
-        Product.id,
-        Product.name,
-        Product.price,
-        Product.image_url,
-        func.sum(OrderItem.quantity).label('units_sold')
-    ).join(
-        OrderItem, OrderItem.product_id == Product.id
-    ).join(
-        Order, Order.id == OrderItem.order_id
-    ).filter(
-        Order.date >= thirty_days_ago,
-        Order.status != "Cancelled"
-    ).group_by(
-        Product.id, Product.name, Product.price, Product.image_url
-    ).order_by(
-        func.sum(OrderItem.quantity).desc()
-    ).first()
-    
-    if top_product_result:
-        top_product = {
-            "name": top_product_result.name,
-            "units_sold": int(top_product_result.units_sold),
-            "price": top_product_result.price,
-            "image_url": top_product_result.image_url
-        }
-    else:
-        # Fallback if no orders
-        first_product = db.query(Product).first()
-        top_product = {
-            "name": first_product.name if first_product else "No products",
-            "units_sold": 0,
-            "price": first_product.price if first_product else 0,
-            "image_url": first_product.image_url if first_product else None
-        }
-    
-    # Top regions from customer states
-    state_counts = db.query(
-        Customer.state, 
-        func.count(Customer.id).label('count')
-    ).filter(
-        Customer.state.isnot(None)
-    ).group_by(Customer.state).order_by(func.count(Customer.id).desc()).limit(3).all()
-    
-    total_with_state = sum([s[1] for s in state_counts]) or 1
-    top_regions = [
-        {"name": state, "percentage": round((count / total_with_state) * 100)}
-        for state, count in state_counts
-    ]
-    
-    # Inventory stats
-    total_skus = db.query(Product).count()
-    low_stock_alerts = db.query(Product).filter(Product.status == "LOW_STOCK").count()
-    out_of_stock = db.query(Product).filter(Product.status == "OUT_OF_STOCK").count()
-    inventory_value = db.query(func.sum(Product.price * Product.stock_level)).scalar() or 0
-    
-    # CDP specific stats
-    total_segments = db.query(Segment).count()
-    active_flows = db.query(Flow).filter(Flow.status == "active").count()
-    
-    # Email opt-in rate
-    opted_in = db.query(Customer).filter(Customer.email_opt_in == True).count()
-    email_opt_in_rate = round((opted_in / max(total_customers, 1)) * 100, 1)
-    
-    return DashboardStats(
-        total_customers=total_customers,
-        customers_change=customers_change,
-        customers_last_month=customers_last_month,
-        total_revenue=round(total_revenue, 2),
-        revenue_change=revenue_change,
-        total_orders=total_orders,
-        average_order_value=average_order_value,
-        aov_change=aov_change,
-        customer_retention=customer_retention,
-        returning_customers=returning_customers,
-        new_customers=new_customers,
-        top_product=top_product,
-        top_regions=top_regions,
-        total_skus=total_skus,
-        low_stock_alerts=low_stock_alerts,
-        out_of_stock=out_of_stock,
-        inventory_value=round(inventory_value, 2),
-        total_segments=total_segments,
-        active_flows=active_flows,
-        email_opt_in_rate=email_opt_in_rate
+async def get_dashboard_stats(response: Response):
+    """
+    Get dashboard overview statistics calculated from real database data.
+    
+    Served from a stale-while-revalidate cache: X-Cache is HIT, STALE (an expired
+    value, with a refresh running in the background) or MISS, and X-Computed-At /
+    `computed_at` tell when the numbers were computed.
+    """
+    entry, cache_status = await stats_cache.get("stats", load_dashboard_stats)
+    stats = entry.value
+    response.headers["X-Cache"] = cache_status
+    response.headers["X-Computed-At"] = stats.computed_at.isoformat()
+    return stats
+
+
+
+@router.get("/stream")
+async def stream_dashboard():
+    """
+    Server-Sent Events feed for open dashboards.
+    
+    Starts with a `snapshot` event (the cached stats), then pushes `orders`,
+    `customers` and `stock_alert` deltas as writes happen (see
+    services/dashboard_events.py). Every event is encoded once for all clients.
+    A new snapshot from the shared cache is sent every STREAM_RESYNC_SECONDS so
+    deltas applied on the client never drift for long.
+    """
+    async def snapshot() -> bytes:
+        entry, _ = await stats_cache.get("stats", load_dashboard_stats)
+        return sse_frame("snapshot", entry.value.model_dump())
+    
+    async def events():
+        yield await snapshot()
+        last_sync = time.monotonic()
+        async for frame in dashboard_events.subscribe():
+            yield frame
+            if time.monotonic() - last_sync >= STREAM_RESYNC_SECONDS:
+                yield await snapshot()
+                last_sync = time.monotonic()
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
+
+@router.get("/timeseries")
+async def get_dashboard_timeseries(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    granularity: str = Query("day", regex="^(day|week|month)$"),
+    metrics: Optional[str] = Query(None, description=f"Comma-separated subset of {', '.join(TIMESERIES_METRICS)}"),
+    db: Session = Depends(get_db)
+):
+    """Revenue, orders, AOV, new customers and units per day/week/month between from and to (inclusive)"""
+    try:
+        payload = sales_timeseries(db, from_date, to_date, granularity, parse_metrics(metrics))
+    except TimeseriesError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(payload)
+
+@router.get("/top-products")
+async def get_top_products(
+    days: int = Query(30, ge=1, le=settings.TOP_PRODUCTS_WINDOW_DAYS),
+    limit: int = Query(5, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Best sellers by units and by revenue over the last `days` days, from in-memory
+    sketches. `error` is the most a `value` may be overstated by (0 means exact).
+    """
+    return json_response(top_products_report(db, days, limit))
+
+@router.get("/insights", response_model=InsightListResponse)
+async def get_insights(
+    page: int = Query(1, ge=1),
+    per_page: int = Query(10, ge=1, le=100),
+    type: Optional[str] = Query(None, regex="^(positive|warning|info)$"),
+    db: Session = Depends(get_db)
+):
+    """Generated insights, newest first"""
+    query = db.query(Insight)
+    if type:
+        query = query.filter(Insight.type == type)
+    total = query.count()
+    insights = query.order_by(Insight.created_at.desc(), Insight.id.desc()).offset((page - 1) * per_page).limit(per_page).all()
+    return InsightListResponse(insights=insights, total=total, page=page, per_page=per_page)
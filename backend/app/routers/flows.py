@@ -1,17 +1,24 @@
 # Flows API endpoints
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.database import get_db
-from app.models import Flow, FlowStep, Segment
+from app.models import (
+    EmailEvent, EnrollmentStatus, Flow, FlowEnrollment, FlowMessage, FlowMessageStatus, FlowStatus, FlowStep,
+    FlowStepStats, Segment
+)
 from app.schemas import (
     FlowCreate, FlowUpdate, FlowResponse, FlowListResponse,
     FlowStepCreate, FlowStepUpdate, FlowStepResponse,
-    AIFlowRequest
+    FlowEnrollmentStats, AIFlowRequest
 )
+from app.serializers import FLOW_COLUMNS, FLOW_STEP_COLUMNS, flow_row, flow_step_row, json_response
 from app.services.ai_service import generate_flow_structure
+from app.services.flow_analytics import AnalyticsError, flow_analytics
+from app.services.flow_runtime import start_flow
 
 router = APIRouter()
 
@@ -49,6 +56,21 @@ def flow_to_response(flow: Flow) -> FlowResponse:
     )
 
 
+def delete_flow_data(db: Session, flow_id: int, step_id: Optional[int] = None) -> None:
+    """
+    Delete the enrollments, messages, email events and stats of a flow (or just the
+    messages, events and stats of one step). Not left to ON DELETE CASCADE, which
+    SQLite doesn't enforce by default.
+    """
+    for model in (EmailEvent, FlowMessage, FlowStepStats):
+        query = db.query(model).filter(model.flow_id == flow_id)
+        if step_id is not None:
+            query = query.filter(model.step_id == step_id)
+        query.delete(synchronize_session=False)
+    if step_id is None:
+        db.query(FlowEnrollment).filter(FlowEnrollment.flow_id == flow_id).delete(synchronize_session=False)
+
+
 @router.get("", response_model=FlowListResponse)
 async def get_flows(
     status: Optional[str] = None,
@@ -56,17 +78,26 @@ async def get_flows(
 ):
     """Get all flows"""
     
-    query = db.query(Flow)
+    query = db.query(*FLOW_COLUMNS)
     
     if status:
         query = query.filter(Flow.status == status)
     
-    flows = query.order_by(Flow.created_at.desc()).all()
-    
-    return FlowListResponse(
-        flows=[flow_to_response(f) for f in flows],
-        total=len(flows)
-    )
+    rows = query.order_by(Flow.created_at.desc()).all()
+    
+    # Fetch the steps of every listed flow in one query instead of one lazy load per flow
+    steps_by_flow = {r[0]: [] for r in rows}
+    if steps_by_flow:
+        step_rows = db.query(*FLOW_STEP_COLUMNS).filter(
+            FlowStep.flow_id.in_(list(steps_by_flow))
+        ).order_by(FlowStep.flow_id, FlowStep.order).all()
+        for step in step_rows:
+            steps_by_flow[step[1]].append(flow_step_row(step))
+    
+    return json_response({
+        "flows": [flow_row(r, steps_by_flow[r[0]]) for r in rows],
+        "total": len(rows)
+    })
 
 
 @router.get("/{flow_id}", response_model=FlowResponse)
@@ -81,6 +112,55 @@ async def get_flow(flow_id: int, db: Session = Depends(get_db)):
     return flow_to_response(flow)
 
 
+@router.get("/{flow_id}/enrollments", response_model=FlowEnrollmentStats)
+async def get_flow_enrollments(flow_id: int, db: Session = Depends(get_db)):
+    """Where the flow's customers are: enrollments per status and per waiting step"""
+    
+    if not db.query(Flow.id).filter(Flow.id == flow_id).first():
+        raise HTTPException(status_code=404, detail="Flow not found")
+    
+    by_status = dict(db.query(FlowEnrollment.status, func.count()).filter(
+        FlowEnrollment.flow_id == flow_id
+    ).group_by(FlowEnrollment.status).all())
+    by_step = db.query(FlowEnrollment.step_order, func.count(), func.min(FlowEnrollment.due_at)).filter(
+        FlowEnrollment.flow_id == flow_id,
+        FlowEnrollment.status == EnrollmentStatus.ACTIVE.value
+    ).group_by(FlowEnrollment.step_order).order_by(FlowEnrollment.step_order).all()
+    queued = db.query(func.count(FlowMessage.id)).filter(
+        FlowMessage.flow_id == flow_id,
+        FlowMessage.status == FlowMessageStatus.QUEUED.value
+    ).scalar()
+    
+    return FlowEnrollmentStats(
+        flow_id=flow_id,
+        active=by_status.get(EnrollmentStatus.ACTIVE.value, 0),
+        completed=by_status.get(EnrollmentStatus.COMPLETED.value, 0),
+        by_step=[{"order": order, "active": count} for order, count, _ in by_step],
+        next_due_at=min((due for _, _, due in by_step if due), default=None),
+        queued_messages=queued
+    )
+
+
+@router.get("/{flow_id}/analytics")
+async def get_flow_analytics(
+    flow_id: int,
+    days: int = Query(30, ge=1, le=365),
+    granularity: str = Query("day", regex="^(hour|day)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Step-by-step funnel (sent, opened, clicked, ordered within FLOW_ATTRIBUTION_DAYS,
+    revenue) and an hourly or daily series over the last `days` days, from the
+    flow_step_stats rollup
+    """
+    if not db.query(Flow.id).filter(Flow.id == flow_id).first():
+        raise HTTPException(status_code=404, detail="Flow not found")
+    try:
+        payload = flow_analytics(db, flow_id, days, granularity)
+    except AnalyticsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(payload)
+
 
 @router.post("/ai-generate", response_model=FlowCreate)
 async def generate_flow_ai(
@@ -99,7 +179,11 @@ async def generate_flow_ai(
 
 
 @router.post("", response_model=FlowResponse)
-async def create_flow(flow_data: FlowCreate, db: Session = Depends(get_db)):
+async def create_flow(
+    flow_data: FlowCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """Create a new flow with optional steps"""
     
     # Validate segment if provided
@@ -135,6 +219,10 @@ async def create_flow(flow_data: FlowCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(flow)
     
+    # Enroll the segment after the response; the flow runtime advances it from there
+    if flow.status == FlowStatus.ACTIVE:
+        background_tasks.add_task(start_flow, flow.id)
+    
     return flow_to_response(flow)
 
 
@@ -142,6 +230,7 @@ async def create_flow(flow_data: FlowCreate, db: Session = Depends(get_db)):
 async def update_flow(
     flow_id: int,
     flow_data: FlowUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Update a flow"""
@@ -151,6 +240,9 @@ async def update_flow(
     if not flow:
         raise HTTPException(status_code=404, detail="Flow not found")
     
+    was_active = flow.status == FlowStatus.ACTIVE
+    old_segment_id = flow.segment_id
+    
     # Update fields
     if flow_data.name is not None:
         flow.name = flow_data.name
@@ -170,6 +262,10 @@ async def update_flow(
     db.commit()
     db.refresh(flow)
     
+    # Turned active, or now targets another segment: enroll its members
+    if flow.status == FlowStatus.ACTIVE and (not was_active or flow.segment_id != old_segment_id):
+        background_tasks.add_task(start_flow, flow.id)
+    
     return flow_to_response(flow)
 
 
@@ -182,6 +278,7 @@ async def delete_flow(flow_id: int, db: Session = Depends(get_db)):
     if not flow:
         raise HTTPException(status_code=404, detail="Flow not found")
     
+    delete_flow_data(db, flow_id)
     db.delete(flow)
     db.commit()
     
@@ -254,10 +351,12 @@ async def update_flow_step(
         step.order = step_data.order
     if step_data.step_type is not None:
         step.step_type = step_data.step_type
-    if step_data.subject is not None:
+    if step_data.subject is not None and step_data.subject != step.subject:
         step.subject = step_data.subject
-    if step_data.content is not None:
+        step.version += 1
+    if step_data.content is not None and step_data.content != step.content:
         step.content = step_data.content
+        step.version += 1
     if step_data.delay_days is not None:
         step.delay_days = step_data.delay_days
     if step_data.delay_hours is not None:
@@ -298,6 +397,7 @@ async def delete_flow_step(
     if not step:
         raise HTTPException(status_code=404, detail="Step not found")
     
+    delete_flow_data(db, flow_id, step_id)
     db.delete(step)
     db.commit()
     
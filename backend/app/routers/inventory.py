@@ -1,130 +1,104 @@
 # Inventory API endpoints
 
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import select
 from typing import Optional
+from datetime import datetime
 
 from app.database import get_db
 from app.models import Product
-from app.schemas import ProductResponse, ProductListResponse, InventoryStats, ProductCreate, ProductUpdate
+from app.queries import filter_products, product_order
+from app.schemas import (
+    ProductResponse, ProductListResponse, InventoryStats, ProductCreate, ProductUpdate,
+    ProductBulkRequest, ProductBulkResponse
+)
+from app.serializers import PRODUCT_COLUMNS, product_row, json_response
+from app.services import inventory_stats
+from app.services.dashboard_events import publish_stock_alerts
+from app.services.forecasting import update_forecasts
+from app.services.product_bulk import ProductBulkError, bulk_upsert_products
+from app.services.product_catalog import get_catalog
+from app.services.product_export import EXPORT_MEDIA_TYPES, stream_products
+from app.services.stock_reservation import stock_status
+from app.services.table_versions import bump_table_version
 
 router = APIRouter()
 
+SORT_BY_PATTERN = "^(created_at|price|stock_level|name|days_until_stockout|sales_velocity)$"
+
 
 @router.get("/stats", response_model=InventoryStats)
 async def get_inventory_stats(db: Session = Depends(get_db)):
     """Get inventory overview statistics"""
     
-    total_skus = db.query(Product).count()
-    low_stock_alerts = db.query(Product).filter(Product.status == "LOW_STOCK").count()
-    out_of_stock = db.query(Product).filter(Product.status == "OUT_OF_STOCK").count()
-    inventory_value = db.query(func.sum(Product.price * Product.stock_level)).scalar() or 0
-    
-    return InventoryStats(
-        total_skus=total_skus,
-        skus_change=2.5,  # Simulated
-        low_stock_alerts=low_stock_alerts,
-        out_of_stock=out_of_stock,
-        inventory_value=round(inventory_value, 2)
-    )
+    return inventory_stats.get_inventory_stats(db)
 
 
 @router.get("", response_model=ProductListResponse)
 async def get_products(
     page: int = Query(1, ge=1),
-    per_page: int = Query(10, ge=1, le=10000),
+    per_page: int = Query(10, ge=1, le=100),
     search: Optional[str] = None,
     status: Optional[str] = None,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
     max_price: Optional[float] = None,
     predicted_need: Optional[str] = None,
-    sort_by: str = Query("created_at", regex="^(created_at|price|stock_level|name)$"),
+    max_days_until_stockout: Optional[float] = Query(None, ge=0),
+    sort_by: str = Query("created_at", regex=SORT_BY_PATTERN),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
     db: Session = Depends(get_db)
 ):
-    """Get paginated list of products with optional filters"""
-    
-    query = db.query(Product)
-    
-    # Apply search filter
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Product.name.ilike(search_term),
-                Product.sku.ilike(search_term)
-            )
-        )
-    
-    # Apply status filter
-    if status:
-        query = query.filter(Product.status == status)
-    
-    # Apply category filter
-    if category:
-        query = query.filter(Product.category == category)
-        
-    # Apply price filters
-    if min_price is not None:
-        query = query.filter(Product.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Product.price <= max_price)
-        
-    # Apply predicted need filter
-    if predicted_need:
-        if predicted_need == "Order Now":
-            query = query.filter(Product.stock_level < 20)
-        elif predicted_need == "Restock Soon":
-            query = query.filter(Product.stock_level >= 20, Product.stock_level <= 50)
-        elif predicted_need == "Healthy":
-            query = query.filter(Product.stock_level > 50)
-        else:
-            # Fallback to direct match if it's some other string (legacy)
-            query = query.filter(Product.predicted_need == predicted_need)
+    """Get paginated list of products with optional filters (see /export for the whole catalog)"""
+    
+    query = filter_products(
+        db.query(*PRODUCT_COLUMNS), search, status, category,
+        min_price, max_price, predicted_need, max_days_until_stockout
+    )
     
     # Get total count before pagination
     total = query.count()
     
-    # Apply sorting
-    sort_column = getattr(Product, sort_by)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
-    else:
-        query = query.order_by(sort_column.asc())
-    
-    # Apply pagination
+    # Apply sorting and pagination
+    query = query.order_by(*product_order(sort_by, sort_order))
     offset = (page - 1) * per_page
-    products = query.offset(offset).limit(per_page).all()
-    
-    # Helper to calculate predicted need dynamically
-    def get_predicted_need(stock):
-        if stock < 20:
-            return "Order Now"
-        if stock <= 50:
-            return "Restock Soon"
-        return "Healthy"
-    
-    return ProductListResponse(
-        products=[
-            ProductResponse(
-                id=p.id,
-                name=p.name,
-                sku=p.sku,
-                image_url=p.image_url,
-                stock_level=p.stock_level,
-                price=p.price,
-                status=p.status,
-                predicted_need=get_predicted_need(p.stock_level),
-                category=p.category,
-                created_at=p.created_at
-            )
-            for p in products
-        ],
-        total=total,
-        page=page,
-        per_page=per_page
+    rows = query.offset(offset).limit(per_page).all()
+    
+    return json_response({
+        "products": [product_row(r) for r in rows],
+        "total": total,
+        "page": page,
+        "per_page": per_page
+    })
+
+
+@router.get("/export")
+async def export_products(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    predicted_need: Optional[str] = None,
+    max_days_until_stockout: Optional[float] = Query(None, ge=0),
+    sort_by: str = Query("created_at", regex=SORT_BY_PATTERN),
+    sort_order: str = Query("desc", regex="^(asc|desc)$")
+):
+    """Stream every product matching the list filters as CSV or NDJSON, in constant memory"""
+    
+    stmt = filter_products(
+        select(*PRODUCT_COLUMNS), search, status, category,
+        min_price, max_price, predicted_need, max_days_until_stockout
+    ).order_by(*product_order(sort_by, sort_order))
+    filename = f"inventory_export_{datetime.utcnow().date().isoformat()}.{format}"
+    
+    return StreamingResponse(
+        stream_products(stmt, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
@@ -132,8 +106,7 @@ async def get_products(
 async def get_categories(db: Session = Depends(get_db)):
     """Get list of unique product categories"""
     
-    categories = db.query(Product.category).distinct().all()
-    return {"categories": [c[0] for c in categories if c[0]]}
+    return {"categories": get_catalog(db).categories}
 
 
 @router.get("/{product_id}", response_model=ProductResponse)
@@ -144,27 +117,8 @@ async def get_product(product_id: int, db: Session = Depends(get_db)):
     
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-        
-    # Helper to calculate predicted need dynamically
-    def get_predicted_need(stock):
-        if stock < 20:
-            return "Order Now"
-        if stock <= 50:
-            return "Restock Soon"
-        return "Healthy"
-    
-    return ProductResponse(
-        id=product.id,
-        name=product.name,
-        sku=product.sku,
-        image_url=product.image_url,
-        stock_level=product.stock_level,
-        price=product.price,
-        status=product.status,
-        predicted_need=get_predicted_need(product.stock_level),
-        category=product.category,
-        created_at=product.created_at
-    )
+    
+    return product
 
 
 @router.post("", response_model=ProductResponse)
@@ -176,27 +130,48 @@ async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Product with this SKU already exists")
     
     db_product = Product(**product.dict())
-    
-    # Auto-calculate predicted need based on correct logic
-    if db_product.stock_level < 20:
-        db_product.predicted_need = "Order Now"
-    elif db_product.stock_level <= 50:
-        db_product.predicted_need = "Restock Soon"
-    else:
-        db_product.predicted_need = "Healthy"
-        
     db.add(db_product)
+    db.flush()
+    
+    # No sales history yet: "Healthy" unless it has no stock
+    update_forecasts(db, [db_product.id])
+    bump_table_version(db, "products")
     db.commit()
     db.refresh(db_product)
     
     return db_product
 
 
+@router.post("/bulk", response_model=ProductBulkResponse)
+async def bulk_upsert(request: ProductBulkRequest, db: Session = Depends(get_db)):
+    """Upsert products and stock levels by SKU in chunked set-based statements"""
+    
+    try:
+        results = bulk_upsert_products(db, request.items)
+    except ProductBulkError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    
+    stock_changed = [
+        result.id for result, item in zip(results, request.items)
+        if result.id is not None and (item.stock_level is not None or item.stock_delta is not None)
+    ]
+    publish_stock_alerts(db, stock_changed)
+    
+    return ProductBulkResponse(
+        created=sum(r.result == "created" for r in results),
+        updated=sum(r.result == "updated" for r in results),
+        failed=sum(r.result == "error" for r in results),
+        results=results
+    )
+
+
 @router.put("/{product_id}", response_model=ProductResponse)
 async def update_product(product_id: int, product_update: ProductUpdate, db: Session = Depends(get_db)):
     """Update an existing product"""
     
-    db_product = db.query(Product).filter(Product.id == product_id).first()
+    # Lock the row so concurrent orders can't reserve stock between the read and the write
+    db_product = db.query(Product).filter(Product.id == product_id).with_for_update().first()
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found")
         
@@ -210,18 +185,21 @@ async def update_product(product_id: int, product_update: ProductUpdate, db: Ses
     for key, value in update_data.items():
         setattr(db_product, key, value)
         
-    # Recalculate predicted need if stock level changed
+    # Re-derive status (unless set explicitly) and re-forecast if stock level changed
+    if 'stock_level' in update_data and 'status' not in update_data:
+        db_product.status = stock_status(db_product.stock_level)
+    # Flush before bumping: a catalog change bumps its version first, see services/product_catalog.py
+    db.flush()
     if 'stock_level' in update_data:
-        if db_product.stock_level < 20:
-            db_product.predicted_need = "Order Now"
-        elif db_product.stock_level <= 50:
-            db_product.predicted_need = "Restock Soon"
-        else:
-            db_product.predicted_need = "Healthy"
+        update_forecasts(db, [db_product.id])
     
+    bump_table_version(db, "products")
     db.commit()
     db.refresh(db_product)
     
+    if 'stock_level' in update_data:
+        publish_stock_alerts(db, [db_product.id])
+    
     return db_product
 
 
@@ -234,6 +212,8 @@ async def delete_product(product_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Product not found")
         
     db.delete(db_product)
+    db.flush()
+    bump_table_version(db, "products")
     db.commit()
     
     return {"message": "Product deleted successfully"}
@@ -2,36 +2,43 @@
 
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from typing import Optional
+from datetime import date, datetime, time, timedelta
 
 from app.database import get_db
 from app.models import Order, Customer
-from app.schemas import OrderResponse, OrderListResponse
+from app.schemas import OrderResponse, OrderListResponse, OrderCreate, OrderBatchCreate, OrderBatchResponse
+from app.queries import order_count, order_items, order_list_filters, order_page
+from app.serializers import ORDER_COLUMNS, order_row, customer_display_name, customer_initials, json_response
+from app.services.order_service import create_orders, OrderIngestionError
+from app.services.order_archive import read_archived_orders
+from app.services.product_catalog import resolve_products
+from app.services.dashboard_events import publish_orders_created
+from app.utils.pagination import decode_cursor, next_cursor_for
 
 router = APIRouter()
 
 
 def get_customer_name(customer: Customer) -> str:
     """Get full name from customer"""
-    if customer.first_name and customer.last_name:
-        return f"{customer.first_name} {customer.last_name}"
-    elif customer.first_name:
-        return customer.first_name
-    elif customer.last_name:
-        return customer.last_name
-    return customer.email.split('@')[0]
-
-
-def get_initials(first_name: str = None, last_name: str = None) -> str:
-    """Get initials from first and last name"""
-    if first_name and last_name:
-        return f"{first_name[0]}{last_name[0]}".upper()
-    elif first_name:
-        return first_name[0:2].upper()
-    elif last_name:
-        return last_name[0:2].upper()
-    return "??"
+    return customer_display_name(customer.first_name, customer.last_name) or customer.email.split('@')[0]
+
+
+def order_conflict(db: Session, order_ids: list) -> HTTPException:
+    """
+    409 for a batch that lost a race on order_id: both requests passed the existence
+    check, and the unique constraint refused the second insert. Rolls the session back.
+    """
+    db.rollback()
+    existing = db.scalars(select(Order.order_id).where(Order.order_id.in_(order_ids))).all()
+    detail = f"Order already exists: {sorted(existing)}" if existing else "Order already exists"
+    return HTTPException(status_code=409, detail=detail)
+
+
+# Sorts that support keyset pagination, with the position of the sort value in ORDER_COLUMNS
+KEYSET_SORT_INDEX = {"date": 6, "total_amount": 8}
 
 
 @router.get("", response_model=OrderListResponse)
@@ -42,93 +49,130 @@ async def get_orders(
     status: Optional[str] = None,
     sort_by: str = Query("date", regex="^(date|total_amount|order_id)$"),
     sort_order: str = Query("desc", regex="^(asc|desc)$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (date/total_amount sorts only)"),
+    include_total: bool = Query(True, description="Skip the COUNT query when false"),
     db: Session = Depends(get_db)
 ):
-    """Get paginated list of orders with optional filters"""
-    
-    query = db.query(Order).join(Customer)
+    """
+    Get paginated list of orders with optional filters.
     
-    # Apply search filter
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Order.order_id.ilike(search_term),
-                Customer.first_name.ilike(search_term),
-                Customer.last_name.ilike(search_term),
-                Customer.email.ilike(search_term)
-            )
-        )
+    Customer name fields are projected in the same statement as the orders. Pages can be
+    addressed by `page` (OFFSET) or, for date/total_amount sorts, by the `next_cursor`
+    of the previous page, which seeks on (sort value, id) and stays fast on deep pages.
+    """
     
-    # Apply status filter
-    if status:
-        query = query.filter(Order.status == status)
+    filters = order_list_filters(search, status)
     
-    # Get total count before pagination
-    total = query.count()
+    # Count on orders alone, without the projection
+    total = db.scalar(order_count(filters)) if include_total else None
     
-    # Apply sorting
-    sort_column = getattr(Order, sort_by)
-    if sort_order == "desc":
-        query = query.order_by(sort_column.desc())
+    # Apply pagination: seek past the cursor, or OFFSET
+    if cursor:
+        if sort_by not in KEYSET_SORT_INDEX:
+            raise HTTPException(status_code=400, detail=f"Cursor pagination is not supported for sort_by={sort_by}")
+        try:
+            after = decode_cursor(cursor, sort_by, sort_order)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        stmt = order_page(filters, sort_by, sort_order, after)
     else:
-        query = query.order_by(sort_column.asc())
+        stmt = order_page(filters, sort_by, sort_order).offset((page - 1) * per_page)
+    
+    rows = db.execute(stmt.limit(per_page + 1)).all()
+    
+    next_cursor = None
+    if sort_by in KEYSET_SORT_INDEX:
+        next_cursor = next_cursor_for(rows, per_page, sort_by, sort_order, KEYSET_SORT_INDEX[sort_by])
+    
+    return json_response({
+        "orders": [order_row(r) for r in rows[:per_page]],
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "next_cursor": next_cursor
+    })
+
+
+@router.post("", response_model=OrderResponse)
+async def create_order(order_data: OrderCreate, db: Session = Depends(get_db)):
+    """Create an order with its items, decrementing stock and updating customer metrics"""
     
-    # Apply pagination
-    offset = (page - 1) * per_page
-    orders = query.offset(offset).limit(per_page).all()
+    try:
+        [(order_pk, _)] = create_orders(db, [order_data])
+        db.commit()
+    except OrderIngestionError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        raise order_conflict(db, [order_data.order_id])
+    publish_orders_created(db, [order_data])
     
-    return OrderListResponse(
-        orders=[
-            OrderResponse(
-                id=o.id,
-                order_id=o.order_id,
-                customer_id=o.customer_id,
-                customer_name=get_customer_name(o.customer),
-                customer_initials=get_initials(o.customer.first_name, o.customer.last_name),
-                date=o.date,
-                status=o.status,
-                total_amount=o.total_amount
-            )
-            for o in orders
-        ],
-        total=total,
-        page=page,
-        per_page=per_page
+    row = db.query(*ORDER_COLUMNS).join(Customer, Order.customer_id == Customer.id).filter(Order.id == order_pk).one()
+    return OrderResponse(**order_row(row))
+
+
+@router.post("/batch", response_model=OrderBatchResponse)
+async def create_orders_batch(batch: OrderBatchCreate, db: Session = Depends(get_db)):
+    """Create many orders in a single transaction (all or nothing)"""
+    
+    try:
+        created = create_orders(db, batch.orders)
+        db.commit()
+    except OrderIngestionError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError:
+        raise order_conflict(db, [o.order_id for o in batch.orders])
+    publish_orders_created(db, batch.orders)
+    
+    return OrderBatchResponse(
+        created=len(created),
+        order_ids=[order_id for _, order_id in created]
     )
 
 
+@router.get("/archive")
+async def get_archived_orders(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    customer_id: Optional[int] = None,
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Orders moved to cold storage by the archival job, placed between from and to (inclusive days)"""
+
+    if to_date < from_date:
+        raise HTTPException(status_code=400, detail="'to' must not be before 'from'")
+
+    start = datetime.combine(from_date, time.min)
+    end = datetime.combine(to_date + timedelta(days=1), time.min)
+    orders = read_archived_orders(start, end, customer_id, limit=limit)
+    return json_response({"orders": orders, "count": len(orders)})
+
+
 @router.get("/{order_id}")
 async def get_order_details(order_id: int, db: Session = Depends(get_db)):
     """Get detailed order by ID with items and customer info"""
-    from app.models import OrderItem, Product
-    
     order = db.query(Order).join(Customer).filter(Order.id == order_id).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Get order items with product details
-    items = db.query(
-        OrderItem.quantity,
-        OrderItem.price_at_purchase,
-        Product.id.label('product_id'),
-        Product.name.label('product_name'),
-        Product.image_url,
-        Product.sku
-    ).join(Product).filter(OrderItem.order_id == order.id).all()
+    # Get order items; product details come from the catalog cache
+    items = db.execute(order_items(order.id)).all()
+    products = resolve_products(db, {item.product_id for item in items})
     
     items_data = [
         {
             "product_id": item.product_id,
-            "product_name": item.product_name,
-            "sku": item.sku,
+            "product_name": products[item.product_id].name,
+            "sku": products[item.product_id].sku,
             "quantity": item.quantity,
             "price": item.price_at_purchase,
             "total": round(item.quantity * item.price_at_purchase, 2),
-            "image_url": item.image_url
+            "image_url": products[item.product_id].image_url
         }
         for item in items
+        if item.product_id in products
     ]
     
     return {
@@ -147,6 +191,6 @@ async def get_order_details(order_id: int, db: Session = Depends(get_db)):
             "phone": order.customer.phone,
             "avatar_url": order.customer.avatar_url,
             "status": order.customer.status,
-            "initials": get_initials(order.customer.first_name, order.customer.last_name)
+            "initials": customer_initials(order.customer.first_name, order.customer.last_name)
         }
     }
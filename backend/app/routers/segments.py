@@ -2,164 +2,23 @@
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, func
 from typing import Optional
-from datetime import datetime, timedelta
 
 from app.database import get_db
-from app.models import Segment, SegmentRule, Customer
+from app.models import Segment, SegmentRule, SegmentSizeSnapshot
 from app.schemas import (
     SegmentCreate, SegmentUpdate, SegmentResponse, SegmentListResponse,
-    SegmentCustomersResponse, SegmentRuleResponse, CustomerResponse,
+    SegmentCustomersResponse, SegmentRuleResponse,
     AISegmentRequest, AISegmentResponse, SegmentLogicEnum
 )
+from app.serializers import CUSTOMER_COLUMNS, customer_row, json_response
 from app.services import ai_service
+from app.services.segment_rules import get_segment_customers_query
 
 router = APIRouter()
 
 
-def evaluate_rule(query, rule: SegmentRule):
-    """Apply a single rule to the customer query"""
-    field = rule.field
-    operator = rule.operator
-    value = rule.value
-    
-    # Map field names to Customer model attributes
-    field_map = {
-        "email": Customer.email,
-        "first_name": Customer.first_name,
-        "last_name": Customer.last_name,
-        "phone": Customer.phone,
-        "city": Customer.city,
-        "state": Customer.state,
-        "country": Customer.country,
-        "zip_code": Customer.zip_code,
-        "status": Customer.status,
-        "total_orders": Customer.total_orders,
-        "total_spend": Customer.total_spend,
-        "lifetime_value": Customer.lifetime_value,
-        "email_opt_in": Customer.email_opt_in,
-        "sms_opt_in": Customer.sms_opt_in,
-        "source": Customer.source,
-        "last_order_date": Customer.last_order_date,
-        "first_order_date": Customer.first_order_date,
-        "created_at": Customer.created_at,
-    }
-    
-    if field not in field_map:
-        return query  # Skip unknown fields
-    
-    column = field_map[field]
-    
-    if operator == "equals":
-        if value.lower() == "true":
-            return query.filter(column == True)
-        elif value.lower() == "false":
-            return query.filter(column == False)
-        return query.filter(column == value)
-    
-    elif operator == "not_equals":
-        return query.filter(column != value)
-    
-    elif operator == "contains":
-        return query.filter(column.ilike(f"%{value}%"))
-    
-    elif operator == "greater_than":
-        try:
-            numeric_value = float(value)
-            return query.filter(column > numeric_value)
-        except ValueError:
-            return query
-    
-    elif operator == "less_than":
-        try:
-            numeric_value = float(value)
-            return query.filter(column < numeric_value)
-        except ValueError:
-            return query
-    
-    elif operator == "within_days":
-        try:
-            days = int(value)
-            cutoff_date = datetime.utcnow() - timedelta(days=days)
-            return query.filter(column >= cutoff_date)
-        except ValueError:
-            return query
-    
-    elif operator == "before_date":
-        try:
-            date_value = datetime.fromisoformat(value)
-            return query.filter(column < date_value)
-        except ValueError:
-            return query
-    
-    return query
-
-
-def get_segment_customers_query(db: Session, segment: Segment):
-    """Build query for customers matching segment rules"""
-    query = db.query(Customer)
-    
-    if not segment.rules:
-        return query
-    
-    if segment.logic == "AND":
-        # All rules must match
-        for rule in segment.rules:
-            query = evaluate_rule(query, rule)
-    else:
-        # OR logic - any rule can match
-        conditions = []
-        for rule in segment.rules:
-            # Build individual conditions
-            sub_query = db.query(Customer.id)
-            sub_query = evaluate_rule(sub_query, rule)
-            conditions.append(Customer.id.in_(sub_query.subquery()))
-        
-        if conditions:
-            query = query.filter(or_(*conditions))
-    
-    return query
-
-
-def customer_to_response(customer: Customer) -> CustomerResponse:
-    """Convert Customer model to response"""
-    name = None
-    if customer.first_name and customer.last_name:
-        name = f"{customer.first_name} {customer.last_name}"
-    elif customer.first_name:
-        name = customer.first_name
-    elif customer.last_name:
-        name = customer.last_name
-    
-    return CustomerResponse(
-        id=customer.id,
-        email=customer.email,
-        first_name=customer.first_name,
-        last_name=customer.last_name,
-        name=name,
-        phone=customer.phone,
-        avatar_url=customer.avatar_url,
-        city=customer.city,
-        state=customer.state,
-        country=customer.country,
-        zip_code=customer.zip_code,
-        status=customer.status,
-        total_orders=customer.total_orders,
-        total_spend=customer.total_spend,
-        lifetime_value=customer.lifetime_value,
-        average_order_value=customer.average_order_value,
-        first_order_date=customer.first_order_date,
-        last_order_date=customer.last_order_date,
-        email_opt_in=customer.email_opt_in,
-        sms_opt_in=customer.sms_opt_in,
-        source=customer.source,
-        tags=customer.tags or [],
-        created_at=customer.created_at,
-        updated_at=customer.updated_at
-    )
-
-
 @router.get("", response_model=SegmentListResponse)
 async def get_segments(db: Session = Depends(get_db)):
     """Get all segments with customer counts"""
@@ -251,7 +110,7 @@ async def get_segment_customers(
     total = query.count()
     
     offset = (page - 1) * per_page
-    customers = query.offset(offset).limit(per_page).all()
+    rows = query.with_entities(*CUSTOMER_COLUMNS).offset(offset).limit(per_page).all()
     
     segment_response = SegmentResponse(
         id=segment.id,
@@ -274,13 +133,13 @@ async def get_segment_customers(
         updated_at=segment.updated_at
     )
     
-    return SegmentCustomersResponse(
-        segment=segment_response,
-        customers=[customer_to_response(c) for c in customers],
-        total=total,
-        page=page,
-        per_page=per_page
-    )
+    return json_response({
+        "segment": segment_response.model_dump(),
+        "customers": [customer_row(r) for r in rows],
+        "total": total,
+        "page": page,
+        "per_page": per_page
+    })
 
 
 @router.post("", response_model=SegmentResponse)
@@ -410,6 +269,8 @@ async def delete_segment(segment_id: int, db: Session = Depends(get_db)):
     if not segment:
         raise HTTPException(status_code=404, detail="Segment not found")
     
+    # Not left to ON DELETE CASCADE, which SQLite doesn't enforce by default
+    db.query(SegmentSizeSnapshot).filter(SegmentSizeSnapshot.segment_id == segment_id).delete()
     db.delete(segment)
     db.commit()
     
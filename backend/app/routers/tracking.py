@@ -0,0 +1,38 @@
+# Email tracking endpoints: open pixel and click redirect (see services/email_tracking.py)
+#
+# Hit by mail clients, so they're unauthenticated and never touch the database:
+# events go to the in-process buffer, which a scheduled job flushes.
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import RedirectResponse, Response
+
+from app.models import EmailEventType
+from app.services.email_tracking import event_buffer, read_token
+
+router = APIRouter()
+
+# 1x1 transparent GIF
+PIXEL = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00"
+    b",\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+NO_CACHE = {"Cache-Control": "no-store, max-age=0"}
+
+
+@router.get("/open/{token}")
+async def track_open(token: str):
+    """Record an open; always answers with the pixel"""
+    message_id = read_token(token)
+    if message_id is not None:
+        event_buffer.add(message_id, EmailEventType.OPEN)
+    return Response(content=PIXEL, media_type="image/gif", headers=NO_CACHE)
+
+
+@router.get("/click/{token}")
+async def track_click(token: str, url: str = Query(...)):
+    """Record a click and redirect to the link; only URLs signed into the email are followed"""
+    message_id = read_token(token, url)
+    if message_id is None:
+        raise HTTPException(status_code=404, detail="Link not found")
+    event_buffer.add(message_id, EmailEventType.CLICK, url)
+    return RedirectResponse(url, status_code=302, headers=NO_CACHE)
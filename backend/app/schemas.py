@@ -1,6 +1,6 @@
 # Pydantic Schemas for CDP API
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, computed_field
 from datetime import datetime
 from typing import Optional, List, Any
 from enum import Enum
@@ -139,8 +139,25 @@ class OrderBase(BaseModel):
     total_amount: float
 
 
+class OrderItemCreate(BaseModel):
+    product_id: int
+    quantity: int = Field(1, ge=1)
+    price_at_purchase: Optional[float] = None  # Defaults to the current product price
+
+
 class OrderCreate(OrderBase):
-    pass
+    date: Optional[datetime] = None  # Defaults to now
+    shipping_address: Optional[str] = None
+    items: List[OrderItemCreate] = []
+
+
+class OrderBatchCreate(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=5000)
+
+
+class OrderBatchResponse(BaseModel):
+    created: int
+    order_ids: List[str]
 
 
 class OrderResponse(BaseModel):
@@ -159,9 +176,10 @@ class OrderResponse(BaseModel):
 
 class OrderListResponse(BaseModel):
     orders: List[OrderResponse]
-    total: int
+    total: Optional[int] = None  # None when include_total=false
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
 
 
 # ============== PRODUCT SCHEMAS ==============
@@ -193,6 +211,8 @@ class ProductUpdate(BaseModel):
 
 class ProductResponse(ProductBase):
     id: int
+    sales_velocity: Optional[float] = None
+    days_until_stockout: Optional[float] = None
     created_at: datetime
 
     class Config:
@@ -206,6 +226,37 @@ class ProductListResponse(BaseModel):
     per_page: int
 
 
+class ProductBulkItem(BaseModel):
+    sku: str
+    name: Optional[str] = None  # Required when the SKU is new
+    image_url: Optional[str] = None
+    price: Optional[float] = None  # Required when the SKU is new
+    category: Optional[str] = None
+    stock_level: Optional[int] = Field(None, ge=0)  # Absolute count
+    stock_delta: Optional[int] = None  # Added to the current count instead
+
+
+class ProductBulkRequest(BaseModel):
+    items: List[ProductBulkItem] = Field(..., min_length=1, max_length=20000)
+
+
+class ProductBulkResult(BaseModel):
+    sku: str
+    result: str  # created / updated / error
+    id: Optional[int] = None
+    stock_level: Optional[int] = None
+    status: Optional[str] = None
+    predicted_need: Optional[str] = None
+    error: Optional[str] = None
+
+
+class ProductBulkResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[ProductBulkResult]
+
+
 # ============== SEGMENT SCHEMAS ==============
 
 class SegmentRuleBase(BaseModel):
@@ -357,6 +408,20 @@ class FlowListResponse(BaseModel):
     total: int
 
 
+class FlowEnrollmentStepCount(BaseModel):
+    order: int  # FlowStep.order the enrollments wait for
+    active: int
+
+
+class FlowEnrollmentStats(BaseModel):
+    flow_id: int
+    active: int
+    completed: int
+    by_step: List[FlowEnrollmentStepCount]
+    next_due_at: Optional[datetime] = None
+    queued_messages: int
+
+
 # ============== DASHBOARD SCHEMAS ==============
 
 class DashboardStats(BaseModel):
@@ -381,6 +446,7 @@ class DashboardStats(BaseModel):
     total_segments: int
     active_flows: int
     email_opt_in_rate: float
+    computed_at: Optional[datetime] = None
 
 
 class InsightResponse(BaseModel):
@@ -389,7 +455,17 @@ class InsightResponse(BaseModel):
     description: str
     type: str
     icon: Optional[str]
-    time_ago: str
+    created_at: datetime
+
+    @computed_field
+    @property
+    def time_ago(self) -> str:
+        seconds = max((datetime.utcnow() - self.created_at).total_seconds(), 0)
+        if seconds < 60:
+            return "just now"
+        for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+            if seconds >= size:
+                return f"{int(seconds // size)}{unit} ago"
 
     class Config:
         from_attributes = True
@@ -397,6 +473,9 @@ class InsightResponse(BaseModel):
 
 class InsightListResponse(BaseModel):
     insights: List[InsightResponse]
+    total: int
+    page: int
+    per_page: int
 
 
 class InventoryStats(BaseModel):
@@ -8,6 +8,10 @@ from sqlalchemy.orm import Session
 from app.database import SessionLocal
 from app.models import Customer, Order, OrderItem, Product, Insight, Segment, SegmentRule, Flow, FlowStep, User, UserRole
 from app import auth
+from app.services.forecasting import update_forecasts
+from app.services.order_search import refresh_order_search_text
+from app.services.sales_rollup import rebuild_sales_rollups
+from app.services.table_versions import bump_table_version
 
 
 # ============== SUPER ADMIN CREDENTIALS ==============
@@ -85,13 +89,14 @@ PRODUCT_DATA = [
     ("Laptop Stand Ergonomic", "Accessories", 59.99, 800, 0.01),
 ]
 
+# (title, description, type, icon, minutes ago)
 INSIGHT_DATA = [
-    ("Positive Sales Spike", "Hyper Buds Pro sales are up 40% in North America.", "positive", "trending-up", "2m ago"),
-    ("Inventory Warning", "Stock for 'Hyper Watch Ultra' is critically low (5 units).", "warning", "alert-triangle", "45m ago"),
-    ("New Customer Milestone", "You've reached 12,000+ total customers this month!", "positive", "users", "1h ago"),
-    ("Segment Alert", "Your 'High-Value Customers' segment grew by 15% this week.", "positive", "users-plus", "2h ago"),
-    ("Flow Performance", "Welcome Series flow has 45% open rate this month.", "positive", "mail", "3h ago"),
-    ("Low Stock Alert", "HyperPhone Pro 15 stock is running low (5 units remaining).", "warning", "alert-circle", "3h ago"),
+    ("Positive Sales Spike", "Hyper Buds Pro sales are up 40% in North America.", "positive", "trending-up", 2),
+    ("Inventory Warning", "Stock for 'Hyper Watch Ultra' is critically low (5 units).", "warning", "alert-triangle", 45),
+    ("New Customer Milestone", "You've reached 12,000+ total customers this month!", "positive", "users", 60),
+    ("Segment Alert", "Your 'High-Value Customers' segment grew by 15% this week.", "positive", "users-plus", 120),
+    ("Flow Performance", "Welcome Series flow has 45% open rate this month.", "positive", "mail", 180),
+    ("Low Stock Alert", "HyperPhone Pro 15 stock is running low (5 units remaining).", "warning", "alert-circle", 185),
 ]
 
 
@@ -198,6 +203,7 @@ def seed_database():
             products.append(product)
             db.add(product)
         
+        bump_table_version(db, "products")
         db.commit()
         print("   ✅ 20 products created")
         
@@ -353,6 +359,9 @@ def seed_database():
                 customer.first_order_date = datetime.utcnow() - timedelta(days=random.randint(30, 365))
                 customer.last_order_date = datetime.utcnow() - timedelta(days=random.randint(0, 60))
         
+        refresh_order_search_text(db)
+        rebuild_sales_rollups(db)
+        update_forecasts(db)
         db.commit()
         print("   ✅ Customer metrics updated")
         
@@ -483,13 +492,13 @@ def seed_database():
         
         # ============== CREATE INSIGHTS ==============
         print("   💡 Creating 6 dashboard insights...")
-        for title, description, insight_type, icon, time_ago in INSIGHT_DATA:
+        for title, description, insight_type, icon, minutes_ago in INSIGHT_DATA:
             insight = Insight(
                 title=title,
                 description=description,
                 type=insight_type,
                 icon=icon,
-                time_ago=time_ago
+                created_at=datetime.utcnow() - timedelta(minutes=minutes_ago)
             )
             db.add(insight)
         
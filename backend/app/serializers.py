@@ -0,0 +1,250 @@
+# Fast serialization helpers shared by the list endpoints
+#
+# List endpoints select only the columns they return (as plain tuples) and turn
+# each row into a dict that already matches the response schema. The payload is
+# then encoded once with orjson and returned as a raw Response, so FastAPI does
+# not build a Pydantic model per row and validate it a second time against
+# `response_model` (which is still declared on the route for the OpenAPI docs).
+
+from typing import Any, Optional
+
+import orjson
+from fastapi import Response
+
+from app.models import Customer, Order, Product, Flow, FlowStep
+from app.schemas import CustomerResponse
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """Encode a payload of dicts/lists/datetimes straight to JSON bytes"""
+    return Response(
+        content=orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS),
+        status_code=status_code,
+        media_type="application/json"
+    )
+
+
+# ============== CUSTOMERS ==============
+
+def customer_display_name(first_name: Optional[str], last_name: Optional[str]) -> Optional[str]:
+    """Full name from whichever name parts are present"""
+    if first_name and last_name:
+        return f"{first_name} {last_name}"
+    return first_name or last_name or None
+
+
+CUSTOMER_COLUMNS = (
+    Customer.id,
+    Customer.email,
+    Customer.first_name,
+    Customer.last_name,
+    Customer.phone,
+    Customer.avatar_url,
+    Customer.city,
+    Customer.state,
+    Customer.country,
+    Customer.zip_code,
+    Customer.status,
+    Customer.total_orders,
+    Customer.total_spend,
+    Customer.lifetime_value,
+    Customer.average_order_value,
+    Customer.first_order_date,
+    Customer.last_order_date,
+    Customer.email_opt_in,
+    Customer.sms_opt_in,
+    Customer.source,
+    Customer.tags,
+    Customer.created_at,
+    Customer.updated_at,
+)
+
+
+def customer_row(row) -> dict:
+    """Convert a CUSTOMER_COLUMNS row to a CustomerResponse-shaped dict"""
+    (id_, email, first_name, last_name, phone, avatar_url, city, state, country,
+     zip_code, status, total_orders, total_spend, lifetime_value, average_order_value,
+     first_order_date, last_order_date, email_opt_in, sms_opt_in, source, tags,
+     created_at, updated_at) = row
+    return {
+        "id": id_,
+        "email": email,
+        "first_name": first_name,
+        "last_name": last_name,
+        "name": customer_display_name(first_name, last_name),
+        "phone": phone,
+        "avatar_url": avatar_url,
+        "city": city,
+        "state": state,
+        "country": country,
+        "zip_code": zip_code,
+        "status": status,
+        "total_orders": total_orders,
+        "total_spend": total_spend,
+        "lifetime_value": lifetime_value,
+        "average_order_value": average_order_value,
+        "first_order_date": first_order_date,
+        "last_order_date": last_order_date,
+        "email_opt_in": email_opt_in,
+        "sms_opt_in": sms_opt_in,
+        "source": source,
+        "tags": tags or [],
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
+
+
+def customer_to_response(customer: Customer) -> CustomerResponse:
+    """Convert Customer model to response (single-object endpoints)"""
+    return CustomerResponse(**customer_row(tuple(getattr(customer, c.key) for c in CUSTOMER_COLUMNS)))
+
+
+# ============== ORDERS ==============
+
+def customer_initials(first_name: Optional[str] = None, last_name: Optional[str] = None) -> str:
+    """Get initials from first and last name"""
+    if first_name and last_name:
+        return f"{first_name[0]}{last_name[0]}".upper()
+    elif first_name:
+        return first_name[0:2].upper()
+    elif last_name:
+        return last_name[0:2].upper()
+    return "??"
+
+
+ORDER_COLUMNS = (
+    Order.id,
+    Order.order_id,
+    Order.customer_id,
+    Customer.first_name,
+    Customer.last_name,
+    Customer.email,
+    Order.date,
+    Order.status,
+    Order.total_amount,
+)
+
+
+def order_row(row) -> dict:
+    """Convert an ORDER_COLUMNS row to an OrderResponse-shaped dict"""
+    id_, order_id, customer_id, first_name, last_name, email, date, status, total_amount = row
+    return {
+        "id": id_,
+        "order_id": order_id,
+        "customer_id": customer_id,
+        "customer_name": customer_display_name(first_name, last_name) or email.split('@')[0],
+        "customer_initials": customer_initials(first_name, last_name),
+        "date": date,
+        "status": status,
+        "total_amount": total_amount,
+    }
+
+
+# ============== PRODUCTS ==============
+
+PRODUCT_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.sku,
+    Product.image_url,
+    Product.stock_level,
+    Product.price,
+    Product.status,
+    Product.predicted_need,
+    Product.sales_velocity,
+    Product.days_until_stockout,
+    Product.category,
+    Product.created_at,
+)
+
+
+def product_row(row) -> dict:
+    """Convert a PRODUCT_COLUMNS row to a ProductResponse-shaped dict"""
+    (id_, name, sku, image_url, stock_level, price, status, predicted_need,
+     sales_velocity, days_until_stockout, category, created_at) = row
+    return {
+        "name": name,
+        "sku": sku,
+        "image_url": image_url,
+        "stock_level": stock_level,
+        "price": price,
+        "status": status,
+        "predicted_need": predicted_need,
+        "sales_velocity": sales_velocity,
+        "days_until_stockout": days_until_stockout,
+        "category": category,
+        "id": id_,
+        "created_at": created_at,
+    }
+
+
+# ============== FLOWS ==============
+
+FLOW_COLUMNS = (
+    Flow.id,
+    Flow.name,
+    Flow.description,
+    Flow.trigger_type,
+    Flow.segment_id,
+    Flow.status,
+    Flow.total_sent,
+    Flow.total_opened,
+    Flow.total_clicked,
+    Flow.created_at,
+    Flow.updated_at,
+)
+
+FLOW_STEP_COLUMNS = (
+    FlowStep.id,
+    FlowStep.flow_id,
+    FlowStep.order,
+    FlowStep.step_type,
+    FlowStep.subject,
+    FlowStep.content,
+    FlowStep.delay_days,
+    FlowStep.delay_hours,
+    FlowStep.sent_count,
+    FlowStep.open_count,
+    FlowStep.click_count,
+    FlowStep.created_at,
+)
+
+
+def flow_step_row(row) -> dict:
+    """Convert a FLOW_STEP_COLUMNS row to a FlowStepResponse-shaped dict"""
+    (id_, flow_id, order, step_type, subject, content, delay_days, delay_hours,
+     sent_count, open_count, click_count, created_at) = row
+    return {
+        "order": order,
+        "step_type": step_type,
+        "subject": subject,
+        "content": content,
+        "delay_days": delay_days,
+        "delay_hours": delay_hours,
+        "id": id_,
+        "flow_id": flow_id,
+        "sent_count": sent_count,
+        "open_count": open_count,
+        "click_count": click_count,
+        "created_at": created_at,
+    }
+
+
+def flow_row(row, steps: list) -> dict:
+    """Convert a FLOW_COLUMNS row plus its step dicts to a FlowResponse-shaped dict"""
+    (id_, name, description, trigger_type, segment_id, status, total_sent,
+     total_opened, total_clicked, created_at, updated_at) = row
+    return {
+        "name": name,
+        "description": description,
+        "trigger_type": trigger_type,
+        "segment_id": segment_id,
+        "status": status,
+        "id": id_,
+        "total_sent": total_sent,
+        "total_opened": total_opened,
+        "total_clicked": total_clicked,
+        "steps": steps,
+        "created_at": created_at,
+        "updated_at": updated_at,
+    }
@@ -0,0 +1,69 @@
+# Live dashboard deltas pushed over GET /api/dashboard/stream
+#
+# Routers call these after committing a write. Each publishes a small delta the
+# dashboard applies to the numbers it already shows:
+#   orders       {"orders", "revenue", "cancelled", "at"}, for orders dated inside the
+#                dashboard window (backdated or imported ones only reach the rollups)
+#   customers    {"new_customers", "at"}
+#   stock_alert  {"products": [{"id", "name", "sku", "stock_level", "status"}]}
+# Nothing is computed when no dashboard is connected.
+
+from datetime import datetime
+from typing import Iterable, List
+
+from sqlalchemy.orm import Session
+
+from app.core.events import Broadcaster
+from app.models import OrderStatus, Product
+from app.schemas import OrderCreate
+from app.services.dashboard_stats import window_start
+from app.services.stock_reservation import LOW_STOCK_THRESHOLD, stock_status
+
+dashboard_events = Broadcaster()
+
+
+def publish_orders_created(db: Session, orders: List[OrderCreate]) -> None:
+    if not dashboard_events.subscriber_count:
+        return
+    now = datetime.utcnow()
+    # Orders without a date are dated now by ingestion
+    start = window_start(now.date())
+    in_window = [o for o in orders if o.date is None or o.date.date() >= start]
+    active = [o for o in orders if o.status.value != OrderStatus.CANCELLED.value]
+    active_in_window = [o for o in in_window if o.status.value != OrderStatus.CANCELLED.value]
+    if in_window:
+        dashboard_events.publish("orders", {
+            "orders": len(active_in_window),
+            "revenue": round(sum(o.total_amount for o in active_in_window), 2),
+            "cancelled": len(in_window) - len(active_in_window),
+            "at": now,
+        })
+    # Stock was taken whatever the order date
+    publish_stock_alerts(db, {item.product_id for o in active for item in o.items})
+
+
+def publish_customer_created() -> None:
+    if dashboard_events.subscriber_count:
+        dashboard_events.publish("customers", {"new_customers": 1, "at": datetime.utcnow()})
+
+
+def publish_stock_alerts(db: Session, product_ids: Iterable[int]) -> None:
+    """Publish the given products that are now below the low-stock threshold"""
+    product_ids = list(product_ids)
+    if not product_ids or not dashboard_events.subscriber_count:
+        return
+    rows = db.query(Product.id, Product.name, Product.sku, Product.stock_level).filter(
+        Product.id.in_(product_ids),
+        Product.stock_level < LOW_STOCK_THRESHOLD
+    ).all()
+    if rows:
+        dashboard_events.publish("stock_alert", {"products": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "sku": row.sku,
+                "stock_level": row.stock_level,
+                "status": stock_status(row.stock_level),
+            }
+            for row in rows
+        ]})
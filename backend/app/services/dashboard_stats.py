@@ -0,0 +1,150 @@
+# Dashboard overview statistics
+#
+# Computed from a handful of aggregate statements (customers, the daily sales
+# rollups) plus the shared inventory stats from services/inventory_stats.py and the
+# product catalog cache from services/product_catalog.py. The
+# dashboard router serves them through a stale-while-revalidate cache, see
+# routers/dashboard.py.
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, case, select
+from sqlalchemy.orm import Session
+
+from app.models import Customer, Segment, Flow, DailySales, DailyProductSales
+from app.schemas import DashboardStats
+from app.services.inventory_stats import get_inventory_stats
+from app.services.product_catalog import get_catalog, resolve_products
+
+# Days covered by the revenue, orders and top-seller tiles, today included
+WINDOW_DAYS = 30
+
+
+def window_start(today: date) -> date:
+    """First day of the current dashboard window"""
+    return today - timedelta(days=WINDOW_DAYS - 1)
+
+
+def compute_dashboard_stats(db: Session) -> DashboardStats:
+    """Dashboard overview statistics calculated from real database data"""
+    
+    # Time ranges
+    now = datetime.utcnow()
+    thirty_days_ago = now - timedelta(days=30)
+    
+    # Day-granular windows for the rollups: the last 30 days including today, and the 30 before
+    current_start = window_start(now.date())
+    previous_start = current_start - timedelta(days=WINDOW_DAYS)
+    
+    # Customer metrics in one pass over customers
+    customer_stats = db.query(
+        func.count(Customer.id),
+        func.count(case((Customer.created_at < thirty_days_ago, 1))),
+        func.count(case((Customer.total_orders > 1, 1))),
+        func.count(case((Customer.total_orders <= 1, 1))),
+        func.count(case((Customer.email_opt_in == True, 1)))
+    ).one()
+    total_customers, customers_last_month, returning_customers, new_customers, opted_in = customer_stats
+    
+    # Customers created before 30 days ago (existing customers last month)
+    new_customers_this_month = total_customers - customers_last_month
+    customers_change = round((new_customers_this_month / max(customers_last_month, 1)) * 100, 1)
+    
+    # Revenue and order counts for the last 30 days and the 30 days before, from the daily rollup
+    current_window = DailySales.day >= current_start
+    order_stats = db.query(
+        func.coalesce(func.sum(case((current_window, DailySales.revenue))), 0),
+        func.coalesce(func.sum(case((~current_window, DailySales.revenue))), 0),
+        func.coalesce(func.sum(case((current_window, DailySales.orders))), 0),
+        func.coalesce(func.sum(case((~current_window, DailySales.orders))), 0)
+    ).filter(DailySales.day >= previous_start).one()
+    total_revenue, prev_revenue, total_orders, prev_orders = order_stats
+    
+    revenue_change = round(((total_revenue - prev_revenue) / max(prev_revenue, 1)) * 100, 1) if prev_revenue > 0 else 0
+    average_order_value = round(total_revenue / max(total_orders, 1), 2)
+    
+    # Calculate AOV change
+    prev_aov = round(prev_revenue / max(prev_orders, 1), 2)
+    aov_change = round(average_order_value - prev_aov, 2)
+    
+    # Customer retention (customers with more than 1 order)
+    customer_retention = round((returning_customers / max(total_customers, 1)) * 100, 1)
+    
+    # Top selling product over the last 30 days, from the daily per-product rollup;
+    # names and prices come from the product catalog cache
+    top_sellers = db.query(
+        DailyProductSales.product_id,
+        func.sum(DailyProductSales.units).label('units_sold')
+    ).filter(
+        DailyProductSales.day >= current_start
+    ).group_by(
+        DailyProductSales.product_id
+    ).order_by(
+        func.sum(DailyProductSales.units).desc()
+    ).first()
+    top_seller = resolve_products(db, [top_sellers.product_id]).get(top_sellers.product_id) if top_sellers else None
+    
+    if top_seller:
+        top_product = {
+            "name": top_seller.name,
+            "units_sold": int(top_sellers.units_sold),
+            "price": top_seller.price,
+            "image_url": top_seller.image_url
+        }
+    else:
+        # Fallback if no orders
+        first_product = get_catalog(db).first()
+        top_product = {
+            "name": first_product.name if first_product else "No products",
+            "units_sold": 0,
+            "price": first_product.price if first_product else 0,
+            "image_url": first_product.image_url if first_product else None
+        }
+    
+    # Top regions from customer states
+    state_counts = db.query(
+        Customer.state, 
+        func.count(Customer.id).label('count')
+    ).filter(
+        Customer.state.isnot(None)
+    ).group_by(Customer.state).order_by(func.count(Customer.id).desc()).limit(3).all()
+    
+    total_with_state = sum([s[1] for s in state_counts]) or 1
+    top_regions = [
+        {"name": state, "percentage": round((count / total_with_state) * 100)}
+        for state, count in state_counts
+    ]
+    
+    # Inventory stats (cached until products change), and the small CDP config counts
+    inventory = get_inventory_stats(db, now.date())
+    total_segments, active_flows = db.query(
+        select(func.count(Segment.id)).scalar_subquery(),
+        select(func.count(Flow.id)).where(Flow.status == "active").scalar_subquery()
+    ).one()
+    
+    # Email opt-in rate
+    email_opt_in_rate = round((opted_in / max(total_customers, 1)) * 100, 1)
+    
+    return DashboardStats(
+        total_customers=total_customers,
+        customers_change=customers_change,
+        customers_last_month=customers_last_month,
+        total_revenue=round(total_revenue, 2),
+        revenue_change=revenue_change,
+        total_orders=total_orders,
+        average_order_value=average_order_value,
+        aov_change=aov_change,
+        customer_retention=customer_retention,
+        returning_customers=returning_customers,
+        new_customers=new_customers,
+        top_product=top_product,
+        top_regions=top_regions,
+        total_skus=inventory.total_skus,
+        low_stock_alerts=inventory.low_stock_alerts,
+        out_of_stock=inventory.out_of_stock,
+        inventory_value=inventory.inventory_value,
+        total_segments=total_segments,
+        active_flows=active_flows,
+        email_opt_in_rate=email_opt_in_rate,
+        computed_at=now
+    )
@@ -0,0 +1,275 @@
+# Flow email templates: compiled once per step version, rendered in batches
+#
+# FlowStep.subject and content are Jinja templates over flat customer fields
+# (TEMPLATE_FIELDS), e.g. "Hi {{ first_name }}, still thinking about {{ last_product }}?".
+# Bodies are autoescaped HTML, subjects plain text; a step without a subject uses
+# its flow's name. Templates are written in the UI, so they run in Jinja's sandbox.
+#
+#   compile  Each step is compiled once per flow_steps.version (bumped whenever its
+#            subject or content changes, so edits reach every worker without any
+#            invalidation) and kept in an LRU of TEMPLATE_CACHE_SIZE steps. The
+#            fields a template uses are read off its AST at the same time.
+#   fields   A batch loads only the fields its templates use, for all its
+#            customers at once, as plain tuples from a column projection; nothing
+#            is loaded through the ORM. last_product costs one more query.
+#   render   Batches of at least EMAIL_RENDER_POOL_THRESHOLD messages are split
+#            across a pool of EMAIL_RENDER_PROCESSES processes, each with its own
+#            compiled-template cache; smaller ones render in-process.
+# A template that fails to compile or render fails its messages, not the batch.
+
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from jinja2 import Template, meta
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Customer, Flow, FlowStep, Order, OrderItem, OrderStatus
+from app.services.product_catalog import resolve_products
+
+TEMPLATE_CACHE_SIZE = 1024
+
+STEP_DELETED = "Step no longer exists"
+
+# Template variable -> customers column
+FIELD_COLUMNS = {
+    "first_name": Customer.first_name,
+    "last_name": Customer.last_name,
+    "email": Customer.email,
+    "city": Customer.city,
+    "state": Customer.state,
+    "country": Customer.country,
+    "tier": Customer.status,
+    "total_orders": Customer.total_orders,
+    "total_spend": Customer.total_spend,
+    "lifetime_value": Customer.lifetime_value,
+    "last_order_date": Customer.last_order_date,
+}
+# Derived variables and the columns they're built from
+DERIVED_FIELDS = {
+    "name": ("first_name", "last_name"),
+    "last_product": (),  # Name of the first product in the customer's latest order
+}
+TEMPLATE_FIELDS = frozenset(FIELD_COLUMNS) | frozenset(DERIVED_FIELDS)
+
+_subject_env = ImmutableSandboxedEnvironment(autoescape=False)
+_body_env = ImmutableSandboxedEnvironment(autoescape=True)
+
+# (step id, version)
+StepKey = Tuple[int, int]
+
+
+class CompiledStep(NamedTuple):
+    subject: Template
+    body: Template
+    fields: FrozenSet[str]
+
+
+class RenderedEmail(NamedTuple):
+    subject: Optional[str]
+    body: Optional[str]
+    error: Optional[str] = None
+
+
+def compile_step(subject: str, content: str) -> CompiledStep:
+    """Compile a step's subject and body; raises jinja2.TemplateError"""
+    subject_ast = _subject_env.parse(subject)
+    body_ast = _body_env.parse(content)
+    fields = (meta.find_undeclared_variables(subject_ast) | meta.find_undeclared_variables(body_ast)) & TEMPLATE_FIELDS
+    return CompiledStep(_subject_env.from_string(subject_ast), _body_env.from_string(body_ast), frozenset(fields))
+
+
+class TemplateCache:
+    """LRU of compiled steps by (step id, version); a step that failed to compile is cached as its error"""
+
+    def __init__(self, size: int = TEMPLATE_CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[StepKey, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: StepKey):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: StepKey, subject: str, content: str):
+        try:
+            entry = compile_step(subject, content)
+        except Exception as e:
+            entry = f"Template error: {e}"
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+
+template_cache = TemplateCache()
+
+
+def step_sources(db: Session, step_ids: Iterable[int]) -> Dict[int, Tuple[int, str, str]]:
+    """step id -> (version, subject source, body source)"""
+    rows = db.execute(
+        select(FlowStep.id, FlowStep.version, FlowStep.subject, FlowStep.content, Flow.name)
+        .join(Flow, Flow.id == FlowStep.flow_id)
+        .where(FlowStep.id.in_(list(step_ids)))
+    )
+    return {row.id: (row.version, row.subject or row.name or "", row.content or "") for row in rows}
+
+
+def get_templates(db: Session, keys: Iterable[StepKey]) -> dict:
+    """Compiled steps (or their compile error) for `keys`, compiling only steps not cached yet"""
+    found = {key: template_cache.get(key) for key in set(keys)}
+    missing = [key for key, entry in found.items() if entry is None]
+    if missing:
+        sources = step_sources(db, {step_id for step_id, _ in missing})
+        for key in missing:
+            if key[0] not in sources:
+                found[key] = STEP_DELETED
+                continue
+            version, subject, content = sources[key[0]]
+            # Edited since the message was claimed: send the current version
+            found[key] = template_cache.put((key[0], version), subject, content)
+    return found
+
+
+def _last_products(db: Session, customer_ids: List[int]) -> Dict[int, str]:
+    latest = (
+        select(
+            Order.customer_id,
+            OrderItem.product_id,
+            func.row_number().over(
+                partition_by=Order.customer_id, order_by=(Order.date.desc(), Order.id.desc(), OrderItem.id)
+            ).label("rn"),
+        )
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .where(Order.customer_id.in_(customer_ids), Order.status != OrderStatus.CANCELLED.value)
+        .subquery()
+    )
+    rows = db.execute(select(latest.c.customer_id, latest.c.product_id).where(latest.c.rn == 1)).all()
+    names = resolve_products(db, {product_id for _, product_id in rows})
+    return {customer_id: names[product_id].name for customer_id, product_id in rows if product_id in names}
+
+
+def load_fields(db: Session, customer_ids: Iterable[int], fields: Iterable[str]) -> Dict[int, dict]:
+    """Template context per customer with just `fields`, from one column projection"""
+    fields = set(fields)
+    ids = list(set(customer_ids))
+    contexts = {customer_id: {} for customer_id in ids}
+    columns = sorted(
+        {column for f in fields for column in DERIVED_FIELDS.get(f, (f,))} & set(FIELD_COLUMNS)
+    )
+    if columns and ids:
+        rows = db.execute(
+            select(Customer.id, *[FIELD_COLUMNS[c] for c in columns]).where(Customer.id.in_(ids))
+        )
+        for customer_id, *values in rows:
+            contexts[customer_id] = dict(zip(columns, values))
+    if "name" in fields:
+        for context in contexts.values():
+            context["name"] = " ".join(filter(None, (context.get("first_name"), context.get("last_name"))))
+    if "last_product" in fields and ids:
+        for customer_id, name in _last_products(db, ids).items():
+            contexts[customer_id]["last_product"] = name
+    return contexts
+
+
+def _render(step: CompiledStep, context: dict) -> RenderedEmail:
+    try:
+        return RenderedEmail(step.subject.render(context).strip(), step.body.render(context))
+    except Exception as e:
+        return RenderedEmail(None, None, f"Template error: {e}")
+
+
+# Process pool workers compile for themselves, from the sources sent along with each chunk
+_worker_cache = TemplateCache()
+
+
+def _render_chunk(sources: Dict[int, Tuple[int, str, str]], items: List[Tuple[StepKey, dict]]) -> List[RenderedEmail]:
+    out = []
+    for (step_id, _), context in items:
+        if step_id not in sources:
+            out.append(RenderedEmail(None, None, STEP_DELETED))
+            continue
+        version, subject, content = sources[step_id]
+        step = _worker_cache.get((step_id, version)) or _worker_cache.put((step_id, version), subject, content)
+        out.append(_render(step, context) if isinstance(step, CompiledStep) else RenderedEmail(None, None, step))
+    return out
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _pool_size() -> int:
+    return settings.EMAIL_RENDER_PROCESSES or os.cpu_count() or 1
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the caller is a threaded server process, which isn't safe to fork
+            _pool = ProcessPoolExecutor(max_workers=_pool_size(), mp_context=get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _render_in_pool(db: Session, items: List[Tuple[StepKey, dict]]) -> List[RenderedEmail]:
+    sources = step_sources(db, {step_id for (step_id, _), _ in items})
+    pool = _get_pool()
+    size = -(-len(items) // _pool_size())
+    futures = []
+    for start in range(0, len(items), size):
+        chunk = items[start:start + size]
+        chunk_sources = {step_id: sources[step_id] for (step_id, _), _ in chunk if step_id in sources}
+        futures.append(pool.submit(_render_chunk, chunk_sources, chunk))
+    return [rendered for future in futures for rendered in future.result()]
+
+
+def render_messages(db: Session, messages: Sequence[Tuple[int, int, int]]) -> List[RenderedEmail]:
+    """Render (step id, step version, customer id) messages, in order"""
+    if not messages:
+        return []
+    templates = get_templates(db, {(step_id, version) for step_id, version, _ in messages})
+
+    fields_by_customer = defaultdict(set)
+    for step_id, version, customer_id in messages:
+        step = templates[(step_id, version)]
+        if isinstance(step, CompiledStep):
+            fields_by_customer[customer_id] |= step.fields
+    contexts = load_fields(db, fields_by_customer, set().union(*fields_by_customer.values()))
+
+    results: List[Optional[RenderedEmail]] = [None] * len(messages)
+    items, positions = [], []
+    for i, (step_id, version, customer_id) in enumerate(messages):
+        step = templates[(step_id, version)]
+        if isinstance(step, CompiledStep):
+            items.append(((step_id, version), contexts.get(customer_id, {})))
+            positions.append(i)
+        else:
+            results[i] = RenderedEmail(None, None, step)
+
+    if len(items) >= settings.EMAIL_RENDER_POOL_THRESHOLD:
+        rendered = _render_in_pool(db, items)
+    else:
+        rendered = [_render(templates[key], context) for key, context in items]
+    for i, result in zip(positions, rendered):
+        results[i] = result
+    return results
@@ -0,0 +1,235 @@
+# Flow email open/click tracking: signed links, buffered ingestion, batched counter writes
+#
+#   links    When TRACKING_BASE_URL is set, every flow email gets a 1x1 pixel
+#            (/api/track/open/{token}) and its http(s) links are routed through
+#            /api/track/click/{token}?url=... Tokens carry the message id and an
+#            HMAC of it (and of the URL, for clicks), so they can't be forged to
+#            inflate counts or turn the redirect into an open redirect.
+#   ingest   The endpoints only append to an in-process EventBuffer and return;
+#            nothing touches the database per event.
+#   flush    Every EMAIL_EVENTS_FLUSH_SECONDS the buffer is drained in one
+#            transaction: raw events are bulk-inserted into email_events, the
+#            messages opened or clicked for the first time are stamped
+#            (flow_messages.opened_at / clicked_at, with a conditional UPDATE so
+#            concurrent workers can't count a message twice), and their summed
+#            deltas are added to flows.total_opened/total_clicked and
+#            flow_steps.open_count/click_count (one UPDATE per flow and step
+#            touched, however many events came in) and to the flow_step_stats
+#            rollup (one upsert).
+#
+# Counters are per message: a message opened ten times counts one open, and a
+# click counts as an open too (images are often blocked). Events still buffered
+# when a worker dies are lost; a full buffer drops new events until it's flushed.
+
+import base64
+import hashlib
+import hmac
+import logging
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.auth import SECRET_KEY
+from app.config import settings
+from app.models import EmailEvent, EmailEventType, Flow, FlowMessage, FlowStep
+from app.services.flow_analytics import StatDeltas, add_stat, record_flow_stats
+
+logger = logging.getLogger(__name__)
+
+# Messages looked up per statement
+LOOKUP_CHUNK = 1000
+
+_KEY = hashlib.sha256(b"email-tracking:" + SECRET_KEY.encode()).digest()
+_HREF = re.compile(r'(<a\b[^>]*?\bhref=")(https?://[^"]+)(")', re.IGNORECASE)
+
+
+class TrackedEvent(NamedTuple):
+    message_id: int
+    event_type: str
+    url: Optional[str]
+    at: datetime
+
+
+def _sign(*parts) -> str:
+    digest = hmac.new(_KEY, ":".join(map(str, parts)).encode(), hashlib.sha256).digest()[:12]
+    return base64.urlsafe_b64encode(digest).decode()
+
+
+def make_token(message_id: int, url: str = None) -> str:
+    return f"{message_id}.{_sign(message_id, url or '')}"
+
+
+def read_token(token: str, url: str = None) -> Optional[int]:
+    """The message id of a valid token, or None"""
+    message_id, _, signature = token.partition(".")
+    if not message_id.isdigit() or not hmac.compare_digest(signature, _sign(int(message_id), url or "")):
+        return None
+    return int(message_id)
+
+
+def add_tracking(body: str, message_id: int) -> str:
+    """Route a rendered body's links through the click endpoint and add the open pixel"""
+    base = settings.TRACKING_BASE_URL.rstrip("/")
+    if not base:
+        return body
+
+    def track_link(match) -> str:
+        url = match.group(2).replace("&amp;", "&")
+        tracked = f"{base}/api/track/click/{make_token(message_id, url)}?url={quote(url, safe='')}"
+        return match.group(1) + tracked + match.group(3)
+
+    pixel = f'<img src="{base}/api/track/open/{make_token(message_id)}" width="1" height="1" alt="">'
+    body = _HREF.sub(track_link, body)
+    at = body.lower().rfind("</body>")
+    return body + pixel if at < 0 else body[:at] + pixel + body[at:]
+
+
+class EventBuffer:
+    """Events received since the last flush, shared by the request handlers and the flush job"""
+
+    def __init__(self, max_size: int = None):
+        self.max_size = max_size or settings.EMAIL_EVENTS_BUFFER_SIZE
+        self.dropped = 0
+        self._events: List[TrackedEvent] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, message_id: int, event_type: EmailEventType, url: str = None) -> None:
+        event = TrackedEvent(message_id, event_type.value, url, datetime.utcnow())
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                self.dropped += 1
+            else:
+                self._events.append(event)
+
+    def drain(self) -> Tuple[List[TrackedEvent], int]:
+        """Take the buffered events, and the number dropped since the last drain"""
+        with self._lock:
+            events, self._events = self._events, []
+            dropped, self.dropped = self.dropped, 0
+            return events, dropped
+
+    def put_back(self, events: List[TrackedEvent]) -> None:
+        """Return events whose flush failed, ahead of newer ones, as far as they fit"""
+        with self._lock:
+            kept = events[:max(self.max_size - len(self._events), 0)]
+            self.dropped += len(events) - len(kept)
+            self._events[:0] = kept
+
+
+event_buffer = EventBuffer()
+
+
+def _mark_first(db: Session, column: str, message_ids: set, now: datetime) -> list:
+    """Stamp `column` on the messages that don't have it yet; returns their (flow_id, step_id, sent_at)"""
+    messages = FlowMessage.__table__
+    marked = []
+    ids = sorted(message_ids)
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        marked += db.execute(
+            update(messages)
+            .where(messages.c.id.in_(ids[start:start + LOOKUP_CHUNK]), messages.c[column].is_(None))
+            .values({column: now})
+            .returning(messages.c.flow_id, messages.c.step_id, messages.c.sent_at)
+        ).all()
+    return marked
+
+
+def _add_counts(db: Session, opened: list, clicked: list, now: datetime) -> None:
+    flows = Flow.__table__
+    steps = FlowStep.__table__
+    opens_by_flow = Counter(flow_id for flow_id, _, _ in opened)
+    clicks_by_flow = Counter(flow_id for flow_id, _, _ in clicked)
+    opens_by_step = Counter(step_id for _, step_id, _ in opened)
+    clicks_by_step = Counter(step_id for _, step_id, _ in clicked)
+    # In id order, so concurrent flushes take the row locks in the same order
+    for flow_id in sorted(opens_by_flow | clicks_by_flow):
+        db.execute(
+            update(flows)
+            .where(flows.c.id == flow_id)
+            .values(
+                total_opened=flows.c.total_opened + opens_by_flow[flow_id],
+                total_clicked=flows.c.total_clicked + clicks_by_flow[flow_id],
+                updated_at=flows.c.updated_at,
+            )
+        )
+    for step_id in sorted(opens_by_step | clicks_by_step):
+        db.execute(
+            update(steps)
+            .where(steps.c.id == step_id)
+            .values(
+                open_count=steps.c.open_count + opens_by_step[step_id],
+                click_count=steps.c.click_count + clicks_by_step[step_id],
+            )
+        )
+
+    deltas: StatDeltas = {}
+    for flow_id, step_id, sent_at in opened:
+        add_stat(deltas, flow_id, step_id, now, opened=1, open_seconds=(now - sent_at).total_seconds() if sent_at else 0)
+    for flow_id, step_id, _ in clicked:
+        add_stat(deltas, flow_id, step_id, now, clicked=1)
+    record_flow_stats(db, deltas)
+
+
+def record_events(db: Session, events: List[TrackedEvent], now: datetime = None) -> int:
+    """Store raw events and add first opens/clicks to the counters; returns events stored. Nothing is committed here."""
+    now = now or datetime.utcnow()
+    ids = sorted({event.message_id for event in events})
+    messages = {}
+    for start in range(0, len(ids), LOOKUP_CHUNK):
+        rows = db.execute(
+            select(FlowMessage.id, FlowMessage.flow_id, FlowMessage.step_id, FlowMessage.customer_id)
+            .where(FlowMessage.id.in_(ids[start:start + LOOKUP_CHUNK]))
+        )
+        messages.update((row.id, row) for row in rows)
+
+    # Messages deleted with their flow since they were sent are skipped
+    rows = [
+        {
+            "message_id": event.message_id,
+            "flow_id": messages[event.message_id].flow_id,
+            "step_id": messages[event.message_id].step_id,
+            "customer_id": messages[event.message_id].customer_id,
+            "event_type": event.event_type,
+            "url": event.url,
+            "created_at": event.at,
+        }
+        for event in events
+        if event.message_id in messages
+    ]
+    if not rows:
+        return 0
+    db.execute(insert(EmailEvent.__table__), rows)
+
+    clicked_ids = {row["message_id"] for row in rows if row["event_type"] == EmailEventType.CLICK.value}
+    opened = _mark_first(db, "opened_at", {row["message_id"] for row in rows}, now)
+    clicked = _mark_first(db, "clicked_at", clicked_ids, now)
+    _add_counts(db, opened, clicked, now)
+    return len(rows)
+
+
+def flush_events(buffer: EventBuffer = event_buffer) -> int:
+    """Drain the buffer into the database; events of a failed flush go back into the buffer"""
+    from app.database import SessionLocal
+
+    events, dropped = buffer.drain()
+    if dropped:
+        logger.warning(f"Email event buffer was full; dropped {dropped} events")
+    if not events:
+        return 0
+    try:
+        with SessionLocal() as db:
+            stored = record_events(db, events)
+            db.commit()
+    except Exception:
+        buffer.put_back(events)
+        raise
+    return stored
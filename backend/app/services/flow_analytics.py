@@ -0,0 +1,313 @@
+# Flow funnel analytics, served from the hourly flow_step_stats rollup
+#
+# flow_step_stats holds per (flow_id, step_id, hour) the messages sent, opened for
+# the first time, clicked for the first time and followed by an order, the revenue
+# of those orders, and the seconds from send to first open (for time to open).
+# Each count lands in the hour it happened: an open in the hour of the open, not of
+# the send. The rollup is added to in the transaction that changes the messages:
+#   sent             services/flow_delivery.py, as delivery results are recorded
+#   opened, clicked  services/email_tracking.py, as buffered events are flushed
+#   ordered          attribute_orders() here, a scheduled job: each order placed
+#                    since its last run is credited to one message, the last one its
+#                    customer was sent in the FLOW_ATTRIBUTION_DAYS before it that
+#                    isn't credited with an order yet (last touch; stored in
+#                    flow_messages.order_id). Crediting one message per order keeps
+#                    flow totals from counting an order once per email received.
+# `python -m app.services.flow_analytics backfill` rebuilds the rollup from
+# flow_messages; orders already moved to cold storage no longer count then.
+#
+# A report reads at most a few thousand rollup rows however many messages and
+# events the flow has, and buckets them by hour or day in Python.
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import FlowMessage, FlowMessageStatus, FlowStep, FlowStepStats, Order, OrderStatus
+from app.utils.upsert import increment_upsert
+
+logger = logging.getLogger(__name__)
+
+STAT_COUNTERS = ["sent", "opened", "clicked", "ordered", "revenue", "open_seconds"]
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+# Upper bound on buckets per report (about 83 days of hours)
+MAX_BUCKETS = 2000
+# Orders are matched again this far back on every run, for orders committed after a run started
+ATTRIBUTION_OVERLAP = timedelta(minutes=10)
+# Messages updated per statement
+CHUNK = 1000
+
+# (flow_id, step_id, hour) -> counters
+StatDeltas = Dict[Tuple[int, int, datetime], dict]
+
+
+class AnalyticsError(ValueError):
+    """Raised for an invalid report range or granularity"""
+
+
+def hour_bucket(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def add_stat(deltas: StatDeltas, flow_id: int, step_id: int, at: datetime, **counters) -> None:
+    key = (flow_id, step_id, hour_bucket(at))
+    row = deltas.get(key)
+    if row is None:
+        row = deltas[key] = {"flow_id": flow_id, "step_id": step_id, "bucket": key[2], **dict.fromkeys(STAT_COUNTERS, 0)}
+    for name, value in counters.items():
+        row[name] += value
+
+
+def record_flow_stats(db: Session, deltas: StatDeltas) -> None:
+    """Add deltas to the rollup (one upsert). Nothing is committed here."""
+    if deltas:
+        db.execute(
+            increment_upsert(db.get_bind(), FlowStepStats.__table__, ["flow_id", "step_id", "bucket"], STAT_COUNTERS),
+            [deltas[key] for key in sorted(deltas)]  # Key order, so concurrent writers can't deadlock
+        )
+
+
+def attribute_orders(db: Session, since: datetime, until: datetime) -> int:
+    """
+    Credit each order placed in (since, until] to the last uncredited message its
+    customer was sent within FLOW_ATTRIBUTION_DAYS before it; returns how many
+    orders were credited. Nothing is committed here.
+    """
+    window = timedelta(days=settings.FLOW_ATTRIBUTION_DAYS)
+    messages = FlowMessage.__table__
+    rows = db.execute(
+        select(
+            messages.c.id, messages.c.flow_id, messages.c.step_id, messages.c.sent_at,
+            Order.id, Order.date, Order.total_amount,
+        )
+        .join(Order, Order.customer_id == messages.c.customer_id)
+        .where(
+            Order.date > since,
+            Order.date <= until,
+            Order.status != OrderStatus.CANCELLED.value,
+            messages.c.status == FlowMessageStatus.SENT.value,
+            messages.c.order_id.is_(None),
+            messages.c.sent_at >= since - window,
+            messages.c.sent_at < Order.date,
+        )
+        .order_by(Order.date, Order.id, messages.c.sent_at.desc(), messages.c.id.desc())
+    ).all()
+
+    # Orders credited by an earlier (overlapping) run
+    order_ids = sorted({row[4] for row in rows})
+    credited_orders = set()
+    for start in range(0, len(order_ids), CHUNK):
+        credited_orders.update(db.scalars(
+            select(messages.c.order_id).where(messages.c.order_id.in_(order_ids[start:start + CHUNK]))
+        ))
+
+    # Each order's last touch: rows come newest message first within an order
+    touches = {}
+    for message_id, flow_id, step_id, sent_at, order_id, order_date, total in rows:
+        if order_id in credited_orders or message_id in touches or order_date - sent_at > window:
+            continue
+        credited_orders.add(order_id)
+        touches[message_id] = (flow_id, step_id, order_id, order_date, total)
+
+    deltas: StatDeltas = {}
+    ids = sorted(touches)
+    for start in range(0, len(ids), CHUNK):
+        chunk = ids[start:start + CHUNK]
+        # Conditional, so concurrent runs (or workers) credit a message only once
+        credited = db.execute(
+            update(messages)
+            .where(messages.c.id.in_(chunk), messages.c.order_id.is_(None))
+            .values(order_id=case({i: touches[i][2] for i in chunk}, value=messages.c.id))
+            .returning(messages.c.id)
+        ).scalars().all()
+        for message_id in credited:
+            flow_id, step_id, _, order_date, total = touches[message_id]
+            add_stat(deltas, flow_id, step_id, order_date, ordered=1, revenue=total)
+    record_flow_stats(db, deltas)
+    return sum(row["ordered"] for row in deltas.values())
+
+
+class OrderAttribution:
+    """attribute_orders() over the orders placed since the last run; run by the scheduler (see main.py)"""
+
+    def __init__(self):
+        self.until: Optional[datetime] = None
+
+    def run(self, now: datetime = None) -> int:
+        from app.database import SessionLocal
+
+        now = now or datetime.utcnow()
+        # The first run after a restart looks back over a whole window; crediting is idempotent
+        since = (self.until or now - timedelta(days=settings.FLOW_ATTRIBUTION_DAYS)) - ATTRIBUTION_OVERLAP
+        with SessionLocal() as db:
+            credited = attribute_orders(db, since, now)
+            db.commit()
+        self.until = now
+        return credited
+
+
+order_attribution = OrderAttribution()
+
+
+def rebuild_flow_stats(db: Session, flow_id: int = None) -> int:
+    """Recompute the rollup (of one flow, or all) from flow_messages; returns the number of rows written"""
+    messages = FlowMessage.__table__
+    query = (
+        select(
+            messages.c.flow_id, messages.c.step_id, messages.c.sent_at, messages.c.opened_at,
+            messages.c.clicked_at, Order.date, Order.total_amount,
+        )
+        .outerjoin(Order, Order.id == messages.c.order_id)
+        .where(messages.c.sent_at.is_not(None))
+    )
+    if flow_id is not None:
+        query = query.where(messages.c.flow_id == flow_id)
+
+    deltas: StatDeltas = {}
+    for f_id, step_id, sent_at, opened_at, clicked_at, order_date, total in db.execute(
+        query.execution_options(yield_per=10000)
+    ):
+        add_stat(deltas, f_id, step_id, sent_at, sent=1)
+        if opened_at:
+            add_stat(deltas, f_id, step_id, opened_at, opened=1, open_seconds=(opened_at - sent_at).total_seconds())
+        if clicked_at:
+            add_stat(deltas, f_id, step_id, clicked_at, clicked=1)
+        if order_date:
+            add_stat(deltas, f_id, step_id, order_date, ordered=1, revenue=total)
+
+    stats = delete(FlowStepStats)
+    if flow_id is not None:
+        stats = stats.where(FlowStepStats.flow_id == flow_id)
+    db.execute(stats)
+    record_flow_stats(db, deltas)
+    return len(deltas)
+
+
+def _bucket_start(at: datetime, granularity: str) -> datetime:
+    at = hour_bucket(at)
+    return at.replace(hour=0) if granularity == "day" else at
+
+
+def _percent(part: float, whole: float) -> float:
+    return round(part / whole * 100, 1) if whole else 0.0
+
+
+def _with_rates(counts: dict) -> dict:
+    return {
+        "sent": counts["sent"],
+        "opened": counts["opened"],
+        "clicked": counts["clicked"],
+        "ordered": counts["ordered"],
+        "revenue": round(counts["revenue"], 2),
+        "open_rate": _percent(counts["opened"], counts["sent"]),
+        "click_rate": _percent(counts["clicked"], counts["sent"]),
+        "click_to_open_rate": _percent(counts["clicked"], counts["opened"]),
+        "order_rate": _percent(counts["ordered"], counts["sent"]),
+        "avg_hours_to_open": round(counts["open_seconds"] / counts["opened"] / 3600, 2) if counts["opened"] else None,
+    }
+
+
+def flow_analytics(db: Session, flow_id: int, days: int, granularity: str, now: datetime = None) -> dict:
+    """
+    Step-by-step funnel and time series over the last `days` days. Counts are by when
+    things happened, so messages sent before the range can add opens, clicks and
+    orders to it.
+    """
+    if granularity not in GRANULARITIES:
+        raise AnalyticsError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    now = now or datetime.utcnow()
+    step = GRANULARITIES[granularity]
+    last = _bucket_start(now, granularity)
+    first = _bucket_start(now - timedelta(days=days), granularity) + step
+    if (last - first) // step + 1 > MAX_BUCKETS:
+        raise AnalyticsError(f"Range spans more than {MAX_BUCKETS} {granularity} buckets")
+
+    series: Dict[datetime, dict] = {}
+    bucket = first
+    while bucket <= last:
+        series[bucket] = dict.fromkeys(STAT_COUNTERS, 0)
+        bucket += step
+
+    steps = db.execute(
+        select(FlowStep.id, FlowStep.order, FlowStep.step_type, FlowStep.subject)
+        .where(FlowStep.flow_id == flow_id)
+        .order_by(FlowStep.order)
+    ).all()
+    by_step = {s.id: dict.fromkeys(STAT_COUNTERS, 0) for s in steps}
+    rows = db.execute(
+        select(FlowStepStats.step_id, FlowStepStats.bucket, *[FlowStepStats.__table__.c[c] for c in STAT_COUNTERS])
+        .where(FlowStepStats.flow_id == flow_id, FlowStepStats.bucket >= first)
+    )
+    for step_id, at, *values in rows:
+        for counts in (by_step.setdefault(step_id, dict.fromkeys(STAT_COUNTERS, 0)),
+                       series.get(_bucket_start(at, granularity))):
+            if counts is not None:
+                for name, value in zip(STAT_COUNTERS, values):
+                    counts[name] += value
+
+    funnel = []
+    first_sent = None
+    for s in steps:
+        counts = by_step[s.id]
+        if s.step_type == "email" and first_sent is None:
+            first_sent = counts["sent"]
+        funnel.append({
+            "step_id": s.id,
+            "order": s.order,
+            "step_type": s.step_type,
+            "subject": s.subject,
+            **_with_rates(counts),
+            # Share of the first email step's recipients this step reached
+            "reach_rate": _percent(counts["sent"], first_sent or 0),
+        })
+
+    totals = {name: sum(counts[name] for counts in by_step.values()) for name in STAT_COUNTERS}
+    return {
+        "flow_id": flow_id,
+        "from": first,
+        "to": last + step,
+        "granularity": granularity,
+        "attribution_days": settings.FLOW_ATTRIBUTION_DAYS,
+        "steps": funnel,
+        "totals": _with_rates(totals),
+        "series": [
+            {
+                "start": start,
+                **{name: counts[name] for name in ("sent", "opened", "clicked", "ordered")},
+                "revenue": round(counts["revenue"], 2),
+            }
+            for start, counts in series.items()
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the flow_step_stats rollup")
+    parser.add_argument("action", choices=["backfill", "attribute"])
+    parser.add_argument("--flow", type=int, default=None, help="Only this flow (backfill)")
+    parser.add_argument("--days", type=int, default=None, help="Match orders of the last DAYS days (attribute)")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        if args.action == "backfill":
+            rows = rebuild_flow_stats(db, args.flow)
+            db.commit()
+            print(f"Rebuilt {rows} flow stats rows")
+        else:
+            now = datetime.utcnow()
+            days = args.days or settings.FLOW_ATTRIBUTION_DAYS
+            credited = attribute_orders(db, now - timedelta(days=days), now)
+            db.commit()
+            print(f"Credited orders to {credited} flow messages")
+
+
+if __name__ == "__main__":
+    main()
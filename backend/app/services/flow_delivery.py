@@ -0,0 +1,264 @@
+# Flow message delivery: drains the flow_messages outbox through the Mailer (core/mailer.py)
+#
+#   claim    Queued messages are claimed EMAIL_BATCH_SIZE at a time, oldest first,
+#            with FOR UPDATE SKIP LOCKED, marked "sending" and committed, so
+#            concurrent workers never send the same message. Messages of customers
+#            who have opted out since they were queued, or whose customer or step
+#            has been deleted, fail without being sent.
+#   render   The claimed batch is personalized in one go by services/email_templates.py;
+#            a message whose template doesn't render fails without being sent.
+#            Bodies get the open pixel and tracked links (services/email_tracking.py).
+#   send     The batch goes to the mailer, which spreads it over its persistent
+#            SMTP connections under the per-domain rate limits. Two batches are
+#            in flight at a time, so the connections don't idle while the next
+#            batch is claimed or the last one recorded.
+#   record   Outcomes are written with one bulk UPDATE, and flows.total_sent and
+#            flow_steps.sent_count (and the flow_step_stats rollup) are
+#            incremented by the number of messages actually delivered.
+#
+# Delivery is at least once: a worker that dies mid-batch leaves its messages
+# "sending", and they're queued again after EMAIL_CLAIM_TIMEOUT_SECONDS. The app
+# runs a worker when MAIL_SERVER is set (see main.py);
+# `python -m app.services.flow_delivery [--loop]` runs one in a process of its own.
+
+import argparse
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.core.mailer import DeliveryResult, Mailer, OutgoingEmail
+from app.models import Customer, Flow, FlowMessage, FlowMessageStatus, FlowStep
+from app.services.email_templates import RenderedEmail, render_messages, shutdown_pool
+from app.services.flow_analytics import StatDeltas, add_stat, record_flow_stats
+from app.services.email_tracking import add_tracking
+
+logger = logging.getLogger(__name__)
+
+BATCHES_IN_FLIGHT = 2
+
+OPTED_OUT = "Customer opted out of email"
+CUSTOMER_DELETED = "Customer no longer exists"
+
+
+def claim_messages(db: Session, limit: int, now: datetime = None) -> list:
+    """
+    Claim up to `limit` queued messages, with what's needed to send them (email is
+    None if the customer was deleted, version if the step was). Nothing is committed
+    here.
+    """
+    now = now or datetime.utcnow()
+    messages = FlowMessage.__table__
+
+    # Hand out claims of workers that never finished
+    db.execute(
+        update(messages)
+        .where(
+            messages.c.status == FlowMessageStatus.SENDING.value,
+            messages.c.claimed_at < now - timedelta(seconds=settings.EMAIL_CLAIM_TIMEOUT_SECONDS),
+        )
+        .values(status=FlowMessageStatus.QUEUED.value)
+    )
+
+    ids = db.scalars(
+        select(messages.c.id)
+        .where(messages.c.status == FlowMessageStatus.QUEUED.value)
+        .order_by(messages.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        return []
+    db.execute(
+        update(messages)
+        .where(messages.c.id.in_(ids))
+        .values(status=FlowMessageStatus.SENDING.value, claimed_at=now, attempts=messages.c.attempts + 1)
+    )
+    rows = db.execute(
+        select(
+            messages.c.id, messages.c.flow_id, messages.c.step_id, messages.c.customer_id,
+            Customer.email, Customer.email_opt_in, FlowStep.version,
+        )
+        # Outer joins: every claimed message must come back, or it would stay "sending"
+        .outerjoin(Customer, Customer.id == messages.c.customer_id)
+        .outerjoin(FlowStep, FlowStep.id == messages.c.step_id)
+        .where(messages.c.id.in_(ids))
+        .order_by(messages.c.id)
+    ).all()
+    return rows
+
+
+def record_results(db: Session, results: List[DeliveryResult], now: datetime = None) -> int:
+    """Store delivery outcomes and count the sent messages; returns how many were sent. Nothing is committed here."""
+    now = now or datetime.utcnow()
+    if not results:
+        return 0
+    db.execute(update(FlowMessage), [
+        {
+            "id": result.email.key[0],
+            "status": (FlowMessageStatus.SENT if result.ok else FlowMessageStatus.FAILED).value,
+            "sent_at": now if result.ok else None,
+            "claimed_at": None,
+            "error": result.error,
+        }
+        for result in results
+    ])
+
+    sent = [result.email.key for result in results if result.ok]
+    by_flow = Counter(flow_id for _, flow_id, _ in sent)
+    by_step = Counter(step_id for _, _, step_id in sent)
+    flows = Flow.__table__
+    steps = FlowStep.__table__
+    # In id order, so concurrent workers take the row locks in the same order
+    for flow_id in sorted(by_flow):
+        db.execute(
+            update(flows)
+            .where(flows.c.id == flow_id)
+            # Keep updated_at: it tracks edits to the flow, not its metrics
+            .values(total_sent=flows.c.total_sent + by_flow[flow_id], updated_at=flows.c.updated_at)
+        )
+    for step_id in sorted(by_step):
+        db.execute(
+            update(steps).where(steps.c.id == step_id).values(sent_count=steps.c.sent_count + by_step[step_id])
+        )
+
+    deltas: StatDeltas = {}
+    for _, flow_id, step_id in sent:
+        add_stat(deltas, flow_id, step_id, now, sent=1)
+    record_flow_stats(db, deltas)
+    return len(sent)
+
+
+def _claim(limit: int) -> list:
+    """
+    Claim and render a batch: (row, RenderedEmail) pairs. Messages that can't be
+    sent (opted out, customer or step deleted, template error) carry the reason as
+    the error.
+    """
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        rows = claim_messages(db, limit)
+        db.commit()
+        # After the commit, so the claimed rows aren't kept locked while rendering.
+        # Messages of deleted steps are rendered too, and come back as STEP_DELETED.
+        sendable = [row for row in rows if row.email is not None and row.email_opt_in]
+        rendered = render_messages(db, [(row.step_id, row.version, row.customer_id) for row in sendable])
+    by_id = {row.id: email for row, email in zip(sendable, rendered)}
+    return [
+        (row, by_id.get(row.id) or RenderedEmail(None, None, CUSTOMER_DELETED if row.email is None else OPTED_OUT))
+        for row in rows
+    ]
+
+
+def _record(results: List[DeliveryResult]) -> int:
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        sent = record_results(db, results)
+        db.commit()
+    return sent
+
+
+def build_email(row, rendered: RenderedEmail) -> OutgoingEmail:
+    return OutgoingEmail(
+        to=row.email or "",
+        subject=rendered.subject or "",
+        body=add_tracking(rendered.body or "", row.id),
+        key=(row.id, row.flow_id, row.step_id),
+    )
+
+
+async def deliver_batch(mailer: Mailer, claimed: list) -> int:
+    """Send a batch from _claim and record the outcome; returns how many were sent"""
+    results = await mailer.send_many([build_email(row, rendered) for row, rendered in claimed if rendered.error is None])
+    results += [
+        DeliveryResult(build_email(row, rendered), False, 0, rendered.error)
+        for row, rendered in claimed
+        if rendered.error is not None
+    ]
+    sent = await run_in_threadpool(_record, results)
+    if sent < len(claimed):
+        logger.warning(f"{len(claimed) - sent} of {len(claimed)} flow messages failed")
+    return sent
+
+
+async def deliver_pending(mailer: Mailer, loop: bool = False, limit: int = None) -> int:
+    """
+    Claim and send batches until nothing is queued (or, with `loop`, forever,
+    polling every EMAIL_POLL_SECONDS while idle); returns how many were sent.
+    """
+    limit = limit or settings.EMAIL_BATCH_SIZE
+    in_flight = set()
+    sent = 0
+    while True:
+        while len(in_flight) < BATCHES_IN_FLIGHT:
+            try:
+                claimed = await run_in_threadpool(_claim, limit)
+            except Exception as e:
+                logger.error(f"Claiming flow messages failed: {e}")
+                claimed = []
+            if not claimed:
+                break
+            in_flight.add(asyncio.create_task(deliver_batch(mailer, claimed)))
+
+        if in_flight:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    sent += task.result()
+                except Exception as e:
+                    # The claim lapses and the batch is sent again
+                    logger.error(f"Recording flow message delivery failed: {e}")
+        elif loop:
+            await asyncio.sleep(settings.EMAIL_POLL_SECONDS)
+        else:
+            return sent
+
+
+class FlowDeliveryWorker:
+    """Runs deliver_pending(loop=True) on the app's event loop; started and stopped by the lifespan in main.py"""
+
+    def __init__(self, mailer: Mailer = None):
+        self.mailer = mailer
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self.mailer = self.mailer or Mailer()
+        await self.mailer.start()
+        self._task = asyncio.create_task(deliver_pending(self.mailer, loop=True), name="flow_delivery")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.mailer.stop()
+        shutdown_pool()
+
+
+async def _run(loop: bool) -> int:
+    try:
+        async with Mailer() as mailer:
+            return await deliver_pending(mailer, loop=loop)
+    finally:
+        shutdown_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send queued flow messages")
+    parser.add_argument("--loop", action="store_true", help="Keep polling for new messages")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print(f"Sent {asyncio.run(_run(args.loop))} flow messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# Flow runtime: enrolls segment members into active flows and advances them step by step
+#
+# Every customer in a flow has one flow_enrollments row holding the order of the
+# step it waits for and when that step is due. FlowStep.delay_days/delay_hours is
+# the wait before a step, so enrolling sets due_at to now + the first step's delay.
+#
+#   enroll    When a segment-triggered flow turns active (and every
+#             FLOW_ENROLL_INTERVAL_SECONDS after that, for new segment members),
+#             one INSERT ... SELECT from the segment query adds the opted-in
+#             customers not yet enrolled; ON CONFLICT DO NOTHING keeps it idempotent.
+#   advance   Due enrollments of each active flow are claimed FLOW_BATCH_SIZE at a
+#             time with FOR UPDATE SKIP LOCKED, so any number of workers can share
+#             the work. Each runs its step (an email step queues a flow_messages
+#             row for delivery) and any zero-delay steps after it, then moves on to
+#             the next step or completes. Enrollments are updated with one UPDATE
+#             per next step, and the batch commits together with its messages: a
+#             crash loses nothing, the uncommitted batch is simply claimed again.
+#   timers    Flows aren't polled. Each process keeps a timing wheel (core/timer_wheel.py)
+#             with, per active flow, the earliest due_at of its enrollments, read with
+#             one probe of ix_flow_enrollments_due. A worker tick only pops the flows
+#             whose time has come, so an idle system issues no queries. After a batch
+#             the flow is re-armed from the index; a full batch means more is due and
+#             the flow stays in the round. Writes made by other processes are picked
+#             up by re-reading every active flow's next due time each
+#             FLOW_TIMER_RESYNC_SECONDS.
+#
+# Paused flows keep their enrollments and pick up where they stopped when resumed.
+# The scheduler in main.py runs both jobs, and flow order attribution
+# (services/flow_analytics.py), unless FLOW_WORKER_IN_APP is off;
+# `python -m app.services.flow_runtime [--loop]` runs all three in a process of its own.
+
+import argparse
+import logging
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import DateTime, Integer, String, func, insert, literal, select, true, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.timer_wheel import TimerWheel
+from app.models import (
+    Customer, EnrollmentStatus, Flow, FlowEnrollment, FlowMessage, FlowMessageStatus,
+    FlowStatus, FlowStep, FlowTrigger, Segment
+)
+from app.services.flow_analytics import order_attribution
+from app.services.segment_rules import get_segment_customers_query
+from app.utils.upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# A flow whose batch failed is retried after this long
+RETRY_DELAY = timedelta(minutes=1)
+
+
+def step_delay(step) -> timedelta:
+    return timedelta(days=step.delay_days or 0, hours=step.delay_hours or 0)
+
+
+def _flow_steps(db: Session, flow_id: int) -> list:
+    return db.query(
+        FlowStep.id, FlowStep.order, FlowStep.step_type, FlowStep.delay_days, FlowStep.delay_hours
+    ).filter(FlowStep.flow_id == flow_id).order_by(FlowStep.order).all()
+
+
+def next_due_at(db: Session, flow_id: int) -> Optional[datetime]:
+    """Earliest due_at of the flow's active enrollments"""
+    return db.scalar(select(func.min(FlowEnrollment.due_at)).where(
+        FlowEnrollment.flow_id == flow_id,
+        FlowEnrollment.status == EnrollmentStatus.ACTIVE.value,
+    ))
+
+
+class FlowTimers:
+    """When each active flow next has enrollments due, kept in a timing wheel"""
+
+    def __init__(self, resync_seconds: float):
+        self.resync_seconds = resync_seconds
+        self.wheel = TimerWheel()
+        self._synced_at: Optional[float] = None
+
+    def arm(self, db: Session, flow_id: int) -> None:
+        due = next_due_at(db, flow_id)
+        if due is not None:
+            self.wheel.schedule(flow_id, due)
+
+    def resync(self, db: Session) -> None:
+        self._synced_at = time.monotonic()
+        for flow_id in db.scalars(select(Flow.id).where(Flow.status == FlowStatus.ACTIVE.value)):
+            self.arm(db, flow_id)
+
+    def due_flows(self, db: Session, now: datetime = None) -> List[int]:
+        """Flow ids whose timers expired, earliest first"""
+        if self._synced_at is None or time.monotonic() - self._synced_at >= self.resync_seconds:
+            self.resync(db)
+        return self.wheel.pop_due(now)
+
+
+flow_timers = FlowTimers(settings.FLOW_TIMER_RESYNC_SECONDS)
+
+
+def enroll_flow(db: Session, flow: Flow, now: datetime = None) -> int:
+    """Enroll the flow's opted-in segment members that aren't enrolled yet; returns how many were added"""
+    if flow.status != FlowStatus.ACTIVE or flow.trigger_type != FlowTrigger.SEGMENT or not flow.segment_id:
+        return 0
+    steps = _flow_steps(db, flow.id)
+    segment = db.get(Segment, flow.segment_id)
+    if not steps or segment is None:
+        return 0
+
+    now = now or datetime.utcnow()
+    members = (
+        get_segment_customers_query(db, segment)
+        .filter(Customer.email_opt_in == True)
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        .filter(true())
+        .with_entities(
+            literal(flow.id, Integer),
+            Customer.id,
+            literal(EnrollmentStatus.ACTIVE.value, String),
+            literal(steps[0].order, Integer),
+            literal(now + step_delay(steps[0]), DateTime),
+            literal(now, DateTime),
+            literal(now, DateTime),
+        )
+    )
+    stmt = dialect_insert(db.get_bind(), FlowEnrollment.__table__).from_select(
+        ["flow_id", "customer_id", "status", "step_order", "due_at", "enrolled_at", "updated_at"],
+        members.statement,
+    ).on_conflict_do_nothing(index_elements=["flow_id", "customer_id"])
+    return db.execute(stmt).rowcount
+
+
+def advance_flow(db: Session, flow_id: int, now: datetime = None, limit: int = None) -> int:
+    """
+    Run the due steps of up to `limit` enrollments of one flow; returns how many
+    were claimed. Nothing is committed here.
+    """
+    now = now or datetime.utcnow()
+    limit = limit or settings.FLOW_BATCH_SIZE
+    claimed = db.execute(
+        select(FlowEnrollment.id, FlowEnrollment.customer_id, FlowEnrollment.step_order)
+        .where(
+            FlowEnrollment.flow_id == flow_id,
+            FlowEnrollment.status == EnrollmentStatus.ACTIVE.value,
+            FlowEnrollment.due_at <= now,
+        )
+        .order_by(FlowEnrollment.due_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not claimed:
+        return 0
+
+    steps = _flow_steps(db, flow_id)
+    orders = [s.order for s in steps]
+    delays = [step_delay(s) for s in steps]
+    # Enrollment ids by the index of the step they move on to (len(steps): completed)
+    next_step: Dict[int, List[int]] = defaultdict(list)
+    messages = []
+    for enrollment_id, customer_id, step_order in claimed:
+        # Steps may have been edited since; continue at the first step not before the stored one
+        i = bisect_left(orders, step_order)
+        while i < len(steps):
+            step = steps[i]
+            if step.step_type == "email":
+                messages.append({
+                    "flow_id": flow_id,
+                    "step_id": step.id,
+                    "customer_id": customer_id,
+                    "status": FlowMessageStatus.QUEUED.value,
+                    "created_at": now,
+                })
+            i += 1
+            if i == len(steps) or delays[i]:
+                break
+        next_step[i].append(enrollment_id)
+
+    for i, ids in next_step.items():
+        if i == len(steps):
+            values = dict(
+                status=EnrollmentStatus.COMPLETED.value, step_order=None, due_at=None, completed_at=now
+            )
+        else:
+            values = dict(step_order=orders[i], due_at=now + delays[i])
+        db.execute(update(FlowEnrollment).where(FlowEnrollment.id.in_(ids)).values(updated_at=now, **values))
+    if messages:
+        db.execute(insert(FlowMessage.__table__), messages)
+    return len(claimed)
+
+
+def advance_flows(now: datetime = None) -> int:
+    """
+    Advance the flows whose timers expired until nothing of theirs is due, one batch
+    per flow in turn so a large flow doesn't hold up the others. Each batch commits
+    on its own; returns how many enrollments were advanced.
+    """
+    from app.database import SessionLocal
+
+    total = 0
+    with SessionLocal() as db:
+        due = flow_timers.due_flows(db, now)
+        if not due:
+            return 0
+        # Paused and deleted flows drop out; activating a flow re-arms it
+        active = set(db.scalars(select(Flow.id).where(Flow.id.in_(due), Flow.status == FlowStatus.ACTIVE.value)))
+        pending = [flow_id for flow_id in due if flow_id in active]
+        while pending:
+            still_due = []
+            for flow_id in pending:
+                try:
+                    advanced = advance_flow(db, flow_id, now)
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"Advancing flow {flow_id} failed: {e}")
+                    flow_timers.wheel.schedule(flow_id, (now or datetime.utcnow()) + RETRY_DELAY)
+                    continue
+                total += advanced
+                if advanced == settings.FLOW_BATCH_SIZE:
+                    still_due.append(flow_id)
+                else:
+                    flow_timers.arm(db, flow_id)
+            pending = still_due
+    if total:
+        logger.info(f"Advanced {total} flow enrollments")
+    return total
+
+
+def enroll_active_flows() -> int:
+    """Enroll new segment members into every active segment flow; used by the scheduler and the CLI"""
+    from app.database import SessionLocal
+
+    total = 0
+    with SessionLocal() as db:
+        flows = db.query(Flow).filter(
+            Flow.status == FlowStatus.ACTIVE.value, Flow.trigger_type == FlowTrigger.SEGMENT.value
+        ).all()
+        for flow in flows:
+            try:
+                added = enroll_flow(db, flow)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Enrolling flow {flow.id} failed: {e}")
+                continue
+            if added:
+                total += added
+                flow_timers.arm(db, flow.id)
+    if total:
+        logger.info(f"Enrolled {total} customers into flows")
+    return total
+
+
+def start_flow(flow_id: int) -> int:
+    """
+    Enroll a flow that just turned active and arm its timer; run as a background task.
+    Dedicated worker processes see it at their next timer resync.
+    """
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        flow = db.get(Flow, flow_id)
+        added = enroll_flow(db, flow) if flow else 0
+        db.commit()
+        # Also re-arms the enrollments of a resumed flow
+        flow_timers.arm(db, flow_id)
+    if added:
+        logger.info(f"Enrolled {added} customers into flow {flow_id}")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Enroll customers into active flows, advance due enrollments and credit orders to flow messages"
+    )
+    parser.add_argument("--loop", action="store_true", help="Keep running on the configured intervals")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    enrolled_at = attributed_at = time.monotonic()
+    print(
+        f"Enrolled {enroll_active_flows()} customers, advanced {advance_flows()} enrollments, "
+        f"credited {order_attribution.run()} orders"
+    )
+    while args.loop:
+        time.sleep(settings.FLOW_WORKER_INTERVAL_SECONDS)
+        if time.monotonic() - enrolled_at >= settings.FLOW_ENROLL_INTERVAL_SECONDS:
+            enrolled_at = time.monotonic()
+            enroll_active_flows()
+        if time.monotonic() - attributed_at >= settings.FLOW_ATTRIBUTION_INTERVAL_SECONDS:
+            attributed_at = time.monotonic()
+            order_attribution.run()
+        advance_flows()
+
+
+if __name__ == "__main__":
+    main()
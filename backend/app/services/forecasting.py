@@ -0,0 +1,153 @@
+# Demand forecasting behind products.predicted_need
+#
+# Sales velocity per SKU is an exponentially weighted mean (half-life
+# HALF_LIFE_DAYS) of units sold per day over the last HISTORY_DAYS complete days,
+# read from daily_product_sales (order_items per day, cancelled orders excluded).
+# All SKUs are scored at once as a (SKU x day) matrix. The weighted standard
+# deviation sizes a safety stock, which gives:
+#   days_until_stockout  stock_level / velocity, NULL while a SKU isn't selling
+#   predicted_need       "Order Now" at or below the reorder point
+#                        (velocity x LEAD_TIME_DAYS + safety stock), "Restock Soon"
+#                        within one more lead time of it, otherwise "Healthy"
+# The reorder point is stored too, so predicted_need_expr() can re-derive the need
+# in SQL when a bulk stock update changes the level between forecasts.
+# The scheduler in main.py refreshes every SKU each FORECAST_INTERVAL_SECONDS;
+# product writes refresh the SKUs they touch.
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import Numeric, bindparam, case, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.models import DailyProductSales, Product
+from app.services.table_versions import bump_table_version
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DAYS = 28
+HALF_LIFE_DAYS = 7
+LEAD_TIME_DAYS = 7
+# Safety stock covers lead-time demand about 95% of the time
+SERVICE_LEVEL_Z = 1.65
+
+PREDICTED_NEEDS = ("Order Now", "Restock Soon", "Healthy")
+
+
+def forecast(stock: np.ndarray, units: np.ndarray):
+    """
+    Velocity, reorder point, days until stockout (NaN when not selling) and
+    predicted need for each row of `units` (SKU x day, oldest day first) given
+    current `stock`.
+    """
+    age = np.arange(units.shape[1])[::-1]
+    weights = 0.5 ** (age / HALF_LIFE_DAYS)
+    weights /= weights.sum()
+
+    velocity = units @ weights
+    std = np.sqrt(((units - velocity[:, None]) ** 2) @ weights)
+    reorder_point = velocity * LEAD_TIME_DAYS + SERVICE_LEVEL_Z * std * np.sqrt(LEAD_TIME_DAYS)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_until_stockout = np.where(velocity > 0, np.maximum(stock, 0) / velocity, np.nan)
+    need = np.where(
+        stock <= reorder_point, "Order Now",
+        np.where(stock <= reorder_point + velocity * LEAD_TIME_DAYS, "Restock Soon", "Healthy")
+    )
+    return velocity, reorder_point, days_until_stockout, need
+
+
+def predicted_need(stock_level, velocity: float = 0.0, reorder_point: float = 0.0) -> str:
+    """Need for one SKU at a given level; the defaults are a SKU without sales history"""
+    if stock_level <= reorder_point:
+        return "Order Now"
+    if stock_level <= reorder_point + velocity * LEAD_TIME_DAYS:
+        return "Restock Soon"
+    return "Healthy"
+
+
+def predicted_need_expr(stock_level, velocity, reorder_point):
+    """SQL version of predicted_need() for a stock level and the stored forecast columns"""
+    velocity = func.coalesce(velocity, 0)
+    reorder_point = func.coalesce(reorder_point, 0)
+    return case(
+        (stock_level <= reorder_point, "Order Now"),
+        (stock_level <= reorder_point + velocity * LEAD_TIME_DAYS, "Restock Soon"),
+        else_="Healthy"
+    )
+
+
+def days_until_stockout_expr(stock_level, velocity):
+    """SQL version of days_until_stockout for a stock level and the stored velocity"""
+    days = case((stock_level > 0, stock_level), else_=0) / velocity
+    return case((velocity > 0, func.round(cast(days, Numeric), 1)), else_=None)
+
+
+def update_forecasts(db: Session, product_ids: Optional[Iterable[int]] = None, today: Optional[date] = None) -> int:
+    """Recompute the forecast of the given products (default: all); returns how many changed"""
+    today = today or datetime.utcnow().date()
+    first = today - timedelta(days=HISTORY_DAYS)
+
+    query = select(
+        Product.id, Product.stock_level, Product.sales_velocity, Product.reorder_point,
+        Product.days_until_stockout, Product.predicted_need
+    )
+    sales = select(DailyProductSales.product_id, DailyProductSales.day, DailyProductSales.units).where(
+        DailyProductSales.day >= first, DailyProductSales.day < today
+    )
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        query = query.where(Product.id.in_(product_ids))
+        sales = sales.where(DailyProductSales.product_id.in_(product_ids))
+    products = db.execute(query).all()
+    if not products:
+        return 0
+
+    index = {p.id: i for i, p in enumerate(products)}
+    units = np.zeros((len(products), HISTORY_DAYS))
+    for product_id, day, quantity in db.execute(sales):
+        units[index[product_id], (day - first).days] = quantity
+    stock = np.array([p.stock_level or 0 for p in products], dtype=float)
+    velocity, reorder_point, days_until_stockout, need = forecast(stock, units)
+
+    changed = []
+    for i, p in enumerate(products):
+        row = {
+            "b_id": p.id,
+            "b_velocity": round(float(velocity[i]), 3),
+            "b_reorder": round(float(reorder_point[i]), 3),
+            "b_days": None if np.isnan(days_until_stockout[i]) else round(float(days_until_stockout[i]), 1),
+            "b_need": str(need[i]),
+        }
+        new = (row["b_velocity"], row["b_reorder"], row["b_days"], row["b_need"])
+        if new != (p.sales_velocity, p.reorder_point, p.days_until_stockout, p.predicted_need):
+            changed.append(row)
+
+    if changed:
+        products_table = Product.__table__
+        db.execute(
+            products_table.update()
+            .where(products_table.c.id == bindparam("b_id"))
+            .values(
+                sales_velocity=bindparam("b_velocity"),
+                reorder_point=bindparam("b_reorder"),
+                days_until_stockout=bindparam("b_days"),
+                predicted_need=bindparam("b_need"),
+            ),
+            changed
+        )
+        bump_table_version(db, "products")
+    return len(changed)
+
+
+def refresh_forecasts() -> int:
+    """Forecast every product in a session of its own; used by the scheduler"""
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        changed = update_forecasts(db)
+        db.commit()
+    if changed:
+        logger.info(f"Updated forecasts for {changed} products")
+    return changed
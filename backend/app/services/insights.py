@@ -0,0 +1,220 @@
+# Insights generator: anomalies found in the rollups, written as Insight rows
+#
+# Each detector loads one dense (item x day) matrix and scores it with numpy:
+#   revenue   daily revenue vs. the mean and std of the INSIGHTS_BASELINE_DAYS before it
+#   stock     products selling so much faster than over the baseline window that
+#             their stock now runs out within STOCKOUT_HORIZON_DAYS
+#   segments  today's segment sizes (snapshotted here) vs. their recent median
+# Every insight carries a key such as "revenue_spike:2026-01-31", so reruns and
+# concurrent workers insert it once. The scheduler started in main.py runs this every
+# INSIGHTS_INTERVAL_SECONDS; `python -m app.services.insights` runs it once.
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import List
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import DailyProductSales, DailySales, Insight, Product, Segment, SegmentSizeSnapshot
+from app.services.segment_rules import get_segment_customers_query
+from app.utils.upsert import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Complete days checked for revenue anomalies on each run
+REVENUE_LOOKBACK_DAYS = 3
+# Recent window whose sales rate is compared with the baseline rate
+STOCK_RECENT_DAYS = 7
+STOCK_ACCELERATION = 1.5
+STOCKOUT_HORIZON_DAYS = 14
+# Days of snapshots a segment's size is compared with
+SEGMENT_HISTORY_DAYS = 7
+SEGMENT_JUMP = 0.2
+SEGMENT_MIN_CHANGE = 5
+
+
+def revenue_anomalies(db: Session, today: date) -> List[dict]:
+    baseline = settings.INSIGHTS_BASELINE_DAYS
+    first = today - timedelta(days=baseline + REVENUE_LOOKBACK_DAYS)
+    revenue = np.zeros(baseline + REVENUE_LOOKBACK_DAYS)
+    rows = db.execute(
+        select(DailySales.day, DailySales.revenue).where(DailySales.day >= first, DailySales.day < today)
+    )
+    for day, value in rows:
+        revenue[(day - first).days] = value
+
+    # Window j is the baseline of checked day j + baseline
+    windows = sliding_window_view(revenue[:-1], baseline)
+    mean = windows.mean(axis=1)
+    std = windows.std(axis=1, ddof=1)
+    current = revenue[baseline:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = np.where(std > 0, (current - mean) / std, 0.0)
+
+    insights = []
+    for i in np.flatnonzero(np.abs(z) >= settings.INSIGHTS_Z_THRESHOLD):
+        day = first + timedelta(days=baseline + int(i))
+        spike = z[i] > 0
+        insights.append({
+            "key": f"revenue_{'spike' if spike else 'drop'}:{day}",
+            "title": "Revenue Spike" if spike else "Revenue Drop",
+            "description": (
+                f"Revenue on {day:%b %d} was ${current[i]:,.0f}, "
+                f"{(current[i] - mean[i]) / mean[i]:+.0%} vs. the {baseline}-day average of ${mean[i]:,.0f}."
+            ),
+            "type": "positive" if spike else "warning",
+            "icon": "trending-up" if spike else "trending-down",
+        })
+    return insights
+
+
+def stock_burn_alerts(db: Session, today: date) -> List[dict]:
+    baseline = settings.INSIGHTS_BASELINE_DAYS
+    first = today - timedelta(days=baseline + STOCK_RECENT_DAYS - 1)
+    products = db.query(Product.id, Product.name, Product.stock_level).filter(Product.stock_level > 0).all()
+    if not products:
+        return []
+    index = {p.id: i for i, p in enumerate(products)}
+
+    units = np.zeros((len(products), baseline + STOCK_RECENT_DAYS))
+    rows = db.execute(
+        select(DailyProductSales.product_id, DailyProductSales.day, DailyProductSales.units)
+        .where(DailyProductSales.day >= first, DailyProductSales.day <= today)
+    )
+    for product_id, day, quantity in rows:
+        if product_id in index:
+            units[index[product_id], (day - first).days] = quantity
+
+    baseline_rate = units[:, :baseline].mean(axis=1)
+    recent_rate = units[:, baseline:].mean(axis=1)
+    stock = np.array([p.stock_level for p in products], dtype=float)
+    with np.errstate(divide="ignore"):
+        cover = np.where(recent_rate > 0, stock / recent_rate, np.inf)
+    flagged = (cover < STOCKOUT_HORIZON_DAYS) & (recent_rate >= STOCK_ACCELERATION * baseline_rate)
+
+    insights = []
+    for i in np.flatnonzero(flagged):
+        product = products[i]
+        insights.append({
+            "key": f"stock_burn:{product.id}:{today}",
+            "title": "Stock Running Out Fast",
+            "description": (
+                f"'{product.name}' is selling {recent_rate[i]:.1f}/day vs. {baseline_rate[i]:.1f}/day before; "
+                f"{product.stock_level} units left will last about {cover[i]:.0f} days."
+            ),
+            "type": "warning",
+            "icon": "alert-triangle",
+        })
+    return insights
+
+
+def record_segment_sizes(db: Session, today: date) -> List[Segment]:
+    """Refresh each segment's cached customer_count and snapshot it for today"""
+    segments = db.query(Segment).all()
+    for segment in segments:
+        segment.customer_count = get_segment_customers_query(db, segment).count()
+    if segments:
+        table = SegmentSizeSnapshot.__table__
+        stmt = dialect_insert(db.get_bind(), table)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["segment_id", "day"],
+                set_={"customer_count": stmt.excluded.customer_count}
+            ),
+            [{"segment_id": s.id, "day": today, "customer_count": s.customer_count} for s in segments]
+        )
+    return segments
+
+
+def segment_jumps(db: Session, today: date) -> List[dict]:
+    segments = record_segment_sizes(db, today)
+    if not segments:
+        return []
+    index = {s.id: i for i, s in enumerate(segments)}
+    first = today - timedelta(days=SEGMENT_HISTORY_DAYS)
+
+    history = np.full((len(segments), SEGMENT_HISTORY_DAYS), np.nan)
+    rows = db.execute(
+        select(SegmentSizeSnapshot.segment_id, SegmentSizeSnapshot.day, SegmentSizeSnapshot.customer_count)
+        .where(
+            SegmentSizeSnapshot.segment_id.in_(index),
+            SegmentSizeSnapshot.day >= first,
+            SegmentSizeSnapshot.day < today,
+        )
+    )
+    for segment_id, day, count in rows:
+        history[index[segment_id], (day - first).days] = count
+
+    has_history = ~np.isnan(history).all(axis=1)
+    if not has_history.any():
+        return []
+    baseline = np.zeros(len(segments))
+    baseline[has_history] = np.nanmedian(history[has_history], axis=1)
+    current = np.array([s.customer_count for s in segments], dtype=float)
+    change = current - baseline
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(baseline > 0, change / baseline, np.inf)
+    flagged = has_history & (np.abs(change) >= SEGMENT_MIN_CHANGE) & (np.abs(relative) >= SEGMENT_JUMP)
+
+    insights = []
+    for i in np.flatnonzero(flagged):
+        segment = segments[i]
+        grew = change[i] > 0
+        trend = f"{relative[i]:+.0%}" if np.isfinite(relative[i]) else f"{change[i]:+.0f}"
+        insights.append({
+            "key": f"segment_jump:{segment.id}:{today}",
+            "title": "Segment Growth" if grew else "Segment Shrink",
+            "description": (
+                f"Your '{segment.name}' segment has {segment.customer_count} customers, "
+                f"{trend} vs. the last {SEGMENT_HISTORY_DAYS} days."
+            ),
+            "type": "positive" if grew else "warning",
+            "icon": "users-plus" if grew else "users",
+        })
+    return insights
+
+
+def generate_insights(db: Session, now: datetime = None) -> int:
+    """Run every detector, insert insights not seen before and prune old ones; returns how many were added"""
+    now = now or datetime.utcnow()
+    today = now.date()
+    candidates = revenue_anomalies(db, today) + stock_burn_alerts(db, today) + segment_jumps(db, today)
+
+    existing = set(db.scalars(
+        select(Insight.key).where(Insight.key.in_([c["key"] for c in candidates]))
+    )) if candidates else set()
+    new = [{**c, "created_at": now} for c in candidates if c["key"] not in existing]
+    if new:
+        # Another worker may insert the same keys between the check and here
+        stmt = dialect_insert(db.get_bind(), Insight.__table__)
+        db.execute(stmt.on_conflict_do_nothing(index_elements=["key"]), new)
+
+    cutoff = now - timedelta(days=settings.INSIGHTS_RETENTION_DAYS)
+    db.execute(delete(Insight).where(Insight.created_at < cutoff))
+    db.execute(delete(SegmentSizeSnapshot).where(SegmentSizeSnapshot.day < cutoff.date()))
+    return len(new)
+
+
+def refresh_insights() -> int:
+    """Generate insights in a session of their own; used by the scheduler and the CLI"""
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        added = generate_insights(db)
+        db.commit()
+    if added:
+        logger.info(f"Generated {added} new insights")
+    return added
+
+
+def main():
+    added = refresh_insights()
+    print(f"Generated {added} new insights")
+
+
+if __name__ == "__main__":
+    main()
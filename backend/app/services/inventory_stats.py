@@ -0,0 +1,88 @@
+# Inventory aggregates shared by GET /api/inventory/stats and the dashboard
+#
+# SKU count, stock alerts and stock value come from one conditional-aggregation
+# pass over products, cached per process until the products table version changes
+# (see services/table_versions.py; product writes bump it, and so do stock
+# reservations that change a product's stock status). Reservations that only lower
+# stock levels don't, so inventory_value is also recomputed every
+# INVENTORY_STATS_TTL_SECONDS.
+# skus_change compares the SKU count with the inventory snapshot from
+# SKUS_CHANGE_DAYS earlier; the scheduler in main.py records today's snapshot every
+# INVENTORY_SNAPSHOT_INTERVAL_SECONDS.
+
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.cache import VersionedCache
+from app.models import InventorySnapshot, Product
+from app.schemas import InventoryStats
+from app.services.table_versions import get_table_version
+from app.utils.upsert import dialect_insert
+
+SKUS_CHANGE_DAYS = 30
+
+inventory_cache = VersionedCache()
+
+
+def compute_inventory_stats(db: Session, today: date) -> InventoryStats:
+    total_skus, low_stock_alerts, out_of_stock, inventory_value = db.query(
+        func.count(Product.id),
+        func.count(case((Product.status == "LOW_STOCK", 1))),
+        func.count(case((Product.status == "OUT_OF_STOCK", 1))),
+        func.coalesce(func.sum(Product.price * Product.stock_level), 0)
+    ).one()
+
+    baseline = db.scalar(
+        select(InventorySnapshot.total_skus)
+        .where(InventorySnapshot.day <= today - timedelta(days=SKUS_CHANGE_DAYS))
+        .order_by(InventorySnapshot.day.desc())
+        .limit(1)
+    )
+    skus_change = round(((total_skus - baseline) / max(baseline, 1)) * 100, 1) if baseline is not None else 0.0
+
+    return InventoryStats(
+        total_skus=total_skus,
+        skus_change=skus_change,
+        low_stock_alerts=low_stock_alerts,
+        out_of_stock=out_of_stock,
+        inventory_value=round(inventory_value, 2)
+    )
+
+
+def get_inventory_stats(db: Session, today: Optional[date] = None) -> InventoryStats:
+    """Inventory stats, recomputed after products change, the TTL runs out or the day rolls over"""
+    today = today or datetime.utcnow().date()
+    version = (get_table_version(db, "products"), today, int(time.time() // settings.INVENTORY_STATS_TTL_SECONDS))
+    return inventory_cache.get("inventory", version, lambda: compute_inventory_stats(db, today))
+
+
+def record_inventory_snapshot(db: Session, today: Optional[date] = None) -> None:
+    """Write (or overwrite) today's inventory snapshot"""
+    today = today or datetime.utcnow().date()
+    stats = get_inventory_stats(db, today)
+    stmt = dialect_insert(db.get_bind(), InventorySnapshot.__table__)
+    row = {
+        "day": today,
+        "total_skus": stats.total_skus,
+        "low_stock": stats.low_stock_alerts,
+        "out_of_stock": stats.out_of_stock,
+        "inventory_value": stats.inventory_value,
+    }
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["day"],
+        set_={k: stmt.excluded[k] for k in row if k != "day"}
+    ), row)
+
+
+def refresh_inventory_snapshot() -> None:
+    """Record today's snapshot in a session of its own; used by the scheduler"""
+    from app.database import SessionLocal
+
+    with SessionLocal() as db:
+        record_inventory_snapshot(db)
+        db.commit()
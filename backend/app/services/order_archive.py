@@ -0,0 +1,207 @@
+# Cold-storage archival of old orders to compressed Parquet files
+#
+# Orders older than ORDER_ARCHIVE_AFTER_DAYS are exported, together with their items,
+# to zstd-compressed Parquet files under ORDER_ARCHIVE_DIR (one file per month per
+# run chunk, named orders-YYYY-MM-<run>.parquet) and then deleted from the database,
+# so hot queries only touch recent rows. Run it from cron:
+#     python -m app.services.order_archive [--older-than-days 365]
+#
+# Archived history stays queryable through read_archived_orders() and
+# GET /api/orders/archive. Customer metrics are not touched by archival.
+
+import argparse
+import glob
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Order, OrderItem, Product
+from app.services.partitioning import (
+    is_orders_partitioned, list_order_partitions, partition_name, month_start, add_months
+)
+
+logger = logging.getLogger(__name__)
+
+# One row per order item; orders without items get a single row with null item fields
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("order_id", pa.string()),
+    ("customer_id", pa.int64()),
+    ("date", pa.timestamp("us")),
+    ("status", pa.string()),
+    ("total_amount", pa.float64()),
+    ("shipping_address", pa.string()),
+    ("item_id", pa.int64()),
+    ("product_id", pa.int64()),
+    ("product_name", pa.string()),
+    ("sku", pa.string()),
+    ("quantity", pa.int64()),
+    ("price_at_purchase", pa.float64()),
+])
+
+ARCHIVE_COLUMNS = (
+    Order.id, Order.order_id, Order.customer_id, Order.date, Order.status,
+    Order.total_amount, Order.shipping_address,
+    OrderItem.id, OrderItem.product_id, Product.name, Product.sku,
+    OrderItem.quantity, OrderItem.price_at_purchase,
+)
+
+
+def _write_month(archive_dir: str, month: str, run_id: str, rows: List[tuple]) -> str:
+    columns = list(zip(*rows))
+    table = pa.Table.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, ARCHIVE_SCHEMA)],
+        schema=ARCHIVE_SCHEMA
+    )
+    path = os.path.join(archive_dir, f"orders-{month}-{run_id}.parquet")
+    tmp_path = path + ".tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)  # Never leave a half-written file behind
+    return path
+
+
+def _drop_archived_partitions(db: Session, cutoff: datetime) -> None:
+    """Drop monthly partitions that lie entirely before the cutoff and are now empty"""
+    conn = db.connection()
+    if not is_orders_partitioned(conn):
+        return
+    existing = set(list_order_partitions(conn))
+    month = month_start(cutoff)
+    # Walk back month by month until we run out of partitions
+    for _ in range(12 * 50):
+        month = add_months(month, -1)
+        name = partition_name(month)
+        if name not in existing:
+            continue
+        if conn.exec_driver_sql(f"SELECT 1 FROM {name} LIMIT 1").scalar() is None:
+            conn.exec_driver_sql(f"DROP TABLE {name}")
+            logger.info(f"Dropped archived partition {name}")
+
+
+def archive_orders(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+    chunk_size: int = 5000
+) -> int:
+    """Move orders older than the horizon to Parquet; returns the number of orders archived"""
+    older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    archive_dir = archive_dir or settings.ORDER_ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+    archived = 0
+
+    while True:
+        ids = db.scalars(
+            select(Order.id).where(Order.date < cutoff).order_by(Order.date, Order.id).limit(chunk_size)
+        ).all()
+        if not ids:
+            break
+
+        rows = db.execute(
+            select(*ARCHIVE_COLUMNS)
+            .outerjoin(OrderItem, OrderItem.order_id == Order.id)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(Order.id.in_(ids))
+        ).all()
+
+        by_month: Dict[str, List[tuple]] = defaultdict(list)
+        for row in rows:
+            by_month[row[3].strftime("%Y-%m")].append(tuple(row))
+        chunk_run = f"{run_id}-{archived // chunk_size:05d}"
+        for month, month_rows in by_month.items():
+            _write_month(archive_dir, month, chunk_run, month_rows)
+
+        # Files are durable before the rows go away; a crash in between only
+        # duplicates rows in the archive, which read_archived_orders() de-duplicates
+        db.execute(delete(OrderItem).where(OrderItem.order_id.in_(ids)))
+        db.execute(delete(Order).where(Order.id.in_(ids)))
+        db.commit()
+        archived += len(ids)
+        logger.info(f"Archived {archived} orders so far (cutoff {cutoff.date()})")
+
+    _drop_archived_partitions(db, cutoff)
+    db.commit()
+    return archived
+
+
+def read_archived_orders(
+    start: datetime,
+    end: datetime,
+    customer_id: Optional[int] = None,
+    archive_dir: Optional[str] = None,
+    limit: int = 1000
+) -> List[dict]:
+    """Archived orders with their items for start <= date < end, newest first"""
+    archive_dir = archive_dir or settings.ORDER_ARCHIVE_DIR
+
+    # Prune by the month in the file name before touching any file
+    files = []
+    month = month_start(start)
+    while month < end.date():
+        files.extend(glob.glob(os.path.join(archive_dir, f"orders-{month:%Y-%m}-*.parquet")))
+        month = add_months(month, 1)
+    if not files:
+        return []
+
+    expr = (ds.field("date") >= pa.scalar(start, pa.timestamp("us"))) & (ds.field("date") < pa.scalar(end, pa.timestamp("us")))
+    if customer_id is not None:
+        expr = expr & (ds.field("customer_id") == customer_id)
+    table = ds.dataset(files, schema=ARCHIVE_SCHEMA, format="parquet").to_table(filter=expr)
+
+    orders: Dict[int, dict] = {}
+    seen_items = set()
+    for row in table.to_pylist():
+        order = orders.setdefault(row["id"], {
+            "id": row["id"],
+            "order_id": row["order_id"],
+            "customer_id": row["customer_id"],
+            "date": row["date"],
+            "status": row["status"],
+            "total_amount": row["total_amount"],
+            "shipping_address": row["shipping_address"],
+            "items": [],
+        })
+        if row["item_id"] is not None and row["item_id"] not in seen_items:
+            seen_items.add(row["item_id"])
+            order["items"].append({
+                "product_id": row["product_id"],
+                "product_name": row["product_name"],
+                "sku": row["sku"],
+                "quantity": row["quantity"],
+                "price": row["price_at_purchase"],
+            })
+
+    return sorted(orders.values(), key=lambda o: (o["date"], o["id"]), reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old orders to Parquet files")
+    parser.add_argument("--older-than-days", type=int, default=None)
+    parser.add_argument("--archive-dir", default=None)
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = archive_orders(db, args.older_than_days, args.archive_dir)
+        print(f"Archived {count} orders")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
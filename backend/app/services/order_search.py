@@ -0,0 +1,52 @@
+# Order search: order id prefix lookups and a denormalized search column
+#
+# Every order carries `search_text`, the lower-cased "order_id first last email" of
+# the order and its customer. On PostgreSQL it is covered by a pg_trgm GIN index, so
+# substring searches no longer scan and join orders to customers; order id searches
+# ("HV-12", "#HV-12") use a prefix match on the order_id pattern index.
+
+import re
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Customer, Order
+
+# "HV-12", "#hv-1200" ... the start of an order id. At least one digit is required,
+# so name searches like "Mary-" or "Jean-" still go to the text search.
+ORDER_ID_PATTERN = re.compile(r"^[A-Za-z]+-\d+$")
+
+
+def build_search_text(order_id: str, first_name: Optional[str], last_name: Optional[str], email: str) -> str:
+    """Python twin of search_text_expression(), used when inserting orders"""
+    return f"{order_id} {first_name or ''} {last_name or ''} {email}".lower()
+
+
+def search_text_expression():
+    """SQL expression computing search_text for an order joined to its customer"""
+    return func.lower(
+        Order.order_id + " " + func.coalesce(Customer.first_name, "") + " "
+        + func.coalesce(Customer.last_name, "") + " " + Customer.email
+    )
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def order_search_filter(search: str):
+    """Filter expression for the orders list search box (no join to customers needed)"""
+    term = search.strip().lstrip("#")
+    if ORDER_ID_PATTERN.match(term):
+        return Order.order_id.like(f"{_escape_like(term.upper())}%", escape="\\")
+    return Order.search_text.like(f"%{_escape_like(term.lower())}%", escape="\\")
+
+
+def refresh_order_search_text(db: Session, customer_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute search_text for the orders of the given customers (all orders if None)"""
+    value = select(search_text_expression()).where(Customer.id == Order.customer_id).scalar_subquery()
+    stmt = update(Order).values(search_text=value)
+    if customer_ids is not None:
+        stmt = stmt.where(Order.customer_id.in_(list(customer_ids)))
+    db.execute(stmt.execution_options(synchronize_session=False))
@@ -0,0 +1,186 @@
+# Order ingestion: writes orders, items, stock and customer metrics in bulk
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import DateTime, bindparam, case, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models import Customer, Order, OrderItem, OrderStatus
+from app.schemas import OrderCreate
+from app.services.order_search import build_search_text
+from app.services.product_catalog import resolve_products
+from app.services.sales_rollup import record_order_sales
+from app.services.stock_reservation import InsufficientStockError, reserve_stock
+from app.services.top_products import track_order_sales
+
+logger = logging.getLogger(__name__)
+
+
+class OrderIngestionError(ValueError):
+    """Raised when a batch cannot be ingested (unknown customer/product, duplicate id, no stock)"""
+
+
+def lock_order_ids(db: Session, order_ids: List[str]) -> None:
+    """
+    PostgreSQL: take a transaction-level advisory lock per order id, so the existence
+    check and the insert of an id are atomic. A partitioned orders table can't enforce
+    UNIQUE (order_id); with the lock, a concurrent batch carrying the same id waits for
+    this transaction and then finds the committed row. Hashes are locked in sorted
+    order; a hash collision only makes two batches wait for each other.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(
+        text(
+            "SELECT pg_advisory_xact_lock(h) FROM "
+            "(SELECT DISTINCT hashtext(id) AS h FROM unnest(CAST(:ids AS text[])) AS id ORDER BY h) AS ids"
+        ),
+        {"ids": sorted(order_ids)}
+    )
+
+
+def create_orders(db: Session, orders: List[OrderCreate]) -> List[Tuple[int, str]]:
+    """
+    Insert a batch of orders with their items in a fixed number of statements.
+
+    Per batch this issues: one customer lookup (products are resolved from the
+    catalog cache, querying only ids it doesn't know yet), one bulk
+    INSERT for orders, one for order items, one batched customer-metrics UPDATE,
+    one stock reservation UPDATE and two sales-rollup upserts. Nothing is committed
+    here, so the caller controls the transaction and can roll the whole batch back
+    on error.
+
+    Shared rows are always locked in the same order (order ids, customers, products,
+    table versions, then the rollups, each by key) so concurrent batches can't deadlock.
+
+    Returns (id, order_id) pairs in input order.
+    """
+    order_ids = [o.order_id for o in orders]
+    if len(set(order_ids)) != len(order_ids):
+        raise OrderIngestionError("Duplicate order_id in batch")
+
+    # 1. Validate references: one round trip for customers, products from the catalog
+    customer_ids = {o.customer_id for o in orders}
+    names = {
+        row.id: row for row in db.execute(
+            select(Customer.id, Customer.first_name, Customer.last_name, Customer.email)
+            .where(Customer.id.in_(customer_ids))
+        )
+    }
+    missing_customers = customer_ids - set(names)
+    if missing_customers:
+        raise OrderIngestionError(f"Unknown customer_id: {sorted(missing_customers)}")
+
+    product_ids = {item.product_id for o in orders for item in o.items}
+    prices = {product_id: p.price for product_id, p in resolve_products(db, product_ids).items()}
+    missing_products = product_ids - set(prices)
+    if missing_products:
+        raise OrderIngestionError(f"Unknown product_id: {sorted(missing_products)}")
+
+    lock_order_ids(db, order_ids)
+    existing = db.scalars(select(Order.order_id).where(Order.order_id.in_(order_ids))).all()
+    if existing:
+        raise OrderIngestionError(f"Order already exists: {sorted(existing)}")
+
+    # 2. Bulk insert orders, getting the generated primary keys back
+    now = datetime.utcnow()
+    order_rows = [
+        {
+            "order_id": o.order_id,
+            "customer_id": o.customer_id,
+            "date": o.date or now,
+            "status": o.status.value,
+            "total_amount": o.total_amount,
+            "shipping_address": o.shipping_address,
+            "search_text": build_search_text(
+                o.order_id, names[o.customer_id].first_name,
+                names[o.customer_id].last_name, names[o.customer_id].email
+            ),
+        }
+        for o in orders
+    ]
+    inserted = db.execute(
+        insert(Order).returning(Order.id, Order.order_id, sort_by_parameter_order=True),
+        order_rows
+    ).all()
+    pk_by_order_id = {order_id: pk for pk, order_id in inserted}
+
+    # 3. Bulk insert items, aggregating the stock to take per product and the daily sales
+    item_rows = []
+    units_by_product: Dict[int, int] = defaultdict(int)
+    sales = []
+    for o, row in zip(orders, order_rows):
+        order_items = []
+        for item in o.items:
+            price = item.price_at_purchase if item.price_at_purchase is not None else prices[item.product_id]
+            item_rows.append({
+                "order_id": pk_by_order_id[o.order_id],
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price_at_purchase": price,
+            })
+            order_items.append((item.product_id, item.quantity, price))
+            if o.status.value != OrderStatus.CANCELLED.value:
+                units_by_product[item.product_id] += item.quantity
+        sales.append((row["date"], row["status"], row["total_amount"], order_items))
+    if item_rows:
+        db.execute(insert(OrderItem), item_rows)
+
+    # 4. One batched UPDATE for customer metrics (cancelled orders don't count)
+    metrics: Dict[int, dict] = {}
+    for row in order_rows:
+        if row["status"] == OrderStatus.CANCELLED.value:
+            continue
+        m = metrics.setdefault(row["customer_id"], {
+            "b_id": row["customer_id"], "b_orders": 0, "b_spend": 0.0,
+            "b_first": row["date"], "b_last": row["date"],
+        })
+        m["b_orders"] += 1
+        m["b_spend"] += row["total_amount"]
+        m["b_first"] = min(m["b_first"], row["date"])
+        m["b_last"] = max(m["b_last"], row["date"])
+    if metrics:
+        customers = Customer.__table__
+        total_orders = func.coalesce(customers.c.total_orders, 0) + bindparam("b_orders")
+        total_spend = func.coalesce(customers.c.total_spend, 0) + bindparam("b_spend")
+        first = bindparam("b_first", type_=DateTime())
+        last = bindparam("b_last", type_=DateTime())
+        db.execute(
+            customers.update()
+            .where(customers.c.id == bindparam("b_id"))
+            .values(
+                total_orders=total_orders,
+                total_spend=total_spend,
+                lifetime_value=func.coalesce(customers.c.lifetime_value, 0) + bindparam("b_spend"),
+                average_order_value=total_spend / total_orders,
+                first_order_date=case(
+                    (customers.c.first_order_date.is_(None), first),
+                    (customers.c.first_order_date > first, first),
+                    else_=customers.c.first_order_date
+                ),
+                last_order_date=case(
+                    (customers.c.last_order_date.is_(None), last),
+                    (customers.c.last_order_date < last, last),
+                    else_=customers.c.last_order_date
+                ),
+                updated_at=now
+            ),
+            [metrics[customer_id] for customer_id in sorted(metrics)]
+        )
+
+    # 5. One atomic, conditional UPDATE taking the stock for every product
+    try:
+        reserve_stock(db, units_by_product)
+    except InsufficientStockError as e:
+        raise OrderIngestionError(str(e))
+
+    # 6. Sales rollups last: every order of the day updates the same daily_sales row,
+    # so it should stay locked for as little of the transaction as possible
+    record_order_sales(db, sales)
+    track_order_sales(db, sales)
+
+    logger.info(f"Ingested {len(orders)} orders with {len(item_rows)} items")
+    return [(pk_by_order_id[o.order_id], o.order_id) for o in orders]
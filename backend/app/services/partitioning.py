@@ -0,0 +1,176 @@
+# Monthly range partitioning of the orders table (PostgreSQL only)
+#
+# Partitioning is opt-in. Convert an existing database once with
+#     python -m app.services.partitioning enable
+# and set ORDERS_PARTITIONING=true so the app's scheduler keeps future partitions
+# created, every ORDERS_PARTITION_INTERVAL_SECONDS (daily by default)
+# (`python -m app.services.partitioning ensure` does the same from cron).
+#
+# Constraints that come with PostgreSQL declarative partitioning:
+# - the primary key becomes (id, date), and `date` becomes NOT NULL
+# - `order_id` stays indexed but can no longer be enforced UNIQUE across partitions;
+#   order ingestion (services/order_service.py) holds an advisory lock per order id
+#   from its existence check to commit, so concurrent batches can't both insert one
+# - order_items keeps a plain order_id column but loses its FOREIGN KEY to orders,
+#   because a partitioned table can only be referenced by (id, date); it is not
+#   partitioned itself since it has no date column to range on
+
+import argparse
+import logging
+from datetime import date, datetime
+from typing import List
+
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+from app.models import Order
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "orders_default"
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    month_index = value.year * 12 + value.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"orders_p{month.year}_{month.month:02d}"
+
+
+def is_orders_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.exec_driver_sql(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+        "WHERE c.relname = 'orders' AND c.relkind = 'p'"
+    ).scalar())
+
+
+def list_order_partitions(conn: Connection) -> List[str]:
+    return list(conn.exec_driver_sql(
+        "SELECT child.relname FROM pg_inherits i "
+        "JOIN pg_class parent ON parent.oid = i.inhparent "
+        "JOIN pg_class child ON child.oid = i.inhrelid "
+        "WHERE parent.relname = 'orders' ORDER BY child.relname"
+    ).scalars())
+
+
+def _create_month_partition(conn: Connection, parent: str, month: date) -> None:
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def ensure_order_partitions(conn: Connection, months_ahead: int = None) -> int:
+    """Create partitions from the current month up to `months_ahead` months ahead"""
+    if not is_orders_partitioned(conn):
+        return 0
+    months_ahead = settings.ORDERS_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    existing = set(list_order_partitions(conn))
+    created = 0
+    current = month_start(datetime.utcnow())
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if partition_name(month) in existing:
+            continue
+        try:
+            with conn.begin_nested():
+                _create_month_partition(conn, "orders", month)
+            created += 1
+        except Exception as e:
+            # Typically: the default partition already holds rows for that month
+            logger.warning(f"Could not create partition {partition_name(month)}: {e}")
+    if created:
+        logger.info(f"Created {created} future order partitions")
+    return created
+
+
+def refresh_order_partitions() -> None:
+    """ensure_order_partitions() in a transaction of its own; used by the scheduler"""
+    from app.database import engine
+
+    with engine.begin() as conn:
+        if is_orders_partitioned(conn):
+            ensure_order_partitions(conn)
+        else:
+            logger.warning("ORDERS_PARTITIONING is set but orders is not partitioned; "
+                           "run `python -m app.services.partitioning enable`")
+
+
+def enable_orders_partitioning(engine: Engine, months_ahead: int = None) -> None:
+    """One-time conversion of `orders` into a table partitioned by month on `date`"""
+    months_ahead = settings.ORDERS_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    if engine.dialect.name != "postgresql":
+        raise RuntimeError("Orders partitioning requires PostgreSQL")
+
+    with engine.begin() as conn:
+        if is_orders_partitioned(conn):
+            logger.info("orders is already partitioned")
+            return
+
+        conn.exec_driver_sql("LOCK TABLE orders IN ACCESS EXCLUSIVE MODE")
+        sequence = conn.exec_driver_sql("SELECT pg_get_serial_sequence('orders', 'id')").scalar()
+        conn.exec_driver_sql("UPDATE orders SET date = now() AT TIME ZONE 'utc' WHERE date IS NULL")
+        first_date = conn.exec_driver_sql("SELECT min(date) FROM orders").scalar() or datetime.utcnow()
+
+        conn.exec_driver_sql("ALTER TABLE order_items DROP CONSTRAINT IF EXISTS order_items_order_id_fkey")
+        if sequence:
+            conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+        conn.exec_driver_sql("CREATE TABLE orders_partitioned (LIKE orders INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+        conn.exec_driver_sql("ALTER TABLE orders_partitioned ALTER COLUMN date SET NOT NULL")
+        conn.exec_driver_sql("ALTER TABLE orders_partitioned ADD CONSTRAINT orders_partitioned_pkey PRIMARY KEY (id, date)")
+        conn.exec_driver_sql(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF orders_partitioned DEFAULT")
+
+        month = month_start(first_date)
+        last = add_months(month_start(datetime.utcnow()), months_ahead)
+        while month <= last:
+            _create_month_partition(conn, "orders_partitioned", month)
+            month = add_months(month, 1)
+
+        conn.exec_driver_sql("INSERT INTO orders_partitioned SELECT * FROM orders")
+        conn.exec_driver_sql("DROP TABLE orders")
+        conn.exec_driver_sql("ALTER TABLE orders_partitioned RENAME TO orders")
+        conn.exec_driver_sql("ALTER TABLE orders RENAME CONSTRAINT orders_partitioned_pkey TO orders_pkey")
+        if sequence:
+            conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY orders.id")
+
+        # Recreate the model's indexes on the partitioned parent (they cascade to partitions)
+        for index in Order.__table__.indexes:
+            if index.unique:
+                columns = ", ".join(c.name for c in index.columns)
+                conn.exec_driver_sql(f"CREATE INDEX {index.name} ON orders ({columns})")
+            else:
+                index.create(conn)
+
+    logger.info("orders converted to monthly range partitions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the orders table")
+    parser.add_argument("action", choices=["enable", "ensure", "list"])
+    parser.add_argument("--months-ahead", type=int, default=None)
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    if args.action == "enable":
+        enable_orders_partitioning(engine, args.months_ahead)
+    elif args.action == "ensure":
+        with engine.begin() as conn:
+            print(f"Created {ensure_order_partitions(conn, args.months_ahead)} partitions")
+    else:
+        with engine.connect() as conn:
+            for name in list_order_partitions(conn):
+                print(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Bulk product upsert for warehouse syncs (POST /api/inventory/bulk)
+#
+# Items are keyed by SKU. Each one can upsert product fields and either set an
+# absolute stock level or add a stock delta. Items are written with
+#     INSERT ... ON CONFLICT (sku) DO UPDATE ... RETURNING
+# in chunks of BULK_CHUNK_SIZE, one statement per chunk and item shape (the fields
+# it gives), so a full-catalog sync is a handful of statements. When stock changes,
+# status, predicted_need and days_until_stockout are re-derived in the same
+# statement from the new level and the stored forecast. A delta that would take
+# stock below zero is skipped by the DO UPDATE ... WHERE guard and reported as an
+# error for that SKU.
+#
+# Existing rows are locked in id order up front, the same order stock reservation
+# uses, so a sync can't deadlock with concurrent orders.
+
+from collections import defaultdict
+from typing import Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Product
+from app.schemas import ProductBulkItem, ProductBulkResult
+from app.services.forecasting import days_until_stockout_expr, predicted_need, predicted_need_expr
+from app.services.product_catalog import catalog_changed
+from app.services.stock_reservation import stock_status, stock_status_expr
+from app.services.table_versions import bump_table_version
+from app.utils.upsert import dialect_insert
+
+BULK_CHUNK_SIZE = 1000
+
+# Product fields an item can set; name and price can't be cleared
+FIELDS = ("name", "image_url", "price", "category")
+REQUIRED_FIELDS = ("name", "price")
+
+
+class ProductBulkError(ValueError):
+    """Raised when a bulk request can't be applied at all"""
+
+
+def _chunks(items: list, size: int = BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _item_error(item: ProductBulkItem, existing: bool) -> str:
+    if item.stock_level is not None and item.stock_delta is not None:
+        return "Give stock_level or stock_delta, not both"
+    if not existing:
+        if item.name is None or item.price is None:
+            return "New SKU needs name and price"
+        if (item.stock_delta or 0) < 0:
+            return "Stock would go negative"
+    return ""
+
+
+def bulk_upsert_products(db: Session, items: List[ProductBulkItem]) -> List[ProductBulkResult]:
+    """
+    Apply SKU-keyed upserts and stock changes; returns one result per item, in
+    input order. Nothing is committed here.
+    """
+    skus = [item.sku for item in items]
+    if len(set(skus)) != len(skus):
+        raise ProductBulkError("Duplicate sku in request")
+
+    products = Product.__table__
+
+    # 1. Find the existing SKUs, then lock their rows in id order
+    ids: List[int] = []
+    for chunk in _chunks(skus):
+        ids.extend(db.scalars(select(products.c.id).where(products.c.sku.in_(chunk))))
+    existing = {}
+    for chunk in _chunks(sorted(ids)):
+        for row in db.execute(
+            select(products.c.id, products.c.sku, products.c.name, products.c.price)
+            .where(products.c.id.in_(chunk))
+            .order_by(products.c.id)
+            .with_for_update(key_share=True)
+        ):
+            existing[row.sku] = row
+
+    # 2. Validate, and group the rows by shape: (fields given, stock mode)
+    results: Dict[str, ProductBulkResult] = {}
+    shapes = defaultdict(list)
+    for item in items:
+        current = existing.get(item.sku)
+        error = _item_error(item, current is not None)
+        if error:
+            results[item.sku] = ProductBulkResult(sku=item.sku, result="error", error=error)
+            continue
+
+        given = item.dict(exclude_unset=True)
+        fields = tuple(
+            f for f in FIELDS if f in given and (given[f] is not None or f not in REQUIRED_FIELDS)
+        )
+        mode = "level" if item.stock_level is not None else "delta" if item.stock_delta is not None else None
+
+        # Only used if the SKU is inserted; DO UPDATE touches just `fields` and the stock
+        level = item.stock_level if mode == "level" else item.stock_delta or 0
+        row = {f: given[f] for f in fields}
+        for f in REQUIRED_FIELDS:
+            row.setdefault(f, getattr(current, f, None))
+        row.update(
+            sku=item.sku,
+            stock_level=level,
+            status=stock_status(level),
+            predicted_need=predicted_need(level),
+            sales_velocity=0.0,
+            reorder_point=0.0,
+        )
+        shapes[(fields, mode)].append(row)
+
+    # 3. One upsert per shape and chunk
+    catalog_written = False
+    for (fields, mode), rows in shapes.items():
+        stmt = dialect_insert(db.get_bind(), products)
+        set_ = {f: stmt.excluded[f] for f in fields}
+        where = None
+        if mode is not None:
+            new_level = stmt.excluded.stock_level
+            if mode == "delta":
+                new_level = func.coalesce(products.c.stock_level, 0) + stmt.excluded.stock_level
+                where = new_level >= 0
+            set_.update(
+                stock_level=new_level,
+                status=stock_status_expr(new_level),
+                predicted_need=predicted_need_expr(new_level, products.c.sales_velocity, products.c.reorder_point),
+                days_until_stockout=days_until_stockout_expr(new_level, products.c.sales_velocity),
+            )
+        # Nothing to change, but DO UPDATE (unlike DO NOTHING) still returns the row
+        set_ = set_ or {"name": products.c.name}
+
+        stmt = stmt.on_conflict_do_update(index_elements=["sku"], set_=set_, where=where).returning(
+            products.c.id, products.c.sku, products.c.stock_level, products.c.status, products.c.predicted_need
+        )
+        for chunk in _chunks(rows):
+            for row in db.execute(stmt, chunk):
+                catalog_written = catalog_written or bool(fields) or row.sku not in existing
+                results[row.sku] = ProductBulkResult(
+                    sku=row.sku,
+                    result="updated" if row.sku in existing else "created",
+                    id=row.id,
+                    stock_level=row.stock_level,
+                    status=row.status,
+                    predicted_need=row.predicted_need,
+                )
+
+    # Rows skipped by the WHERE guard aren't returned
+    for sku in skus:
+        results.setdefault(sku, ProductBulkResult(sku=sku, result="error", error="Stock would go negative"))
+
+    if catalog_written:
+        catalog_changed(db)
+    if any(r.result != "error" for r in results.values()):
+        bump_table_version(db, "products")
+    return [results[sku] for sku in skus]
@@ -0,0 +1,143 @@
+# Read-through product catalog cache
+#
+# Products are read far more often than their catalog fields change. The catalog
+# holds id, name, SKU, price, category and image URL of every product, indexed by
+# id and by SKU, plus the sorted category list. Stock and forecast columns are not
+# cached; they change with every order.
+#
+# Coherence:
+#   - ORM writes to catalog fields of Product are noticed in before_flush; core
+#     statements call catalog_changed() themselves. Either way the "product_catalog"
+#     table version is bumped in the writing transaction, and this worker's copy is
+#     dropped when that session commits. Writers bump this version before the
+#     "products" one (flush before bump_table_version) so they can't deadlock.
+#   - Other workers compare the table version at most every
+#     PRODUCT_CATALOG_CHECK_SECONDS, so their writes show up within that interval.
+#     Callers that must not miss a new product fall back to a query for unknown ids.
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.cache import VersionedCache
+from app.models import Product
+from app.services.table_versions import bump_table_version, get_table_version
+
+CATALOG_TABLE = "product_catalog"
+CHANGED_KEY = "product_catalog_changed"
+
+# Product columns the catalog holds; writes to any other column don't invalidate it
+CATALOG_FIELDS = ("name", "sku", "price", "category", "image_url")
+
+
+@dataclass(frozen=True)
+class CatalogProduct:
+    id: int
+    name: str
+    sku: str
+    price: float
+    category: Optional[str]
+    image_url: Optional[str]
+
+
+class ProductCatalog:
+    def __init__(self, products: Iterable[CatalogProduct]):
+        self.by_id: Dict[int, CatalogProduct] = {p.id: p for p in products}
+        self.by_sku: Dict[str, CatalogProduct] = {p.sku: p for p in self.by_id.values()}
+        self.categories: List[str] = sorted({p.category for p in self.by_id.values() if p.category})
+
+    def first(self) -> Optional[CatalogProduct]:
+        return self.by_id[min(self.by_id)] if self.by_id else None
+
+
+def _catalog_query():
+    return select(*[getattr(Product, f) for f in ("id",) + CATALOG_FIELDS])
+
+
+def load_catalog(db: Session) -> ProductCatalog:
+    return ProductCatalog(CatalogProduct(*row) for row in db.execute(_catalog_query()))
+
+
+class ProductCatalogCache:
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._cache = VersionedCache()
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> ProductCatalog:
+        now = time.monotonic()
+        with self._lock:
+            version, stale = self._version, self._version is None or now - self._checked_at >= self.check_seconds
+        if stale:
+            version = get_table_version(db, CATALOG_TABLE)
+            with self._lock:
+                self._version, self._checked_at = version, now
+        return self._cache.get("catalog", version, lambda: load_catalog(db))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+        self._cache.clear()
+
+
+product_catalog = ProductCatalogCache(settings.PRODUCT_CATALOG_CHECK_SECONDS)
+
+
+def get_catalog(db: Session) -> ProductCatalog:
+    return product_catalog.get(db)
+
+
+def resolve_products(db: Session, product_ids: Iterable[int]) -> Dict[int, CatalogProduct]:
+    """
+    Catalog entries for `product_ids`, querying only ids the catalog doesn't know
+    (products created on another worker since the last version check). Ids that
+    don't exist are left out.
+    """
+    by_id = get_catalog(db).by_id
+    found = {product_id: by_id[product_id] for product_id in product_ids if product_id in by_id}
+    missing = set(product_ids) - set(found)
+    if missing:
+        for row in db.execute(_catalog_query().where(Product.id.in_(missing))):
+            found[row.id] = CatalogProduct(*row)
+    return found
+
+
+def catalog_changed(db: Session) -> None:
+    """Record a catalog write in the current transaction (once per transaction)"""
+    if not db.info.get(CHANGED_KEY):
+        db.info[CHANGED_KEY] = True
+        bump_table_version(db, CATALOG_TABLE)
+
+
+@event.listens_for(Session, "before_flush")
+def _detect_catalog_writes(session: Session, flush_context, instances) -> None:
+    if session.info.get(CHANGED_KEY):
+        return
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Product):
+            catalog_changed(session)
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            attrs = inspect(obj).attrs
+            if any(attrs[f].history.has_changes() for f in CATALOG_FIELDS):
+                catalog_changed(session)
+                return
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_local_catalog(session: Session) -> None:
+    if session.info.pop(CHANGED_KEY, None):
+        product_catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_catalog_writes(session: Session) -> None:
+    session.info.pop(CHANGED_KEY, None)
@@ -0,0 +1,199 @@
+# Daily sales rollups for the dashboard
+#
+# daily_sales holds revenue, order, cancellation, unit and new-customer counts per
+# day, and daily_product_sales the units and revenue per product per day (cancelled
+# orders excluded). Order ingestion and customer creation add to them (and customer
+# deletion takes its new customer back) in the same transaction via upserts; `python -m app.services.sales_rollup backfill` rebuilds
+# them from raw orders and customers.
+#
+# A rebuild only covers days that still have orders in the database, so rollups for
+# days moved to cold storage by services/order_archive.py are kept.
+
+import argparse
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models import Customer, DailyProductSales, DailySales, Order, OrderItem, OrderStatus
+from app.utils.upsert import increment_upsert
+
+logger = logging.getLogger(__name__)
+
+DAILY_SALES_COUNTERS = ["revenue", "orders", "cancelled", "units", "new_customers"]
+
+# (date, status, total_amount, [(product_id, quantity, price_at_purchase), ...])
+OrderSale = Tuple[datetime, str, float, Iterable[Tuple[int, int, float]]]
+
+
+def _empty_day(day: date) -> dict:
+    return {"day": day, **dict.fromkeys(DAILY_SALES_COUNTERS, 0)}
+
+
+def _as_date(value) -> date:
+    """date() comes back as a date on PostgreSQL and as 'YYYY-MM-DD' on SQLite"""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _add_to_daily_sales(db: Session, days: Dict[date, dict]) -> None:
+    if days:
+        db.execute(
+            increment_upsert(db.get_bind(), DailySales.__table__, ["day"], DAILY_SALES_COUNTERS),
+            [days[day] for day in sorted(days)]
+        )
+
+
+def record_order_sales(db: Session, orders: Iterable[OrderSale]) -> None:
+    """Add newly written orders to the rollups (one upsert per table)"""
+    days: Dict[date, dict] = {}
+    products: Dict[Tuple[date, int], dict] = {}
+
+    for order_date, status, total_amount, items in orders:
+        day = order_date.date()
+        totals = days.setdefault(day, _empty_day(day))
+        if status == OrderStatus.CANCELLED.value:
+            totals["cancelled"] += 1
+            continue
+        totals["revenue"] += total_amount
+        totals["orders"] += 1
+        for product_id, quantity, price in items:
+            row = products.setdefault((day, product_id), {"day": day, "product_id": product_id, "units": 0, "revenue": 0.0})
+            row["units"] += quantity
+            row["revenue"] += quantity * price
+            totals["units"] += quantity
+
+    _add_to_daily_sales(db, days)
+    if products:
+        db.execute(
+            increment_upsert(db.get_bind(), DailyProductSales.__table__, ["day", "product_id"], ["units", "revenue"]),
+            [products[key] for key in sorted(products)]  # Key order, so concurrent writers can't deadlock
+        )
+
+
+def record_new_customers(db: Session, created_ats: Iterable[datetime], delta: int = 1) -> None:
+    """Add newly created customers to daily_sales.new_customers (delta=-1 for deleted ones)"""
+    days: Dict[date, dict] = {}
+    for created_at in created_ats:
+        day = created_at.date()
+        days.setdefault(day, _empty_day(day))["new_customers"] += delta
+    _add_to_daily_sales(db, days)
+
+
+def _rebuild_order_days(db: Session, start: date, end: date) -> Set[date]:
+    lower = datetime.combine(start, time.min)
+    upper = datetime.combine(end + timedelta(days=1), time.min)
+    day = func.date(Order.date)
+    not_cancelled = Order.status != OrderStatus.CANCELLED.value
+
+    db.execute(
+        update(DailySales)
+        .where(DailySales.day >= start, DailySales.day <= end)
+        .values(revenue=0, orders=0, cancelled=0, units=0)
+    )
+    db.execute(delete(DailyProductSales).where(DailyProductSales.day >= start, DailyProductSales.day <= end))
+    db.execute(insert(DailyProductSales).from_select(
+        ["day", "product_id", "units", "revenue"],
+        select(
+            day,
+            OrderItem.product_id,
+            func.sum(OrderItem.quantity),
+            func.sum(OrderItem.quantity * OrderItem.price_at_purchase)
+        ).join(Order, Order.id == OrderItem.order_id)
+        .where(Order.date >= lower, Order.date < upper, not_cancelled)
+        .group_by(day, OrderItem.product_id)
+    ))
+
+    # One row per day: small enough to merge in Python and upsert back
+    days: Dict[date, dict] = {}
+    for d, revenue, orders, cancelled in db.execute(
+        select(
+            day,
+            func.coalesce(func.sum(case((not_cancelled, Order.total_amount))), 0),
+            func.count(case((not_cancelled, 1))),
+            func.count(case((Order.status == OrderStatus.CANCELLED.value, 1)))
+        ).where(Order.date >= lower, Order.date < upper).group_by(day)
+    ):
+        d = _as_date(d)
+        days[d] = {**_empty_day(d), "revenue": revenue, "orders": orders, "cancelled": cancelled}
+    for d, units in db.execute(
+        select(DailyProductSales.day, func.sum(DailyProductSales.units))
+        .where(DailyProductSales.day >= start, DailyProductSales.day <= end)
+        .group_by(DailyProductSales.day)
+    ):
+        days.setdefault(d, _empty_day(d))["units"] = units
+    _add_to_daily_sales(db, days)
+    return set(days)
+
+
+def _rebuild_customer_days(db: Session, start: date, end: date) -> Set[date]:
+    lower = datetime.combine(start, time.min)
+    upper = datetime.combine(end + timedelta(days=1), time.min)
+    day = func.date(Customer.created_at)
+
+    db.execute(
+        update(DailySales)
+        .where(DailySales.day >= start, DailySales.day <= end)
+        .values(new_customers=0)
+    )
+    days: Dict[date, dict] = {}
+    for d, count in db.execute(
+        select(day, func.count(Customer.id))
+        .where(Customer.created_at >= lower, Customer.created_at < upper)
+        .group_by(day)
+    ):
+        d = _as_date(d)
+        days[d] = {**_empty_day(d), "new_customers": count}
+    _add_to_daily_sales(db, days)
+    return set(days)
+
+
+def _default_range(db: Session, column, start: Optional[date], end: Optional[date]):
+    if start is None or end is None:
+        oldest, newest = db.query(func.min(column), func.max(column)).one()
+        start = start or (oldest.date() if oldest else None)
+        end = end or (newest.date() if newest else None)
+    return start, end
+
+
+def rebuild_sales_rollups(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Recompute the rollups for start <= day <= end from raw orders and customers.
+    Defaults to the days between the oldest and newest order (and customer).
+    Returns the number of days with data.
+    """
+    days: Set[date] = set()
+
+    first, last = _default_range(db, Order.date, start, end)
+    if first and last:
+        days |= _rebuild_order_days(db, first, last)
+
+    first, last = _default_range(db, Customer.created_at, start, end)
+    if first and last:
+        days |= _rebuild_customer_days(db, first, last)
+
+    logger.info(f"Rebuilt sales rollups ({len(days)} days with data)")
+    return len(days)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily sales rollup tables")
+    parser.add_argument("action", choices=["backfill"])
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        days = rebuild_sales_rollups(db, args.start, args.end)
+        db.commit()
+        print(f"Rebuilt {days} days of sales rollups")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# Sales time series over arbitrary ranges, served from the daily_sales rollup
+#
+# A multi-year range is at most a few thousand rollup rows, so bucketing into
+# weeks or months happens in Python instead of dialect-specific SQL date functions.
+
+from datetime import date, timedelta
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import DailySales
+
+GRANULARITIES = ("day", "week", "month")
+TIMESERIES_METRICS = ("revenue", "orders", "aov", "new_customers", "units")
+
+# Upper bound on buckets per response (about 13 years of days)
+MAX_BUCKETS = 5000
+
+
+class TimeseriesError(ValueError):
+    """Raised for an invalid range, granularity or metric"""
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start: date, granularity: str) -> date:
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def parse_metrics(metrics: str) -> List[str]:
+    names = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else list(TIMESERIES_METRICS)
+    unknown = [m for m in names if m not in TIMESERIES_METRICS]
+    if unknown:
+        raise TimeseriesError(f"Unknown metrics: {', '.join(unknown)} (expected {', '.join(TIMESERIES_METRICS)})")
+    return names
+
+
+def sales_timeseries(db: Session, start: date, end: date, granularity: str, metrics: List[str]) -> dict:
+    """Buckets covering start..end (inclusive); edge buckets are clipped to the range"""
+    if end < start:
+        raise TimeseriesError("'to' must not be before 'from'")
+    if granularity not in GRANULARITIES:
+        raise TimeseriesError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    buckets: Dict[date, dict] = {}
+    bucket = bucket_start(start, granularity)
+    while bucket <= end:
+        buckets[bucket] = {
+            "start": max(bucket, start),
+            "end": min(next_bucket(bucket, granularity) - timedelta(days=1), end),
+            "revenue": 0.0, "orders": 0, "new_customers": 0, "units": 0,
+        }
+        if len(buckets) > MAX_BUCKETS:
+            raise TimeseriesError(f"Range spans more than {MAX_BUCKETS} {granularity} buckets")
+        bucket = next_bucket(bucket, granularity)
+
+    rows = db.execute(
+        select(DailySales.day, DailySales.revenue, DailySales.orders, DailySales.new_customers, DailySales.units)
+        .where(DailySales.day >= start, DailySales.day <= end)
+    )
+    for day, revenue, orders, new_customers, units in rows:
+        b = buckets[bucket_start(day, granularity)]
+        b["revenue"] += revenue
+        b["orders"] += orders
+        b["new_customers"] += new_customers
+        b["units"] += units
+
+    def values(b: dict) -> dict:
+        computed = {
+            "revenue": round(b["revenue"], 2),
+            "orders": b["orders"],
+            "aov": round(b["revenue"] / b["orders"], 2) if b["orders"] else 0.0,
+            "new_customers": b["new_customers"],
+            "units": b["units"],
+        }
+        return {m: computed[m] for m in metrics}
+
+    totals = {
+        key: sum(b[key] for b in buckets.values())
+        for key in ("revenue", "orders", "new_customers", "units")
+    }
+    return {
+        "from": start,
+        "to": end,
+        "granularity": granularity,
+        "metrics": metrics,
+        "series": [{"start": b["start"], "end": b["end"], **values(b)} for b in buckets.values()],
+        "totals": values(totals),
+    }
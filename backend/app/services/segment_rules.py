@@ -0,0 +1,115 @@
+# Segment rule evaluation: the customer query behind a segment
+#
+# Shared by the segments API, the insights job (segment sizes) and the flow runtime
+# (segment-triggered enrollments).
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app.models import Customer, Segment, SegmentRule
+
+
+def evaluate_rule(query, rule: SegmentRule):
+    """Apply a single rule to the customer query"""
+    field = rule.field
+    operator = rule.operator
+    value = rule.value
+    
+    # Map field names to Customer model attributes
+    field_map = {
+        "email": Customer.email,
+        "first_name": Customer.first_name,
+        "last_name": Customer.last_name,
+        "phone": Customer.phone,
+        "city": Customer.city,
+        "state": Customer.state,
+        "country": Customer.country,
+        "zip_code": Customer.zip_code,
+        "status": Customer.status,
+        "total_orders": Customer.total_orders,
+        "total_spend": Customer.total_spend,
+        "lifetime_value": Customer.lifetime_value,
+        "email_opt_in": Customer.email_opt_in,
+        "sms_opt_in": Customer.sms_opt_in,
+        "source": Customer.source,
+        "last_order_date": Customer.last_order_date,
+        "first_order_date": Customer.first_order_date,
+        "created_at": Customer.created_at,
+    }
+    
+    if field not in field_map:
+        return query  # Skip unknown fields
+    
+    column = field_map[field]
+    
+    if operator == "equals":
+        if value.lower() == "true":
+            return query.filter(column == True)
+        elif value.lower() == "false":
+            return query.filter(column == False)
+        return query.filter(column == value)
+    
+    elif operator == "not_equals":
+        return query.filter(column != value)
+    
+    elif operator == "contains":
+        return query.filter(column.ilike(f"%{value}%"))
+    
+    elif operator == "greater_than":
+        try:
+            numeric_value = float(value)
+            return query.filter(column > numeric_value)
+        except ValueError:
+            return query
+    
+    elif operator == "less_than":
+        try:
+            numeric_value = float(value)
+            return query.filter(column < numeric_value)
+        except ValueError:
+            return query
+    
+    elif operator == "within_days":
+        try:
+            days = int(value)
+            cutoff_date = datetime.utcnow() - timedelta(days=days)
+            return query.filter(column >= cutoff_date)
+        except ValueError:
+            return query
+    
+    elif operator == "before_date":
+        try:
+            date_value = datetime.fromisoformat(value)
+            return query.filter(column < date_value)
+        except ValueError:
+            return query
+    
+    return query
+
+
+def get_segment_customers_query(db: Session, segment: Segment):
+    """Build query for customers matching segment rules"""
+    query = db.query(Customer)
+    
+    if not segment.rules:
+        return query
+    
+    if segment.logic == "AND":
+        # All rules must match
+        for rule in segment.rules:
+            query = evaluate_rule(query, rule)
+    else:
+        # OR logic - any rule can match
+        conditions = []
+        for rule in segment.rules:
+            # Build individual conditions
+            sub_query = db.query(Customer.id)
+            sub_query = evaluate_rule(sub_query, rule)
+            conditions.append(Customer.id.in_(sub_query.subquery()))
+        
+        if conditions:
+            query = query.filter(or_(*conditions))
+    
+    return query
@@ -0,0 +1,96 @@
+# Atomic stock reservation
+#
+# reserve_stock() takes stock for any number of SKUs in one statement:
+#     UPDATE products
+#     SET stock_level = stock_level - CASE id WHEN :a THEN :qty_a ... END,
+#         status = <StockStatus of the new level>
+#     WHERE id IN (...) AND stock_level >= CASE id WHEN :a THEN :qty_a ... END
+#     RETURNING id, stock_level, status, <StockStatus of the old level>
+# The database checks and decrements each row under its row lock, so concurrent
+# orders can never take more than is in stock. For several SKUs the rows are first
+# locked in id order (SELECT ... ORDER BY id FOR NO KEY UPDATE) so two multi-SKU
+# reservations can't deadlock. NO KEY UPDATE is the lock the UPDATE takes anyway and,
+# unlike FOR UPDATE, doesn't conflict with the KEY SHARE locks the order_items
+# foreign key checks already hold on the same rows. If any SKU is short, InsufficientStockError is raised
+# and the caller must roll back, which returns what the statement took.
+#
+# The products table version (which invalidates the cached inventory stats) is only
+# bumped when a reservation moves a product to another stock status. Bumping it on
+# every order would make its table_versions row a hot row that every order
+# transaction waits on until commit; the stock value in the stats catches up within
+# INVENTORY_STATS_TTL_SECONDS instead (see services/inventory_stats.py).
+
+from typing import Dict, Iterable, Mapping
+
+from sqlalchemy import case, select
+from sqlalchemy.orm import Session
+
+from app.models import Product, StockStatus
+from app.services.table_versions import bump_table_version
+
+# Same threshold the seed data uses for LOW_STOCK
+LOW_STOCK_THRESHOLD = 50
+
+
+class InsufficientStockError(ValueError):
+    """Raised when a reservation asks for more than is in stock"""
+
+    def __init__(self, product_ids: Iterable[int]):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f"Insufficient stock for product_id: {self.product_ids}")
+
+
+def stock_status(stock_level) -> str:
+    if stock_level <= 0:
+        return StockStatus.OUT_OF_STOCK.value
+    if stock_level < LOW_STOCK_THRESHOLD:
+        return StockStatus.LOW_STOCK.value
+    return StockStatus.IN_STOCK.value
+
+
+def stock_status_expr(stock_level):
+    """SQL version of stock_status() for a stock level expression"""
+    return case(
+        (stock_level <= 0, StockStatus.OUT_OF_STOCK.value),
+        (stock_level < LOW_STOCK_THRESHOLD, StockStatus.LOW_STOCK.value),
+        else_=StockStatus.IN_STOCK.value
+    )
+
+
+def reserve_stock(db: Session, quantities: Mapping[int, int]) -> Dict[int, int]:
+    """
+    Take quantities[product_id] units of each product, all or nothing.
+    Returns the new stock level per product; nothing is committed here.
+    """
+    quantities = {product_id: qty for product_id, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return {}
+
+    products = Product.__table__
+    if len(quantities) > 1:
+        db.execute(
+            select(products.c.id)
+            .where(products.c.id.in_(list(quantities)))
+            .order_by(products.c.id)
+            .with_for_update(key_share=True)
+        )
+
+    qty = case(quantities, value=products.c.id)
+    new_level = products.c.stock_level - qty
+    rows = db.execute(
+        products.update()
+        .where(products.c.id.in_(list(quantities)), products.c.stock_level >= qty)
+        .values(stock_level=new_level, status=stock_status_expr(new_level))
+        .returning(
+            products.c.id,
+            products.c.stock_level,
+            products.c.status,
+            stock_status_expr(products.c.stock_level + qty).label("old_status"),
+        )
+    ).all()
+
+    if len(rows) < len(quantities):
+        raise InsufficientStockError(set(quantities) - {row.id for row in rows})
+    if any(row.status != row.old_status for row in rows):
+        bump_table_version(db, "products")
+    return {row.id: row.stock_level for row in rows}
@@ -0,0 +1,22 @@
+# Per-table version counters for cache invalidation across workers
+#
+# Writers call bump_table_version() in the transaction that changes the table; the
+# new version becomes visible exactly when the change does. Readers compare
+# get_table_version() with the version their cached value was computed at.
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import TableVersion
+from app.utils.upsert import increment_upsert
+
+
+def bump_table_version(db: Session, table_name: str) -> None:
+    db.execute(
+        increment_upsert(db.get_bind(), TableVersion.__table__, ["table_name"], ["version"]),
+        {"table_name": table_name, "version": 1}
+    )
+
+
+def get_table_version(db: Session, table_name: str) -> int:
+    return db.scalar(select(TableVersion.version).where(TableVersion.table_name == table_name)) or 0
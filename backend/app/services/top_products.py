@@ -0,0 +1,161 @@
+# Real-time top products: per-day Space-Saving sketches of units and revenue
+#
+# Order ingestion hands its sales to track_order_sales(); they are added to the
+# sketches only once the session commits, so a rolled-back batch never counts.
+# Reads merge the sketches of the requested days, which costs
+# days x TOP_PRODUCTS_CAPACITY operations and never touches order_items.
+#
+# Sketches live in process memory (TOP_PRODUCTS_WINDOW_DAYS days of two sketches
+# each). They are loaded from the daily_product_sales rollup on startup and reloaded
+# from it every TOP_PRODUCTS_RESYNC_SECONDS, which also picks up orders written by
+# other worker processes. A reload builds new sketches aside and swaps them in at
+# once; sales recorded while it reads the rollup are replayed into them first.
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import DailyProductSales, OrderStatus
+from app.services.product_catalog import resolve_products
+from app.services.sales_rollup import OrderSale
+from app.utils.space_saving import SpaceSaving
+
+PENDING_KEY = "top_products_pending"
+
+
+class TopProductsTracker:
+    def __init__(self, capacity: int, window_days: int):
+        self.capacity = capacity
+        self.window_days = window_days
+        self._days: Dict[date, Tuple[SpaceSaving, SpaceSaving]] = {}
+        self._lock = threading.Lock()
+        # Sales recorded while a reload reads the rollup (None when no reload runs)
+        self._recorded_during_reload: Optional[list] = None
+        self._reload_lock = threading.Lock()
+        self.loaded_at: Optional[float] = None
+
+    def _window_start(self) -> date:
+        return datetime.utcnow().date() - timedelta(days=self.window_days - 1)
+
+    def _add(self, days: Dict[date, Tuple[SpaceSaving, SpaceSaving]], sales: Iterable[tuple], oldest: date) -> None:
+        for day, product_id, units, revenue in sales:
+            if day < oldest:
+                continue
+            if day not in days:
+                days[day] = (SpaceSaving(self.capacity), SpaceSaving(self.capacity))
+            by_units, by_revenue = days[day]
+            by_units.add(product_id, units)
+            by_revenue.add(product_id, revenue)
+
+    def record(self, sales: Iterable[Tuple[date, int, int, float]]) -> None:
+        """Add (day, product_id, units, revenue) rows; days outside the window are ignored"""
+        sales = list(sales)
+        oldest = self._window_start()
+        with self._lock:
+            self._add(self._days, sales, oldest)
+            for day in [d for d in self._days if d < oldest]:
+                del self._days[day]
+            if self._recorded_during_reload is not None:
+                self._recorded_during_reload.extend(sales)
+
+    def top(self, days: int, limit: int) -> Tuple[List[tuple], List[tuple]]:
+        """Top `limit` (product_id, estimate, error) by units and by revenue over the last `days` days"""
+        first = datetime.utcnow().date() - timedelta(days=days - 1)
+        by_units, by_revenue = SpaceSaving(self.capacity), SpaceSaving(self.capacity)
+        with self._lock:
+            for day, (units_sketch, revenue_sketch) in self._days.items():
+                if day >= first:
+                    by_units = by_units.merge(units_sketch)
+                    by_revenue = by_revenue.merge(revenue_sketch)
+        return by_units.top(limit), by_revenue.top(limit)
+
+    def needs_resync(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= settings.TOP_PRODUCTS_RESYNC_SECONDS
+
+    def load_from_rollups(self, db: Session) -> None:
+        """
+        Replace the sketches with the exact per-day totals from daily_product_sales.
+
+        Readers keep the current sketches until the new ones are swapped in. Sales
+        recorded from just before the rollup is read until the swap are replayed into
+        the new sketches, so orders committed meanwhile aren't dropped; only an order
+        committed before the read whose commit hook runs after it can count twice,
+        until the next reload. A reload already running in another thread is not
+        repeated.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                self._recorded_during_reload = []
+            oldest = self._window_start()
+            rows = db.execute(
+                select(DailyProductSales.day, DailyProductSales.product_id, DailyProductSales.units, DailyProductSales.revenue)
+                .where(DailyProductSales.day >= oldest)
+            ).all()
+            days: Dict[date, Tuple[SpaceSaving, SpaceSaving]] = {}
+            self._add(days, rows, oldest)
+            with self._lock:
+                self._add(days, self._recorded_during_reload, oldest)
+                self._days = days
+                self.loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._recorded_during_reload = None
+            self._reload_lock.release()
+
+
+top_products = TopProductsTracker(settings.TOP_PRODUCTS_CAPACITY, settings.TOP_PRODUCTS_WINDOW_DAYS)
+
+
+def top_products_report(db: Session, days: int, limit: int) -> dict:
+    """Top products by units and by revenue over the last `days` days, with product details"""
+    if top_products.needs_resync():
+        top_products.load_from_rollups(db)
+    by_units, by_revenue = top_products.top(days, limit)
+
+    ids = {product_id for product_id, _, _ in by_units + by_revenue}
+    products = resolve_products(db, ids)
+
+    def entries(ranked: List[tuple], digits: int) -> List[dict]:
+        return [
+            {
+                "product_id": product_id,
+                "name": products[product_id].name,
+                "sku": products[product_id].sku,
+                "price": products[product_id].price,
+                "image_url": products[product_id].image_url,
+                "value": round(value, digits),
+                "error": round(error, digits),
+            }
+            for product_id, value, error in ranked
+            if product_id in products
+        ]
+
+    return {"days": days, "by_units": entries(by_units, 0), "by_revenue": entries(by_revenue, 2)}
+
+
+def track_order_sales(db: Session, orders: Iterable[OrderSale]) -> None:
+    """Queue orders for the tracker; they are applied when `db` commits"""
+    pending = db.info.setdefault(PENDING_KEY, [])
+    for order_date, status, _, items in orders:
+        if status == OrderStatus.CANCELLED.value:
+            continue
+        pending.extend((order_date.date(), product_id, quantity, quantity * price) for product_id, quantity, price in items)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_sales(session: Session) -> None:
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        top_products.record(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_sales(session: Session) -> None:
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,52 @@
+# Keyset (cursor) pagination helpers
+
+import base64
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+import orjson
+from sqlalchemy import tuple_
+
+
+def encode_cursor(sort_by: str, sort_order: str, value: Any, row_id: int) -> str:
+    """Opaque cursor pointing just after the row with (value, row_id)"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = orjson.dumps([sort_by, sort_order, value, row_id])
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str) -> Tuple[Any, int]:
+    """
+    Decode a cursor produced by encode_cursor for the same sort.
+    Raises ValueError if the cursor is malformed or was issued for another sort.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_by, cursor_sort_order, value, row_id = orjson.loads(raw)
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        raise ValueError("Cursor does not match the requested sort")
+    try:
+        if sort_by == "date" and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except (TypeError, ValueError):
+        raise ValueError("Malformed cursor")
+
+
+def keyset_filter(sort_column, id_column, sort_order: str, value: Any, row_id: int):
+    """Row-value comparison selecting the rows that come after (value, row_id)"""
+    key = tuple_(sort_column, id_column)
+    if sort_order == "desc":
+        return key < tuple_(value, row_id)
+    return key > tuple_(value, row_id)
+
+
+def next_cursor_for(rows: list, per_page: int, sort_by: str, sort_order: str, sort_index: int, id_index: int = 0) -> Optional[str]:
+    """Cursor for the page after `rows` (fetched with limit per_page + 1), or None on the last page"""
+    if len(rows) <= per_page:
+        return None
+    last = rows[per_page - 1]
+    return encode_cursor(sort_by, sort_order, last[sort_index], last[id_index])
@@ -0,0 +1,59 @@
+# Space-Saving heavy-hitters sketch (Metwally et al.), weighted variant
+#
+# Tracks at most `capacity` items. Any item whose true total exceeds
+# total_weight / capacity is guaranteed to be tracked, and every estimate
+# overshoots the true total by at most its `error`.
+
+from typing import Dict, Hashable, List, Tuple
+
+
+class SpaceSaving:
+    __slots__ = ("capacity", "counts", "errors", "total")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        self.errors: Dict[Hashable, float] = {}
+        self.total = 0.0
+
+    def add(self, item: Hashable, weight: float = 1) -> None:
+        self.total += weight
+        if item in self.counts:
+            self.counts[item] += weight
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = weight
+            self.errors[item] = 0
+            return
+        # Replace the smallest counter; the newcomer inherits its count as error
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        self.errors.pop(victim)
+        self.counts[item] = floor + weight
+        self.errors[item] = floor
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """
+        Combined sketch of two streams (Agarwal et al. mergeable summaries): an item
+        missing from one side may have had up to that side's smallest count there.
+        """
+        result = SpaceSaving(max(self.capacity, other.capacity))
+        result.total = self.total + other.total
+        self_floor = min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+        other_floor = min(other.counts.values()) if len(other.counts) >= other.capacity else 0
+
+        combined: Dict[Hashable, Tuple[float, float]] = {}
+        for item in self.counts.keys() | other.counts.keys():
+            count = self.counts.get(item, self_floor) + other.counts.get(item, other_floor)
+            error = self.errors.get(item, self_floor) + other.errors.get(item, other_floor)
+            combined[item] = (count, error)
+
+        for item, (count, error) in sorted(combined.items(), key=lambda kv: kv[1][0], reverse=True)[:result.capacity]:
+            result.counts[item] = count
+            result.errors[item] = error
+        return result
+
+    def top(self, n: int) -> List[Tuple[Hashable, float, float]]:
+        """(item, estimate, max overestimate) for the n largest estimates"""
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(item, count, self.errors[item]) for item, count in ranked]
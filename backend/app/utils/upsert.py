@@ -0,0 +1,30 @@
+# INSERT ... ON CONFLICT helpers for the dialects the app runs on (PostgreSQL, SQLite)
+
+from typing import Iterable, List
+
+from sqlalchemy import Table
+
+
+def dialect_insert(bind, table: Table):
+    """Dialect-specific insert() for `table`, exposing on_conflict_do_update / do_nothing"""
+    name = bind.dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Upserts are not supported on {name}")
+    return insert(table)
+
+
+def increment_upsert(bind, table: Table, key_columns: Iterable[str], increment_columns: Iterable[str]):
+    """
+    INSERT a row, or add its `increment_columns` to the existing row with the same key.
+    Execute with a list of parameter dicts for an executemany.
+    """
+    stmt = dialect_insert(bind, table)
+    increment_columns: List[str] = list(increment_columns)
+    return stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: table.c[name] + stmt.excluded[name] for name in increment_columns}
+    )
@@ -0,0 +1,168 @@
+# End-to-end latency of GET /api/dashboard/stats
+#
+# Run from the backend directory against a migrated database:
+#     python -m benchmarks.bench_dashboard [--generate 10000000] [--requests 50]
+#
+# --generate (PostgreSQL only) bulk-inserts synthetic orders, one item each, spread
+# over the last year for the existing customers and products, in batches of
+# --batch-size rows with generate_series. Generated orders use the "BM-" order id
+# prefix; --cleanup deletes them again. Generated (and deleted) orders bypass the
+# order write path, so the daily sales rollups the dashboard reads are rebuilt for
+# the last year afterwards.
+#
+# Requests go through the dashboard router over HTTP (TestClient), so the numbers
+# include query execution, response validation and JSON encoding. The stats cache is
+# cleared before every request, so each one recomputes (X-Cache: MISS); cached
+# responses are timed separately. The number of SQL statements issued per
+# uncached request is reported as well.
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.database import SessionLocal, engine
+from app.models import OrderStatus
+from app.routers import dashboard
+from app.services.sales_rollup import rebuild_sales_rollups
+
+GENERATE_ORDERS_SQL = """
+INSERT INTO orders (order_id, customer_id, date, status, total_amount, shipping_address, search_text)
+SELECT
+    'BM-' || g,
+    c.ids[1 + (g %% array_length(c.ids, 1))],
+    (now() AT TIME ZONE 'utc') - random() * interval '365 days',
+    (%(statuses)s::text[])[1 + (g %% array_length(%(statuses)s::text[], 1))],
+    round((20 + random() * 480)::numeric, 2),
+    NULL,
+    lower('BM-' || g)
+FROM generate_series(%(start)s, %(stop)s) AS g,
+     (SELECT array_agg(id ORDER BY id) AS ids FROM customers) AS c
+"""
+
+GENERATE_ITEMS_SQL = """
+INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase)
+SELECT o.id, p.ids[1 + (o.id %% array_length(p.ids, 1))], 1 + (o.id %% 3), o.total_amount
+FROM orders o, (SELECT array_agg(id ORDER BY id) AS ids FROM products) AS p
+WHERE o.id > %(after_id)s AND o.order_id LIKE 'BM-%%'
+"""
+
+# Mostly delivered, as in the seed data
+GENERATED_STATUSES = [
+    OrderStatus.DELIVERED.value, OrderStatus.DELIVERED.value, OrderStatus.DELIVERED.value,
+    OrderStatus.SHIPPED.value, OrderStatus.PENDING.value, OrderStatus.CANCELLED.value,
+]
+
+
+def generate_orders(count: int, batch_size: int) -> None:
+    if engine.dialect.name != "postgresql":
+        print("--generate requires PostgreSQL")
+        sys.exit(2)
+
+    with engine.begin() as conn:
+        offset = conn.exec_driver_sql("SELECT count(*) FROM orders WHERE order_id LIKE 'BM-%%'").scalar()
+
+    generated = 0
+    while generated < count:
+        size = min(batch_size, count - generated)
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            after_id = conn.exec_driver_sql("SELECT coalesce(max(id), 0) FROM orders").scalar()
+            conn.exec_driver_sql(GENERATE_ORDERS_SQL, {
+                "start": offset + generated + 1, "stop": offset + generated + size, "statuses": GENERATED_STATUSES,
+            })
+            conn.exec_driver_sql(GENERATE_ITEMS_SQL, {"after_id": after_id})
+        generated += size
+        print(f"  generated {generated:,} / {count:,} orders ({time.perf_counter() - start:.1f}s for this batch)")
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE orders")
+        conn.exec_driver_sql("ANALYZE order_items")
+    rebuild_rollups()
+
+
+def rebuild_rollups() -> None:
+    """Recompute the last year of daily sales rollups from the orders table"""
+    start = time.perf_counter()
+    today = date.today()
+    with SessionLocal() as db:
+        days = rebuild_sales_rollups(db, today - timedelta(days=366), today)
+        db.commit()
+    print(f"  rebuilt sales rollups ({days} days with data, {time.perf_counter() - start:.1f}s)")
+
+
+def cleanup_orders() -> None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "DELETE FROM order_items WHERE order_id IN (SELECT id FROM orders WHERE order_id LIKE 'BM-%%')"
+        )
+        deleted = conn.exec_driver_sql("DELETE FROM orders WHERE order_id LIKE 'BM-%%'").rowcount
+    print(f"Deleted {deleted:,} generated orders")
+    rebuild_rollups()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure GET /api/dashboard/stats latency")
+    parser.add_argument("--generate", type=int, default=0, help="Synthetic orders to insert first (PostgreSQL)")
+    parser.add_argument("--batch-size", type=int, default=1_000_000)
+    parser.add_argument("--cleanup", action="store_true", help="Delete generated orders and exit")
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup_orders()
+        return
+    if args.generate:
+        print(f"Generating {args.generate:,} orders...")
+        generate_orders(args.generate, args.batch_size)
+
+    with engine.connect() as conn:
+        orders = conn.exec_driver_sql("SELECT count(*) FROM orders").scalar()
+
+    app = FastAPI()
+    app.include_router(dashboard.router, prefix="/api/dashboard")
+
+    statements = 0
+
+    def count_statement(*_):
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+
+    latencies = []
+    cached = []
+    with TestClient(app) as client:  # one event loop for all requests, as under uvicorn
+        client.get("/api/dashboard/stats").raise_for_status()  # warm-up
+        statements = 0
+
+        for _ in range(args.requests):
+            dashboard.stats_cache.clear()
+            start = time.perf_counter()
+            client.get("/api/dashboard/stats").raise_for_status()
+            latencies.append((time.perf_counter() - start) * 1000)
+        uncached_statements = statements
+
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            assert client.get("/api/dashboard/stats").headers["X-Cache"] == "HIT"
+            cached.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"Orders in database:     {orders:>12,}")
+    print(f"Requests:               {args.requests:>12,}")
+    print(f"Statements per request: {uncached_statements / args.requests:>12.1f}")
+    print(f"Latency p50:            {statistics.median(latencies):>10.1f} ms")
+    print(f"Latency p95:            {p95:>10.1f} ms")
+    print(f"Latency max:            {latencies[-1]:>10.1f} ms")
+    print(f"Cached (HIT) p50:       {statistics.median(cached):>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# Throughput benchmark for the email delivery pipeline (core/mailer.py)
+#
+# Run from the backend directory (needs `pip install aiosmtpd`; no database or
+# real SMTP server is used):
+#     python -m benchmarks.bench_email_delivery [--messages 20000] [--connections 8]
+#         [--rate-limits gmail.com=500] [--fail-every 50] [--server-delay-ms 20] [--baseline 500]
+#
+# Starts a local aiosmtpd server in a child process (so it doesn't compete with the
+# mailer for the GIL) that accepts and counts every message, or answers every
+# --fail-every'th one with a 451, which the mailer retries. --server-delay-ms delays
+# each reply to the message data, like a remote server would. It then sends
+# --messages messages to recipients spread over DOMAINS and
+# reports messages per second. --baseline sends that many messages the way
+# app/utils/email.py does, one connection per message, for comparison.
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import sys
+import time
+
+import aiosmtplib
+
+from app.core.mailer import DomainRateLimiter, Mailer, OutgoingEmail, build_message, parse_rate_limits
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+HOST = "127.0.0.1"
+SENDER = "bench@example.com"
+DOMAINS = ["gmail.com", "outlook.com", "company.co", "example.com", "yahoo.com", "hotmail.com"]
+
+
+class CountingHandler:
+    def __init__(self, received, refused, fail_every, delay):
+        self.received = received
+        self.refused = refused
+        self.fail_every = fail_every
+        self.delay = delay
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        fail_every = self.fail_every.value
+        if fail_every and (self.received.value + self.refused.value + 1) % fail_every == 0:
+            self.refused.value += 1
+            return "451 Try again later"
+        self.received.value += 1
+        return "250 OK"
+
+
+def serve(port: int, received, refused, fail_every, delay, ready, stop) -> None:
+    controller = Controller(CountingHandler(received, refused, fail_every, delay), hostname=HOST, port=port)
+    controller.start()
+    ready.set()
+    stop.wait()
+    controller.stop()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def make_emails(count: int) -> list:
+    return [
+        OutgoingEmail(
+            to=f"customer{i}@{DOMAINS[i % len(DOMAINS)]}",
+            subject="Your weekly picks",
+            body=f"<p>Hello customer {i}, here are this week's picks.</p>",
+            key=i,
+        )
+        for i in range(count)
+    ]
+
+
+async def run_pipeline(args, port: int) -> tuple:
+    mailer = Mailer(
+        connections=args.connections,
+        queue_size=args.queue_size,
+        rate_limiter=DomainRateLimiter(parse_rate_limits(args.rate_limits)),
+        backoff_seconds=0.05,
+        sender=SENDER,
+        smtp_factory=lambda: aiosmtplib.SMTP(hostname=HOST, port=port, start_tls=False),
+    )
+    start = time.perf_counter()
+    async with mailer:
+        results = await mailer.send_many(make_emails(args.messages))
+    return results, time.perf_counter() - start
+
+
+async def run_baseline(count: int, port: int) -> float:
+    start = time.perf_counter()
+    for email in make_emails(count):
+        await aiosmtplib.send(build_message(email, SENDER), hostname=HOST, port=port, start_tls=False)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send messages through the mailer to a local SMTP server")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=1000)
+    parser.add_argument("--rate-limits", default="", help='Messages per second by domain, e.g. "gmail.com=500"')
+    parser.add_argument("--fail-every", type=int, default=0, help="Answer every Nth message with a 451")
+    parser.add_argument("--server-delay-ms", type=float, default=0, help="Server latency per message")
+    parser.add_argument("--baseline", type=int, default=500, help="Messages to send one connection each (0 skips)")
+    args = parser.parse_args()
+
+    if Controller is None:
+        print("This benchmark needs aiosmtpd: pip install aiosmtpd")
+        sys.exit(2)
+
+    # Only the child process writes the counters
+    received = multiprocessing.Value("i", 0, lock=False)
+    refused = multiprocessing.Value("i", 0, lock=False)
+    fail_every = multiprocessing.Value("i", args.fail_every, lock=False)
+    ready, stop = multiprocessing.Event(), multiprocessing.Event()
+    port = free_port()
+    server = multiprocessing.Process(
+        target=serve, args=(port, received, refused, fail_every, args.server_delay_ms / 1000, ready, stop), daemon=True
+    )
+    server.start()
+    ready.wait()
+    try:
+        results, elapsed = asyncio.run(run_pipeline(args, port))
+        delivered = sum(r.ok for r in results)
+        retried = sum(r.attempts > 1 for r in results)
+        print(f"Pipeline:  {delivered:>8,} of {args.messages:,} delivered in {elapsed:.2f} s "
+              f"({delivered / elapsed:,.0f} msg/s) over {args.connections} connections")
+        print(f"Retried:   {retried:>8,} messages ({refused.value:,} 451 replies)")
+        if args.rate_limits:
+            for domain, rate in parse_rate_limits(args.rate_limits).items():
+                count = sum(r.email.to.endswith("@" + domain) for r in results)
+                print(f"  {domain}: {count:,} messages at {rate:g}/s (at least {max(count - rate, 0) / rate:.1f} s)")
+
+        if args.baseline:
+            fail_every.value = 0
+            baseline = asyncio.run(run_baseline(args.baseline, port))
+            print(f"Baseline:  {args.baseline:>8,} messages, one connection each, in {baseline:.2f} s "
+                  f"({args.baseline / baseline:,.0f} msg/s)")
+    finally:
+        stop.set()
+        server.join()
+
+    ok = delivered == args.messages and received.value >= delivered
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# Ingestion benchmark for email open/click tracking (services/email_tracking.py)
+#
+# Run from the backend directory against a migrated database:
+#     python -m benchmarks.bench_email_events [--messages 20000] [--events 200000] [--baseline 2000]
+#
+# Creates --messages sent flow messages (to "eventbench-" customers, over the two
+# steps of one flow), then:
+#   - ingest: --events open/click hits (one in five a click) on random messages,
+#     through the endpoint handlers into the in-process buffer
+#   - flush:  one flush_events() of everything ingested, counting SQL statements
+#     and the counter UPDATEs among them
+#   - baseline: --baseline events the naive way, an INSERT and UPDATEs of the
+#     flow and step counters per event, one transaction each
+# and checks that the counters equal the number of distinct messages opened and
+# clicked. Everything it created is deleted again.
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from sqlalchemy import event, func, insert, select, update
+
+from app.database import SessionLocal, engine
+from app.models import Customer, EmailEvent, EmailEventType, Flow, FlowMessage, FlowStep
+from app.routers.tracking import track_click, track_open
+from app.services.email_tracking import event_buffer, flush_events, make_token
+
+URL = "https://shop.example.com/sale"
+
+
+def setup(count: int) -> tuple:
+    with SessionLocal() as db:
+        db.execute(insert(Customer), [
+            {"email": f"eventbench-{i}@example.com", "first_name": "Event", "email_opt_in": True} for i in range(count)
+        ])
+        flow = Flow(name="Email event benchmark", trigger_type="manual", status="active")
+        db.add(flow)
+        db.flush()
+        steps = [FlowStep(flow_id=flow.id, order=order, step_type="email", subject="Sale") for order in (1, 2)]
+        db.add_all(steps)
+        db.flush()
+        customer_ids = db.scalars(select(Customer.id).where(Customer.email.like("eventbench-%"))).all()
+        db.execute(insert(FlowMessage), [
+            {"flow_id": flow.id, "step_id": steps[i % 2].id, "customer_id": customer_id, "status": "sent"}
+            for i, customer_id in enumerate(customer_ids)
+        ])
+        db.commit()
+        message_ids = db.scalars(select(FlowMessage.id).where(FlowMessage.flow_id == flow.id)).all()
+        return flow.id, message_ids
+
+
+def cleanup(flow_id: int) -> None:
+    with SessionLocal() as db:
+        # Not left to ON DELETE CASCADE, which SQLite doesn't enforce by default
+        db.query(EmailEvent).filter(EmailEvent.flow_id == flow_id).delete()
+        db.query(FlowMessage).filter(FlowMessage.flow_id == flow_id).delete()
+        db.query(FlowStep).filter(FlowStep.flow_id == flow_id).delete()
+        db.query(Flow).filter(Flow.id == flow_id).delete()
+        db.query(Customer).filter(Customer.email.like("eventbench-%")).delete(synchronize_session=False)
+        db.commit()
+
+
+def make_hits(message_ids: list, count: int) -> list:
+    rng = random.Random(7)
+    hits = []
+    for _ in range(count):
+        message_id = rng.choice(message_ids)
+        if rng.random() < 0.2:
+            hits.append((EmailEventType.CLICK, make_token(message_id, URL)))
+        else:
+            hits.append((EmailEventType.OPEN, make_token(message_id)))
+    return hits
+
+
+async def ingest(hits: list) -> None:
+    for event_type, token in hits:
+        if event_type is EmailEventType.CLICK:
+            await track_click(token, URL)
+        else:
+            await track_open(token)
+
+
+def run_baseline(flow_id: int, message_ids: list, count: int) -> None:
+    rng = random.Random(11)
+    flows, steps = Flow.__table__, FlowStep.__table__
+    with SessionLocal() as db:
+        step_of = dict(db.execute(select(FlowMessage.id, FlowMessage.step_id).where(FlowMessage.flow_id == flow_id)).all())
+        for _ in range(count):
+            message_id = rng.choice(message_ids)
+            db.execute(insert(EmailEvent).values(
+                message_id=message_id, flow_id=flow_id, step_id=step_of[message_id], customer_id=0, event_type="open",
+            ))
+            db.execute(update(flows).where(flows.c.id == flow_id).values(total_opened=flows.c.total_opened + 1))
+            db.execute(
+                update(steps).where(steps.c.id == step_of[message_id]).values(open_count=steps.c.open_count + 1)
+            )
+            db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time ingesting email open/click events")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--baseline", type=int, default=2000, help="Events to record one transaction each (0 skips)")
+    args = parser.parse_args()
+
+    event_buffer.max_size = max(event_buffer.max_size, args.events)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, *_):
+        statements.append(statement)
+
+    flow_id, message_ids = setup(args.messages)
+    try:
+        hits = make_hits(message_ids, args.events)
+        start = time.perf_counter()
+        asyncio.run(ingest(hits))
+        elapsed = time.perf_counter() - start
+        print(f"Ingest:    {args.events:>9,} events in {elapsed:6.2f} s ({args.events / elapsed:>9,.0f}/s)")
+
+        statements.clear()
+        start = time.perf_counter()
+        stored = flush_events()
+        elapsed = time.perf_counter() - start
+        counter_writes = sum(s.lstrip().upper().startswith(("UPDATE FLOWS", "UPDATE FLOW_STEPS")) for s in statements)
+        print(f"Flush:     {stored:>9,} events in {elapsed:6.2f} s ({stored / elapsed:>9,.0f}/s), "
+              f"{len(statements)} statements, {counter_writes} counter UPDATEs")
+
+        with SessionLocal() as db:
+            flow = db.get(Flow, flow_id)
+            opened, clicked = db.execute(
+                select(func.count(FlowMessage.opened_at), func.count(FlowMessage.clicked_at))
+                .where(FlowMessage.flow_id == flow_id)
+            ).one()
+            step_opens = db.scalar(select(func.sum(FlowStep.open_count)).where(FlowStep.flow_id == flow_id))
+            counters = (flow.total_opened, flow.total_clicked, step_opens)
+        print(f"Counters:  {counters[0]:>9,} opened, {counters[1]:,} clicked (messages: {opened:,} / {clicked:,})")
+
+        if args.baseline:
+            start = time.perf_counter()
+            run_baseline(flow_id, message_ids, args.baseline)
+            elapsed = time.perf_counter() - start
+            print(f"Baseline:  {args.baseline:>9,} events in {elapsed:6.2f} s ({args.baseline / elapsed:>9,.0f}/s), "
+                  f"one transaction each")
+    finally:
+        cleanup(flow_id)
+
+    ok = stored == args.events and counters == (opened, clicked, opened) and counter_writes <= 3
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# Report latency benchmark for flow analytics (services/flow_analytics.py)
+#
+# Run from the backend directory against a migrated database:
+#     python -m benchmarks.bench_flow_analytics [--messages 200000] [--repeat 20]
+#
+# Creates one flow of three email steps with --messages sent messages (to
+# "analyticsbench-" customers) spread over the last 30 days, most opened, some
+# clicked, and rebuilds its flow_step_stats rows. It then times the 30-day daily
+# and 7-day hourly reports from the rollup against the same numbers computed by
+# scanning flow_messages, and checks that both agree. Everything it created is
+# deleted again.
+
+import argparse
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app.database import SessionLocal
+from app.models import Customer, Flow, FlowMessage, FlowStep, FlowStepStats
+from app.services.flow_analytics import flow_analytics, rebuild_flow_stats
+
+
+def setup(count: int, now: datetime) -> int:
+    rng = random.Random(3)
+    with SessionLocal() as db:
+        db.execute(insert(Customer), [
+            {"email": f"analyticsbench-{i}@example.com", "first_name": "Analytics", "email_opt_in": True}
+            for i in range(count // 3 + 1)
+        ])
+        flow = Flow(name="Flow analytics benchmark", trigger_type="manual", status="active")
+        db.add(flow)
+        db.flush()
+        steps = [FlowStep(flow_id=flow.id, order=order, step_type="email", subject=f"Step {order}") for order in (1, 2, 3)]
+        db.add_all(steps)
+        db.flush()
+        customer_ids = db.scalars(select(Customer.id).where(Customer.email.like("analyticsbench-%"))).all()
+        rows = []
+        for i in range(count):
+            sent_at = now - timedelta(seconds=rng.uniform(0, 29 * 86400))
+            opened_at = sent_at + timedelta(minutes=rng.expovariate(1 / 90)) if rng.random() < 0.4 else None
+            clicked_at = opened_at + timedelta(minutes=rng.uniform(0, 10)) if opened_at and rng.random() < 0.25 else None
+            rows.append({
+                "flow_id": flow.id, "step_id": steps[i % 3].id, "customer_id": customer_ids[i // 3], "status": "sent",
+                "sent_at": sent_at, "opened_at": opened_at and min(opened_at, now),
+                "clicked_at": clicked_at and min(clicked_at, now),
+            })
+        db.execute(insert(FlowMessage.__table__), rows)
+        rebuild_flow_stats(db, flow.id)
+        db.commit()
+        return flow.id
+
+
+def cleanup(flow_id: int) -> None:
+    with SessionLocal() as db:
+        # Not left to ON DELETE CASCADE, which SQLite doesn't enforce by default
+        db.query(FlowStepStats).filter(FlowStepStats.flow_id == flow_id).delete()
+        db.query(FlowMessage).filter(FlowMessage.flow_id == flow_id).delete()
+        db.query(FlowStep).filter(FlowStep.flow_id == flow_id).delete()
+        db.query(Flow).filter(Flow.id == flow_id).delete()
+        db.query(Customer).filter(Customer.email.like("analyticsbench-%")).delete(synchronize_session=False)
+        db.commit()
+
+
+def scan_report(db, flow_id: int, since: datetime) -> dict:
+    """Per-step sent/opened/clicked since `since`, straight from flow_messages"""
+    counts = Counter()
+    rows = db.execute(
+        select(FlowMessage.step_id, FlowMessage.sent_at, FlowMessage.opened_at, FlowMessage.clicked_at)
+        .where(FlowMessage.flow_id == flow_id)
+    )
+    for step_id, sent_at, opened_at, clicked_at in rows:
+        for name, at in (("sent", sent_at), ("opened", opened_at), ("clicked", clicked_at)):
+            if at and at >= since:
+                counts[step_id, name] += 1
+    return counts
+
+
+def timed(label: str, repeat: int, func):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"{label:<22} {elapsed:9.2f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time flow analytics reports")
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    start = time.perf_counter()
+    flow_id = setup(args.messages, now)
+    print(f"Setup: {args.messages:,} messages in {time.perf_counter() - start:.1f} s")
+
+    try:
+        with SessionLocal() as db:
+            stats_rows = db.query(FlowStepStats).filter(FlowStepStats.flow_id == flow_id).count()
+            print(f"Rollup: {stats_rows:,} flow_step_stats rows")
+            daily = timed("rollup, 30 days daily", args.repeat, lambda: flow_analytics(db, flow_id, 30, "day", now))
+            timed("rollup, 7 days hourly", args.repeat, lambda: flow_analytics(db, flow_id, 7, "hour", now))
+            scanned = timed("scan flow_messages", max(args.repeat // 10, 1), lambda: scan_report(db, flow_id, daily["from"]))
+    finally:
+        cleanup(flow_id)
+
+    ok = all(
+        step[name] == scanned[step["step_id"], name]
+        for step in daily["steps"]
+        for name in ("sent", "opened", "clicked")
+    ) and daily["totals"]["sent"] == args.messages
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
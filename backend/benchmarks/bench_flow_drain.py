@@ -0,0 +1,132 @@
+# Drain benchmark for the flow runtime (services/flow_runtime.py)
+#
+# Run from the backend directory against a migrated PostgreSQL database:
+#     python -m benchmarks.bench_flow_drain [--enrollments 1000000] [--idle-ticks 100]
+#
+# Creates --enrollments customers ("flowbench-" emails) and one active flow of two
+# email steps, the second a day after the first, then enrolls every customer with
+# generate_series, all due at random times within the last hour. advance_flows()
+# drains the burst the way a worker tick would, and the run reports:
+#   - enrollments advanced per second and messages queued
+#   - whether batches ran in due order (each batch's enrollments due no later than
+#     the next batch's)
+#   - SQL statements issued by --idle-ticks ticks once nothing is due (expected 0:
+#     the timer wheel knows the next step is a day out; a FLOW_TIMER_RESYNC_SECONDS
+#     resync falling into the ticks adds one probe per active flow)
+# Everything it created is deleted again.
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models import Customer, Flow, FlowStep
+from app.services.flow_runtime import advance_flows, flow_timers
+
+GENERATE_CUSTOMERS_SQL = """
+INSERT INTO customers (email, first_name, last_name, email_opt_in, created_at, updated_at)
+SELECT 'flowbench-' || g || '@example.com', 'Flow', 'Bench ' || g, true, now(), now()
+FROM generate_series(1, :count) AS g
+"""
+
+# enrolled_at keeps the original due time, to check the drain order afterwards
+GENERATE_ENROLLMENTS_SQL = """
+INSERT INTO flow_enrollments (flow_id, customer_id, status, step_order, due_at, enrolled_at, updated_at)
+SELECT :flow_id, c.id, 'active', 1, d.due, d.due, d.due
+FROM customers c,
+     LATERAL (SELECT (now() AT TIME ZONE 'utc') - random() * interval '1 hour' AS due OFFSET 0) AS d
+WHERE c.email LIKE 'flowbench-%'
+"""
+
+# Per batch (messages of one batch share created_at): the range of due times it advanced
+BATCH_RANGES_SQL = """
+SELECT m.created_at, min(e.enrolled_at), max(e.enrolled_at)
+FROM flow_messages m
+JOIN flow_enrollments e ON e.flow_id = m.flow_id AND e.customer_id = m.customer_id
+WHERE m.flow_id = :flow_id
+GROUP BY m.created_at
+ORDER BY m.created_at
+"""
+
+
+def setup(count: int) -> int:
+    with SessionLocal() as db:
+        db.execute(text(GENERATE_CUSTOMERS_SQL), {"count": count})
+        flow = Flow(name="Flow drain benchmark", trigger_type="manual", status="active")
+        db.add(flow)
+        db.flush()
+        db.add_all([
+            FlowStep(flow_id=flow.id, order=1, step_type="email", subject="Welcome"),
+            FlowStep(flow_id=flow.id, order=2, step_type="email", subject="Day two", delay_days=1),
+        ])
+        db.execute(text(GENERATE_ENROLLMENTS_SQL), {"flow_id": flow.id})
+        db.commit()
+        return flow.id
+
+
+def cleanup(flow_id: int) -> None:
+    with SessionLocal() as db:
+        # flow_enrollments and flow_messages go with them (ON DELETE CASCADE)
+        db.query(Flow).filter(Flow.id == flow_id).delete()
+        db.query(Customer).filter(Customer.email.like("flowbench-%")).delete(synchronize_session=False)
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time draining a burst of due flow enrollments")
+    parser.add_argument("--enrollments", type=int, default=1_000_000)
+    parser.add_argument("--idle-ticks", type=int, default=100)
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print("Run against PostgreSQL")
+        sys.exit(2)
+
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*_):
+        statements[0] += 1
+
+    start = time.perf_counter()
+    flow_id = setup(args.enrollments)
+    print(f"Setup:     {args.enrollments:>10,} enrollments in {time.perf_counter() - start:.1f} s")
+
+    try:
+        start = time.perf_counter()
+        advanced = advance_flows()
+        elapsed = time.perf_counter() - start
+
+        statements[0] = 0
+        tick_start = time.perf_counter()
+        for _ in range(args.idle_ticks):
+            advance_flows()
+        tick_ms = (time.perf_counter() - tick_start) / max(args.idle_ticks, 1) * 1000
+        idle_statements = statements[0]
+
+        with SessionLocal() as db:
+            ranges = db.execute(text(BATCH_RANGES_SQL), {"flow_id": flow_id}).all()
+            queued = db.execute(
+                text("SELECT count(*) FROM flow_messages WHERE flow_id = :flow_id"), {"flow_id": flow_id}
+            ).scalar()
+    finally:
+        cleanup(flow_id)
+
+    in_order = all(earlier[2] <= later[1] for earlier, later in zip(ranges, ranges[1:]))
+    print(f"Drained:   {advanced:>10,} enrollments in {elapsed:.1f} s ({advanced / elapsed:,.0f}/s), "
+          f"{len(ranges)} batches of up to {settings.FLOW_BATCH_SIZE:,}")
+    print(f"Queued:    {queued:>10,} messages")
+    print(f"In order:  {'yes' if in_order else 'NO'}")
+    print(f"Idle tick: {tick_ms:.3f} ms, {idle_statements} SQL statements over {args.idle_ticks} ticks"
+          f" (next due {flow_timers.wheel.next_due() or 'never'}, now {datetime.utcnow():%Y-%m-%d %H:%M:%S})")
+    ok = advanced == queued == args.enrollments and in_order
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
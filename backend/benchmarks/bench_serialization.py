@@ -0,0 +1,84 @@
+# Micro-benchmark: list endpoint serialization, Pydantic models vs. tuple rows + orjson
+#
+# Run from the backend directory:
+#     python -m benchmarks.bench_serialization --rows 100 --iterations 2000
+#
+# No database is needed: synthetic rows shaped like CUSTOMER_COLUMNS are serialized
+# both the old way (one CustomerResponse per row, then FastAPI re-validating the
+# whole CustomerListResponse and encoding it with jsonable_encoder + json.dumps)
+# and through the fast path in app.serializers.
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+
+from app.schemas import CustomerResponse, CustomerListResponse
+from app.serializers import customer_row, json_response
+
+
+def make_rows(count: int) -> list:
+    now = datetime.utcnow()
+    return [
+        (
+            i, f"customer{i}@example.com", "Jane", "Cooper", "+1-555-555-5555",
+            f"https://api.dicebear.com/7.x/avataaars/svg?seed={i}", "Austin", "Texas",
+            "USA", "73301", "ACTIVE", 12, 4312.55, 4890.12, 359.38,
+            now - timedelta(days=300), now - timedelta(days=3), True, False,
+            "organic", ["vip", "newsletter"], now - timedelta(days=400), now,
+        )
+        for i in range(count)
+    ]
+
+
+def serialize_pydantic(rows: list) -> bytes:
+    """What the endpoints did before: build models, then FastAPI validates and encodes"""
+    response = CustomerListResponse(
+        customers=[CustomerResponse(**customer_row(r)) for r in rows],
+        total=len(rows),
+        page=1,
+        per_page=len(rows)
+    )
+    validated = CustomerListResponse.model_validate(response.model_dump())
+    return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+
+def serialize_fast(rows: list) -> bytes:
+    return json_response({
+        "customers": [customer_row(r) for r in rows],
+        "total": len(rows),
+        "page": 1,
+        "per_page": len(rows)
+    }).body
+
+
+def measure(fn, rows: list, iterations: int) -> float:
+    fn(rows)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(rows)
+    elapsed = time.perf_counter() - start
+    return (len(rows) * iterations) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare list serialization: Pydantic models vs. tuple rows + orjson")
+    parser.add_argument("--rows", type=int, default=100, help="Rows per page")
+    parser.add_argument("--iterations", type=int, default=1000, help="Pages to serialize per variant")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert json.loads(serialize_pydantic(rows)) == json.loads(serialize_fast(rows)), "payloads differ"
+
+    before = measure(serialize_pydantic, rows, args.iterations)
+    after = measure(serialize_fast, rows, args.iterations)
+
+    print(f"Pydantic + response_model: {before:>12,.0f} rows/s")
+    print(f"Tuple rows + orjson:       {after:>12,.0f} rows/s")
+    print(f"Speed-up:                  {after / before:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# Rendering benchmark for flow email templates (services/email_templates.py)
+#
+# Run from the backend directory against a migrated database:
+#     python -m benchmarks.bench_template_render [--messages 20000] [--processes 4] [--naive 2000]
+#
+# Creates --messages customers ("renderbench-" emails) and a flow with one email
+# step whose subject and body use a dozen customer fields, then renders a message
+# for every customer three ways:
+#   - naive: --naive messages the straightforward way, compiling the template and
+#     loading the Customer through the ORM for each message
+#   - batch: render_messages() in-process (cached template, one column projection)
+#   - pool:  render_messages() over a pool of --processes processes
+# and checks that all three produce the same emails. Everything it created is
+# deleted again.
+
+import argparse
+import sys
+import time
+
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import Customer, Flow, FlowStep
+from app.services import email_templates
+from app.services.email_templates import render_messages, shutdown_pool
+
+SUBJECT = "{{ first_name }}, your {{ tier }} picks from {{ city }}"
+BODY = """
+<html><body>
+<h1>Hi {{ name }},</h1>
+<p>Thanks for your {{ total_orders }} orders{% if total_spend > 1000 %} and for being one of our best customers{% endif %}.</p>
+<p>You've spent {{ "%.2f"|format(total_spend) }} with us; your lifetime value is {{ "%.2f"|format(lifetime_value) }}.</p>
+<p>We ship to {{ city }}, {{ state }}, {{ country }}. Replies go to {{ email }}.</p>
+{% for i in range(5) %}<div class="pick">Pick {{ i + 1 }} for {{ first_name }} {{ last_name }}</div>
+{% endfor %}
+</body></html>
+"""
+
+
+def setup(count: int) -> int:
+    with SessionLocal() as db:
+        db.execute(insert(Customer), [
+            {
+                "email": f"renderbench-{i}@example.com", "first_name": f"First{i}", "last_name": f"Last{i}",
+                "city": "Austin", "state": "Texas", "country": "USA", "status": "vip" if i % 3 else "active",
+                "total_orders": i % 40, "total_spend": i * 3.25, "lifetime_value": i * 4.5, "email_opt_in": True,
+            }
+            for i in range(count)
+        ])
+        flow = Flow(name="Template render benchmark", trigger_type="manual", status="draft")
+        db.add(flow)
+        db.flush()
+        step = FlowStep(flow_id=flow.id, order=1, step_type="email", subject=SUBJECT, content=BODY)
+        db.add(step)
+        db.commit()
+        return step.id
+
+
+def cleanup(step_id: int) -> None:
+    with SessionLocal() as db:
+        db.query(Flow).filter(Flow.name == "Template render benchmark").delete()
+        db.query(Customer).filter(Customer.email.like("renderbench-%")).delete(synchronize_session=False)
+        db.commit()
+
+
+def render_naive(db, step_id: int, customer_ids: list) -> list:
+    subject_env = ImmutableSandboxedEnvironment(autoescape=False)
+    body_env = ImmutableSandboxedEnvironment(autoescape=True)
+    out = []
+    for customer_id in customer_ids:
+        step = db.get(FlowStep, step_id)
+        customer = db.get(Customer, customer_id)
+        context = {name: getattr(customer, column.key) for name, column in email_templates.FIELD_COLUMNS.items()}
+        context["name"] = f"{customer.first_name} {customer.last_name}"
+        out.append((
+            subject_env.from_string(step.subject).render(context).strip(),
+            body_env.from_string(step.content).render(context),
+        ))
+    return out
+
+
+def timed(label: str, count: int, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<7} {count:>8,} messages in {elapsed:6.2f} s ({count / elapsed:>9,.0f} msg/s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time rendering personalized flow emails")
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--naive", type=int, default=2000, help="Messages to render the naive way (0 skips)")
+    args = parser.parse_args()
+
+    step_id = setup(args.messages)
+    try:
+        with SessionLocal() as db:
+            customer_ids = [i for (i,) in db.query(Customer.id).filter(Customer.email.like("renderbench-%"))]
+            messages = [(step_id, 1, customer_id) for customer_id in customer_ids]
+
+            naive = []
+            if args.naive:
+                naive = timed("naive", args.naive, lambda: render_naive(db, step_id, customer_ids[:args.naive]))
+
+            settings.EMAIL_RENDER_POOL_THRESHOLD = len(messages) + 1
+            batch = timed("batch", len(messages), lambda: render_messages(db, messages))
+
+            settings.EMAIL_RENDER_POOL_THRESHOLD = 0
+            settings.EMAIL_RENDER_PROCESSES = args.processes
+            render_messages(db, messages[:args.processes])  # Start the workers outside the timing
+            pool = timed("pool", len(messages), lambda: render_messages(db, messages))
+    finally:
+        shutdown_pool()
+        cleanup(step_id)
+
+    ok = (
+        all(r.error is None for r in batch)
+        and batch == pool
+        and [(r.subject, r.body) for r in batch[:len(naive)]] == naive
+    )
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
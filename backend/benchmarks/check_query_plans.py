@@ -0,0 +1,156 @@
+# Query-plan regression harness for the routers' hot queries
+#
+# Run from the backend directory against a migrated database:
+#     python -m benchmarks.check_query_plans [--seed] [--natural-plans]
+#
+# Every query below is built by app/queries.py, the builders the routers execute.
+# Each one is EXPLAINed on the configured DATABASE_URL and the run fails (exit
+# code 1) if any plan reads one of LARGE_TABLES with a sequential scan.
+#
+# On PostgreSQL, sequential scans are disabled for the check (SET LOCAL
+# enable_seqscan = off) so the result does not depend on how much data is seeded:
+# a Seq Scan that survives means no index can serve the query. Pass
+# --natural-plans to see the plans the planner would pick on the current data.
+# On SQLite, any "SCAN <table>" without an index is reported.
+
+import argparse
+import json
+import sys
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import queries
+from app.database import engine
+from app.serializers import PRODUCT_COLUMNS
+
+# Tables that grow with the business; small config tables (segments, flows, ...) are ignored
+LARGE_TABLES = {"orders", "order_items", "customers", "products"}
+# Served by PostgreSQL-only indexes (varchar_pattern_ops, pg_trgm), or using PostgreSQL
+# functions (to_char) that SQLite can't even plan
+POSTGRES_ONLY = {"orders.search_order_id", "orders.search_text", "customers.details_monthly_spending"}
+
+
+def hot_queries(now: datetime) -> dict:
+    """
+    name -> statement, grouped by the router that issues it. The statements come from
+    app/queries.py, the same builders the routers execute.
+    Aggregates that read a whole table by design (dashboard customer and inventory
+    totals) are left out, as are the dashboard's reads of the small daily rollup tables.
+    """
+    sample_customer_id = 1
+    sample_order_id = 1
+    delivered = queries.order_list_filters(status="Delivered")
+
+    return {
+        # customers.py
+        "customers.details_orders": queries.customer_orders(sample_customer_id),
+        "customers.details_order_items": queries.customer_order_items(sample_order_id),
+        "customers.details_top_products": queries.customer_top_products(sample_customer_id, "quantity"),
+        "customers.details_status_counts": queries.customer_status_counts(sample_customer_id),
+        "customers.details_monthly_spending": queries.customer_monthly_spending(sample_customer_id, now),
+
+        # orders.py
+        "orders.count_by_status": queries.order_count(delivered),
+        "orders.list_by_status": queries.order_page(delivered, "date", "desc").limit(11),
+        "orders.list_by_status_cursor": queries.order_page(delivered, "date", "desc", (now, 1)).limit(11),
+        "orders.list_by_amount_cursor": queries.order_page([], "total_amount", "desc", (100.0, 1)).limit(11),
+        "orders.search_order_id": queries.order_page(
+            queries.order_list_filters(search="HV-12"), "date", "desc"
+        ).limit(11),
+        "orders.search_text": queries.order_page(
+            queries.order_list_filters(search="smith"), "date", "desc"
+        ).limit(11),
+        "orders.details_items": queries.order_items(sample_order_id),
+
+        # inventory.py
+        "inventory.by_category": queries.filter_products(
+            select(*PRODUCT_COLUMNS), None, None, "Audio", None, None, None, None
+        ).order_by(*queries.product_order("created_at", "desc")).limit(10),
+    }
+
+
+def compile_for_driver(stmt):
+    """SQL string and driver-level parameters for exec_driver_sql"""
+    compiled = stmt.compile(dialect=engine.dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def postgres_seq_scans(conn, sql: str, params) -> tuple:
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}", params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    offenders = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES:
+            offenders.append(node["Relation Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return offenders, json.dumps(plan[0]["Plan"], indent=2)
+
+
+def sqlite_seq_scans(conn, sql: str, params) -> tuple:
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", params).all()
+    offenders = []
+    for row in rows:
+        detail = row[-1]
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in LARGE_TABLES and "USING" not in detail:
+            offenders.append(words[1])
+    return offenders, "\n".join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when a hot query's plan sequentially scans a large table")
+    parser.add_argument("--seed", action="store_true", help="Run seed_database() first")
+    parser.add_argument("--natural-plans", action="store_true", help="PostgreSQL: keep enable_seqscan on")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    args = parser.parse_args()
+
+    if args.seed:
+        from app.seed_data import seed_database
+        seed_database()
+
+    dialect = engine.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        print(f"Unsupported dialect: {dialect}")
+        sys.exit(2)
+
+    statements = hot_queries(datetime.utcnow())
+    if dialect != "postgresql":
+        statements = {name: stmt for name, stmt in statements.items() if name not in POSTGRES_ONLY}
+
+    failures = 0
+    with engine.connect() as conn:
+        if dialect == "postgresql":
+            with conn.begin():
+                conn.exec_driver_sql("ANALYZE")
+        for name, stmt in statements.items():
+            sql, params = compile_for_driver(stmt)
+            with conn.begin():
+                if dialect == "postgresql":
+                    if not args.natural_plans:
+                        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+                    offenders, plan = postgres_seq_scans(conn, sql, params)
+                else:
+                    offenders, plan = sqlite_seq_scans(conn, sql, params)
+
+            status = "FAIL" if offenders else "ok"
+            print(f"[{status:>4}] {name}" + (f"  (seq scan on {', '.join(sorted(set(offenders)))})" if offenders else ""))
+            if offenders or args.verbose:
+                print("       " + plan.replace("\n", "\n       "))
+            failures += bool(offenders)
+
+    print(f"\n{failures} of {len(statements)} hot queries fall back to a sequential scan")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Concurrency stress test for stock reservation (services/stock_reservation.py)
+#
+# Run from the backend directory against a migrated PostgreSQL database:
+#     python -m benchmarks.stress_stock_reservation [--orders 2000] [--workers 32] [--stock 300] [--skus 3]
+#
+# Creates --skus products ("STRESS-" SKUs) with --stock units each and 100 stress
+# customers. It then places --orders orders from --workers threads at once through
+# create_orders. Each order buys 1-3 units of 1-3 random stress SKUs, so multi-SKU
+# orders contend for the same rows, and refusals for lack of stock are expected.
+#
+# Afterwards it checks, per SKU:
+#   - the stock is never negative
+#   - initial minus final stock equals the units in accepted orders
+#   - status matches the final level
+# Everything it created is deleted again, and today's rollups are rebuilt.
+
+import argparse
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import DATABASE_URL
+from app.models import Customer, DailyProductSales, Order, OrderItem, Product
+from app.schemas import OrderCreate
+from app.services.order_service import OrderIngestionError, create_orders
+from app.services.sales_rollup import rebuild_sales_rollups
+from app.services.stock_reservation import stock_status
+
+
+STRESS_CUSTOMERS = 100
+
+
+def setup(Session, skus: int, stock: int):
+    run = time.time_ns()
+    with Session() as db:
+        customers = [
+            Customer(first_name="Stress", last_name=str(i), email=f"stress-{run}-{i}@example.com")
+            for i in range(STRESS_CUSTOMERS)
+        ]
+        products = [
+            Product(name=f"Stress SKU {i}", sku=f"STRESS-{run}-{i}", price=1.0, stock_level=stock)
+            for i in range(skus)
+        ]
+        db.add_all(customers)
+        db.add_all(products)
+        db.commit()
+        return [c.id for c in customers], [p.id for p in products]
+
+
+def cleanup(Session, customer_ids, product_ids) -> None:
+    with Session() as db:
+        order_pks = select(Order.id).where(Order.customer_id.in_(customer_ids))
+        db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_pks)))
+        db.execute(delete(Order).where(Order.customer_id.in_(customer_ids)))
+        db.execute(delete(DailyProductSales).where(DailyProductSales.product_id.in_(product_ids)))
+        db.execute(delete(Product).where(Product.id.in_(product_ids)))
+        db.execute(delete(Customer).where(Customer.id.in_(customer_ids)))
+        today = datetime.utcnow().date()
+        rebuild_sales_rollups(db, today, today)
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place concurrent orders and check stock is never oversold")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--stock", type=int, default=300, help="Initial units per SKU")
+    parser.add_argument("--skus", type=int, default=3)
+    args = parser.parse_args()
+
+    if not DATABASE_URL.startswith("postgresql"):
+        print("Run against PostgreSQL; SQLite serializes all writers")
+        sys.exit(2)
+
+    engine = create_engine(DATABASE_URL, pool_size=args.workers, max_overflow=0)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    customer_ids, product_ids = setup(Session, args.skus, args.stock)
+
+    accepted = {pid: 0 for pid in product_ids}
+    counts = {"accepted": 0, "refused": 0, "errors": 0}
+    lock = threading.Lock()
+    run_id = time.time_ns()
+
+    def place(n: int) -> None:
+        rng = random.Random(n)
+        items = [{"product_id": pid, "quantity": rng.randint(1, 3)}
+                 for pid in rng.sample(product_ids, rng.randint(1, len(product_ids)))]
+        order = OrderCreate(
+            order_id=f"STRESS-{run_id}-{n}", customer_id=rng.choice(customer_ids), total_amount=1.0, items=items
+        )
+        with Session() as db:
+            try:
+                create_orders(db, [order])
+                db.commit()
+            except OrderIngestionError:
+                db.rollback()
+                with lock:
+                    counts["refused"] += 1
+                return
+            except Exception as e:
+                db.rollback()
+                with lock:
+                    counts["errors"] += 1
+                print(f"Unexpected error: {e}")
+                return
+        with lock:
+            counts["accepted"] += 1
+            for item in items:
+                accepted[item["product_id"]] += item["quantity"]
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(place, range(args.orders)))
+        elapsed = time.perf_counter() - start
+
+        with Session() as db:
+            final = dict(db.execute(select(Product.id, Product.stock_level).where(Product.id.in_(product_ids))).all())
+            statuses = dict(db.execute(select(Product.id, Product.status).where(Product.id.in_(product_ids))).all())
+            sold = dict(db.execute(
+                select(OrderItem.product_id, func.sum(OrderItem.quantity))
+                .join(Order, Order.id == OrderItem.order_id)
+                .where(Order.customer_id.in_(customer_ids))
+                .group_by(OrderItem.product_id)
+            ).all())
+    finally:
+        cleanup(Session, customer_ids, product_ids)
+
+    print(f"Orders:    {args.orders:>8,} from {args.workers} threads in {elapsed:.2f} s ({args.orders / elapsed:,.0f}/s)")
+    print(f"Accepted:  {counts['accepted']:>8,}")
+    print(f"Refused:   {counts['refused']:>8,} (insufficient stock)")
+    print(f"Errors:    {counts['errors']:>8,}")
+
+    ok = counts["errors"] == 0
+    for pid in product_ids:
+        taken = args.stock - final[pid]
+        consistent = final[pid] >= 0 and taken == accepted[pid] == sold.get(pid, 0) and statuses[pid] == stock_status(final[pid])
+        ok = ok and consistent
+        print(f"  product {pid}: final stock {final[pid]:>5}, taken {taken:>5}, "
+              f"in accepted orders {accepted[pid]:>5}, status {statuses[pid]} {'OK' if consistent else 'MISMATCH'}")
+    print("PASS: no oversell" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -28,6 +28,38 @@ function Dashboard() {
         };
 
         fetchData();
+
+        // Live updates: apply deltas newer than the snapshot the numbers came from
+        const source = dashboardAPI.stream();
+        const isNewer = (delta, current) =>
+            current && (!current.computed_at || new Date(delta.at) > new Date(current.computed_at));
+
+        source.addEventListener('snapshot', (event) => {
+            setStats(JSON.parse(event.data));
+            setLoading(false);
+        });
+        source.addEventListener('orders', (event) => {
+            const delta = JSON.parse(event.data);
+            setStats((current) => {
+                if (!isNewer(delta, current)) return current;
+                const totalOrders = current.total_orders + delta.orders;
+                const totalRevenue = current.total_revenue + delta.revenue;
+                return {
+                    ...current,
+                    total_orders: totalOrders,
+                    total_revenue: Math.round(totalRevenue * 100) / 100,
+                    average_order_value: Math.round((totalRevenue / Math.max(totalOrders, 1)) * 100) / 100
+                };
+            });
+        });
+        source.addEventListener('customers', (event) => {
+            const delta = JSON.parse(event.data);
+            setStats((current) => isNewer(delta, current)
+                ? { ...current, total_customers: current.total_customers + delta.new_customers }
+                : current);
+        });
+
+        return () => source.close();
     }, []);
 
     const formatCurrency = (value) => {
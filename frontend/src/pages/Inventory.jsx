@@ -148,47 +148,24 @@ function Inventory() {
 
     const handleDownload = async () => {
         try {
-            // Fetch all products with current filters
+            if (totalItems === 0) {
+                alert('No products to download');
+                return;
+            }
+
+            // Stream all products with current filters as CSV from the export endpoint
             let statusFilter;
             if (activeFilter === 'Low Stock') statusFilter = 'LOW_STOCK';
             else if (activeFilter === 'Out of Stock') statusFilter = 'OUT_OF_STOCK';
 
-            const data = await inventoryAPI.getAll({
-                page: 1,
-                per_page: 10000, // Fetch up to 10000 items
+            const blob = await inventoryAPI.export({
+                format: 'csv',
                 search: search || undefined,
                 status: statusFilter,
                 min_price: appliedFilters.min_price || undefined,
                 max_price: appliedFilters.max_price || undefined,
                 predicted_need: appliedFilters.predicted_need || undefined,
             });
-
-            if (!data.products || data.products.length === 0) {
-                alert('No products to download');
-                return;
-            }
-
-            // Convert to CSV
-            const headers = ['ID', 'Name', 'SKU', 'Category', 'Price', 'Stock Level', 'Status', 'Predicted Need', 'Created At'];
-            const csvRows = [headers.join(',')];
-
-            data.products.forEach(p => {
-                const row = [
-                    p.id,
-                    `"${p.name.replace(/"/g, '""')}"`, // Escape quotes
-                    p.sku,
-                    p.category || '',
-                    p.price,
-                    p.stock_level,
-                    p.status,
-                    p.predicted_need || '',
-                    p.created_at
-                ];
-                csvRows.push(row.join(','));
-            });
-
-            const csvContent = csvRows.join('\n');
-            const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
             const url = URL.createObjectURL(blob);
             const link = document.createElement('a');
             link.setAttribute('href', url);
@@ -378,7 +355,12 @@ function Inventory() {
                                     <StatusBadge status={product.status} />
                                 </td>
                                 <td>
-                                    <div className={`predicted-need ${getPredictedNeedClass(product.predicted_need)}`}>
+                                    <div
+                                        className={`predicted-need ${getPredictedNeedClass(product.predicted_need)}`}
+                                        title={product.days_until_stockout != null
+                                            ? `~${Math.round(product.days_until_stockout)} days of stock at ${product.sales_velocity}/day`
+                                            : undefined}
+                                    >
                                         <Sparkles size={14} />
                                         <span>{product.predicted_need || 'Healthy'}</span>
                                     </div>
@@ -65,6 +65,8 @@ export default api;
 export const dashboardAPI = {
     getStats: () => fetchAPI('/dashboard/stats'),
     getInsights: () => fetchAPI('/dashboard/insights'),
+    // Server-Sent Events: `snapshot`, then `orders` / `customers` / `stock_alert` deltas
+    stream: () => new EventSource(`${API_BASE_URL}/dashboard/stream`),
 };
 
 // Customers API
@@ -138,6 +140,25 @@ export const inventoryAPI = {
         return fetchAPI(`/inventory${queryString ? `?${queryString}` : ''}`);
     },
     getById: (id) => fetchAPI(`/inventory/${id}`),
+    // Streams the whole filtered catalog; resolves to a Blob rather than JSON
+    export: async (params = {}) => {
+        const searchParams = new URLSearchParams({ format: params.format || 'csv' });
+        if (params.search) searchParams.append('search', params.search);
+        if (params.status) searchParams.append('status', params.status);
+        if (params.category) searchParams.append('category', params.category);
+        if (params.min_price) searchParams.append('min_price', params.min_price);
+        if (params.max_price) searchParams.append('max_price', params.max_price);
+        if (params.predicted_need) searchParams.append('predicted_need', params.predicted_need);
+
+        const token = localStorage.getItem('token');
+        const response = await fetch(`${API_BASE_URL}/inventory/export?${searchParams.toString()}`, {
+            headers: token ? { 'Authorization': `Bearer ${token}` } : {}
+        });
+        if (!response.ok) {
+            throw new Error(`API Error: ${response.status} ${response.statusText}`);
+        }
+        return response.blob();
+    },
     create: (data) => fetchAPI('/inventory', {
         method: 'POST',
         body: JSON.stringify(data),